@@ -0,0 +1,162 @@
+import gzip
+import json
+import os
+import zlib
+from collections import OrderedDict
+from storage import EXPRESS_COLUMNS, canonical_express_row
+
+ARCHIVE_DIR = "archive"
+UNDATED = "undated"  # 没有取件时间的旧数据所在的分区
+
+
+def _decompress_members(data):
+    """
+    逐个解压 gzip 成员
+
+    归档文件由多次追加的 gzip 成员连接而成；最后一个成员不完整（追加时崩溃）时丢弃它。
+    """
+    chunks = []
+    while data:
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        try:
+            chunk = decompressor.decompress(data)
+        except zlib.error:
+            break
+        if not decompressor.eof:
+            break
+        chunks.append(chunk)
+        data = decompressor.unused_data
+    return b"".join(chunks)
+
+
+class ExpressArchive:
+    """
+    已取件快递的归档（冷数据）
+
+    按取件月份分区，每个分区是一个 gzip 压缩的 JSON Lines 文件（archive/express-YYYY-MM.jsonl.gz）。
+    文件只追加：每次归档在末尾追加一个新的 gzip 成员，已写入的内容不再改写。
+    归档写入后才从热数据中删除，中途崩溃时同一快递可能被归档两次，读取时按快递ID去重。
+
+    查询时才按需读取分区（从最近的月份开始），最近读取的几个分区的解析结果缓存在内存中；
+    缓存记下读取时的文件大小，其他实例追加过的分区会重新读取。
+    入库时检查快递ID是否已归档只用到各分区的快递ID集合（见 contains）。
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, cache_partitions=4):
+        self.directory = directory
+        self.cache_partitions = cache_partitions
+        self._cache = OrderedDict()  # {分区: (文件大小, {express_id: 快递行})}
+        self._ids = {}  # {分区: (文件大小, 快递ID集合)}
+
+    @staticmethod
+    def partition_of(row):
+        """快递行所在的分区（取件月份 YYYY-MM）"""
+        picked_at = row[EXPRESS_COLUMNS.index("picked_at")]
+        return picked_at[:7] if picked_at else UNDATED
+
+    def path(self, partition):
+        return os.path.join(self.directory, f"express-{partition}.jsonl.gz")
+
+    def partitions(self):
+        """全部分区，最近的月份在前，undated 在最后"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name[len("express-"):-len(".jsonl.gz")] for name in os.listdir(self.directory)
+                 if name.startswith("express-") and name.endswith(".jsonl.gz")]
+        dated = sorted((name for name in names if name != UNDATED), reverse=True)
+        return dated + [name for name in names if name == UNDATED]
+
+    def append(self, rows):
+        """
+        追加快递行，按分区各写一个 gzip 成员并落盘
+
+        参数:
+            rows: 与 EXPRESS_COLUMNS 顺序一致的快递行
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(self.partition_of(row), []).append(row)
+        if groups:
+            os.makedirs(self.directory, exist_ok=True)
+        for partition, group in groups.items():
+            text = "".join(json.dumps(dict(zip(EXPRESS_COLUMNS, row)), ensure_ascii=False) + "\n"
+                           for row in group)
+            data = gzip.compress(text.encode("utf-8"))
+            with open(self.path(partition), "ab") as f:
+                size = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            # 缓存是追加前的完整内容时直接更新，否则下次读取时重新解析
+            cached = self._cache.get(partition)
+            if cached is not None and cached[0] == size:
+                for row in group:
+                    cached[1][row[0]] = tuple(row)
+                self._cache[partition] = (size + len(data), cached[1])
+
+    def read_partition(self, partition):
+        """
+        读取一个分区
+
+        返回:
+            dict: {express_id: 快递行}
+        """
+        cached = self._cache.get(partition)
+        with open(self.path(partition), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if cached is not None and cached[0] == size:
+                self._cache.move_to_end(partition)
+                return cached[1]
+            raw = f.read()
+        size = len(raw)
+        data = _decompress_members(raw)
+        rows = {}
+        for line in data.decode("utf-8").splitlines():
+            record = json.loads(line)
+            row = tuple(canonical_express_row([record.get(column) for column in EXPRESS_COLUMNS]))
+            rows[row[0]] = row
+        self._cache[partition] = (size, rows)
+        self._cache.move_to_end(partition)
+        while len(self._cache) > self.cache_partitions:
+            self._cache.popitem(last=False)
+        return rows
+
+    def contains(self, express_id):
+        """快递ID是否已归档（各分区的快递ID集合常驻内存，分区文件变化时重新读取）"""
+        for partition in self.partitions():
+            size = os.path.getsize(self.path(partition))
+            cached = self._ids.get(partition)
+            if cached is None or cached[0] != size:
+                cached = self._ids[partition] = (size, set(self.read_partition(partition)))
+            if express_id in cached[1]:
+                return True
+        return False
+
+    def find(self, express_id=None, person_id=None, limit=None):
+        """
+        在归档中查找（从最近的月份开始，找够 limit 个即停止）
+
+        参数:
+            express_id: 快递ID
+            person_id: 发件人或收件人ID
+            limit: 最多返回的行数，None 表示不限
+
+        返回:
+            list: 快递行列表
+        """
+        results = []
+        for partition in self.partitions():
+            rows = self.read_partition(partition)
+            if express_id is not None:
+                candidates = [rows[express_id]] if express_id in rows else []
+            else:
+                candidates = rows.values()
+            for row in candidates:
+                if person_id is not None and person_id not in (row[2], row[3]):
+                    continue
+                results.append(row)
+                if limit is not None and len(results) >= limit:
+                    return results
+            if express_id is not None and results:
+                return results
+        return results
@@ -0,0 +1,438 @@
+"""
+性能基准测试
+
+生成合成的人物/快递数据（1k ~ 1M）和二维码图片，在不需要显示器的情况下测量
+加载、入库、取件、查询、列表刷新和二维码解析的耗时，结果以 JSON 输出，便于比较回归。
+桌面界面的启动时间（导入、第一次显示窗口、数据加载完成）在子进程中测量，没有显示器时只测量导入和数据加载。
+
+用法:
+    python benchmark.py --sizes 1000 10000 --backend sqlite --output bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import pandas as pd
+import metrics
+from express_core import open_station
+from storage import ExcelStorage, SqliteStorage, USER_COLUMNS, EXPRESS_COLUMNS, TIMESTAMP_FORMAT
+from archive import ExpressArchive
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP
+
+LOCATIONS = [f"{area}区{shelf}架" for area in "ABCDEF" for shelf in range(1, 21)]
+NOTES = ["无", "易碎品", "生鲜", "文件", ""]
+HEAVY_MODULES = ("pandas", "openpyxl", "numpy", "cv2", "pyzbar")  # 启动时不应导入的较重模块
+
+# 在新的子进程中运行（模块都未导入），测量 main.py 的启动时间，结果以一行 JSON 输出
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+result = {"import_s": time.perf_counter() - start}
+result["heavy_modules_at_import"] = [m for m in %(heavy)r if m in sys.modules]
+import express_core
+express_core.STORAGE_BACKEND = %(backend)r
+import tkinter as tk
+try:
+    root = tk.Tk()
+except tk.TclError as e:
+    result["window_skipped"] = str(e)
+    express_core.open_station().close()
+    result["data_ready_s"] = time.perf_counter() - start
+else:
+    app = main.ExpressManagementSystem(root)
+    root.update()
+    result["first_window_s"] = time.perf_counter() - start
+    while app.list_model is None and app.load_error is None:
+        root.update()
+        time.sleep(0.005)
+    result["data_ready_s"] = time.perf_counter() - start
+    app.shutdown()
+    root.destroy()
+t0 = time.perf_counter()
+main.prewarm_imports()
+result["prewarm_s"] = time.perf_counter() - t0
+print(json.dumps(result))
+"""
+
+
+def synthetic_rows(size, seed=0):
+    """
+    生成合成数据
+
+    参数:
+        size: 快递数量
+        seed: 随机种子
+
+    返回:
+        tuple: (人物行列表, 快递行列表)
+    """
+    rng = random.Random(seed)
+    people_count = max(10, size // 5)
+    people = [(f"P{i:07d}", f"用户{i}") for i in range(people_count)]
+    # 取件码按 xlsx 读出的整数形式生成；每10个快递中有1个已取件，取件时间分布在最近60天内，
+    # 入库时间在取件前（已取件）或当前时间前（在库）0~5天
+    codes = rng.sample(range(10 ** 6), min(size, 10 ** 6))
+    now = time.time()
+    express = []
+    for i in range(size):
+        picked = i % 10 == 9
+        picked = now - rng.uniform(0, 60 * 86400) if picked else None
+        stored = (picked or now) - rng.uniform(0, 5 * 86400)
+        express.append((f"E{i:08d}", codes[i % len(codes)],
+                        people[rng.randrange(people_count)][0], people[rng.randrange(people_count)][0],
+                        rng.choice(LOCATIONS), rng.choice(NOTES),
+                        STATUS_PICKED_UP if picked else STATUS_IN_STOCK,
+                        time.strftime(TIMESTAMP_FORMAT, time.localtime(picked)) if picked else None,
+                        time.strftime(TIMESTAMP_FORMAT, time.localtime(stored))))
+    return people, express
+
+
+def create_storage(backend, directory, people, express):
+    """在临时目录中写入合成数据，返回对应的存储对象"""
+    if backend == "excel":
+        user_file = os.path.join(directory, "user.xlsx")
+        express_file = os.path.join(directory, "express.xlsx")
+        pd.DataFrame(people, columns=USER_COLUMNS).to_excel(
+            user_file, index=False, sheet_name='人物数据', engine='openpyxl')
+        pd.DataFrame(express, columns=EXPRESS_COLUMNS).to_excel(
+            express_file, index=False, sheet_name='快递数据', engine='openpyxl')
+        return lambda: ExcelStorage(user_file, express_file, os.path.join(directory, "express.journal"))
+    db_file = os.path.join(directory, "express.db")
+    storage = SqliteStorage(db_file)
+    storage.apply_batch([("upsert_person", row) for row in people] +
+                        [("insert_express", row) for row in express])
+    storage.close()
+    return lambda: SqliteStorage(db_file)
+
+
+def summarize(operation, size, latencies, total_seconds, peak_bytes=None, **extra):
+    """把一组延迟整理为结果字典"""
+    latencies = sorted(latencies)
+
+    def percentile(p):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p / 100))] * 1000, 4)
+
+    result = {
+        "operation": operation,
+        "size": size,
+        "count": len(latencies),
+        "total_s": round(total_seconds, 6),
+        "throughput_per_s": round(len(latencies) / total_seconds, 1) if total_seconds else None,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "peak_mem_mb": round(peak_bytes / 2 ** 20, 2) if peak_bytes is not None else None,
+    }
+    result.update(extra)
+    return result
+
+
+def timed_calls(func, args_list):
+    """逐个调用并记录每次的耗时"""
+    latencies = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        func(*args)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+class MemoryPeak:
+    """测量代码块的 Python 内存分配峰值（未启用时返回 None）"""
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.peak = None
+
+    def __enter__(self):
+        if self.enabled:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+
+def bench_store(size, backend, ops, trace_memory, seed=0):
+    """测量一个数据规模下的加载、入库、取件、查询和列表刷新"""
+    results = []
+    rng = random.Random(seed)
+    people, express = synthetic_rows(size, seed)
+    with tempfile.TemporaryDirectory() as directory:
+        make_storage = create_storage(backend, directory, people, express)
+
+        # 加载（第一次可能需要解析 xlsx 并归档超过30天的已取件快递，第二次走快照缓存）
+        archive = ExpressArchive(os.path.join(directory, "archive"))
+        for operation in ("load", "load_warm"):
+            with MemoryPeak(trace_memory) as memory:
+                start = time.perf_counter()
+                station = open_station(make_storage(), archive=archive)
+                elapsed = time.perf_counter() - start
+            results.append(summarize(operation, size, [elapsed], elapsed, memory.peak,
+                                     hot_express=station.express_count()))
+            if operation == "load":
+                station.close()
+
+        # 入库（取件码自动分配；延迟只包含内存操作和提交到写入队列，吞吐量包含等待写入完成）
+        args_list = [(f"N{i:08d}", "", people[rng.randrange(len(people))][0], "发件人",
+                      people[rng.randrange(len(people))][0], "收件人", rng.choice(LOCATIONS), "")
+                     for i in range(ops)]
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.check_in, args_list)
+            start = time.perf_counter()
+            station.persistence.flush()
+            flush = time.perf_counter() - start
+        results.append(summarize("add_express", size, latencies, elapsed + flush, memory.peak,
+                                 flush_s=round(flush, 6)))
+
+        # 取件（从加载的在库快递中随机选取）
+        in_stock = [row for row in express if row[6] == STATUS_IN_STOCK]
+        sample = rng.sample(in_stock, min(ops, len(in_stock)))
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.pick_up, [(f"{row[1]:06d}",) for row in sample])
+            start = time.perf_counter()
+            station.persistence.flush()
+            flush = time.perf_counter() - start
+        results.append(summarize("pick_up_express", size, latencies, elapsed + flush, memory.peak,
+                                 flush_s=round(flush, 6)))
+
+        # 查询（一半按人物ID，一半按快递ID）
+        queries = [(people[rng.randrange(len(people))][0],) if i % 2 else (rng.choice(express)[0],)
+                   for i in range(ops)]
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.query, queries)
+        results.append(summarize("query_express", size, latencies, elapsed, memory.peak))
+
+        # 即时搜索（姓名前缀、ID后几位，模拟逐字输入）
+        keystrokes = []
+        for i in range(ops):
+            person_id, name = people[rng.randrange(len(people))]
+            text = name if i % 2 else person_id[-4:]
+            keystrokes.append((text[:1 + i % len(text)],))
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.search, keystrokes)
+        results.append(summarize("search_as_you_type", size, latencies, elapsed, memory.peak))
+
+        # 列表刷新（模型层：重建 + 取第一页，与界面上的刷新按钮一致）
+        model = station.create_list_model()
+
+        def refresh():
+            model.rebuild()
+            model.page_rows()
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(refresh, [()] * 5)
+        results.append(summarize("list_refresh", size, latencies, elapsed, memory.peak))
+
+        # 统计（货架占用、每日入库/取件、滞留时间）和推荐货架
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.stats.summary, [()] * ops)
+        results.append(summarize("station_stats", size, latencies, elapsed, memory.peak))
+        with MemoryPeak(trace_memory) as memory:
+            latencies, elapsed = timed_calls(station.suggest_location, [()] * ops)
+        results.append(summarize("suggest_location", size, latencies, elapsed, memory.peak))
+        station.close()
+    return results
+
+
+def bench_startup(size, backend, runs=2):
+    """
+    测量桌面界面的启动时间（每次都在新的子进程中启动）
+
+    第一次启动时 Excel 后端还没有快照缓存（需要解析 xlsx），之后的启动读取缓存。
+    各时间都从开始导入 main 算起；prewarm_s 为加载完成后在后台预先导入较重模块所需的时间。
+    """
+    people, express = synthetic_rows(size)
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=repo_dir + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    script = STARTUP_SCRIPT % {"heavy": HEAVY_MODULES, "backend": backend}
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        create_storage(backend, directory, people, express)
+        for run in range(runs):
+            proc = subprocess.run([sys.executable, "-c", script], cwd=directory, env=env,
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                results.append({"operation": "startup", "size": size, "run": run,
+                                "skipped": proc.stderr.strip().splitlines()[-1:]})
+                continue
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            result = {key: round(value, 4) if isinstance(value, float) else value
+                      for key, value in result.items()}
+            results.append(dict({"operation": "startup", "size": size, "run": run}, **result))
+    return results
+
+
+def photo_like(path):
+    """把二维码图片放进 4000x3000 的浅色画布并加上光照渐变，模拟手机拍摄的照片"""
+    import cv2
+    import numpy as np
+    qr = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    canvas = np.full((3000, 4000), 210, dtype=np.uint8)
+    canvas[1000:1900, 1500:2400] = cv2.resize(qr, (900, 900), interpolation=cv2.INTER_NEAREST)
+    canvas = (canvas * np.linspace(0.6, 1.0, 4000)[None, :]).astype(np.uint8)
+    photo_path = os.path.splitext(path)[0] + ".jpg"
+    cv2.imwrite(photo_path, canvas)
+    return photo_path
+
+
+def bench_qr(count, trace_memory):
+    """测量二维码解析（需要 pyzbar 和 zbar 动态库）：一半是原始二维码图片，一半模拟手机照片"""
+    try:
+        import qrcode_load
+        from qrcode_create import render_qr_image, express_to_qr_text
+    except Exception as e:
+        return [{"operation": "read_express_qr_code", "count": 0, "skipped": str(e)}]
+    _, express = synthetic_rows(count)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for i, row in enumerate(express):
+            record = dict(zip(("express_id", "pick_code", "sender", "receiver", "location", "notes"), row))
+            record.update(sender_name="发件人", receiver_name="收件人")
+            path = os.path.join(directory, f"{row[0]}.png")
+            render_qr_image(express_to_qr_text(record)).save(path)
+            paths.append(photo_like(path) if i % 2 else path)
+        qrcode_load.reset_decode_stats()
+        results = []
+        # 第二遍读取同样的文件，全部命中结果缓存
+        for operation in ("read_express_qr_code", "read_express_qr_code_cached"):
+            with MemoryPeak(trace_memory) as memory:
+                latencies, elapsed = timed_calls(qrcode_load.read_express_qr_code, [(p,) for p in paths])
+            results.append(summarize(operation, count, latencies, elapsed, memory.peak))
+        results[0].update(qrcode_load.decode_stats())
+    return results
+
+
+def bench_qr_payload(count):
+    """
+    比较二维码内容格式：逗号分隔（旧格式）和紧凑格式（含/不含姓名）
+
+    记录每种格式的平均字符数、二维码版本（版本越低模块越少，同样打印尺寸下每个模块越大，越容易扫出），
+    以及按 QR_OPTIONS 渲染的图片解码并解析的耗时和失败数（需要 pyzbar，缺少时只记录版本）。
+    """
+    import qrcode
+    from qrcode_create import QR_OPTIONS, express_to_qr_text, render_qr_image
+    try:
+        import qrcode_load
+        skipped = None
+    except Exception as e:
+        skipped = str(e)
+    people, express = synthetic_rows(count)
+    names = dict(people)
+    records = [{"express_id": express_id, "pick_code": pick_code, "sender": sender,
+                "sender_name": names[sender], "receiver": receiver, "receiver_name": names[receiver],
+                "location": location, "notes": notes}
+               for express_id, pick_code, sender, receiver, location, notes, *_ in express]
+    results = []
+    for name, payload, include_names in (("csv", "csv", True), ("compact", "compact", True),
+                                         ("compact_no_names", "compact", False)):
+        texts = [express_to_qr_text(record, payload, include_names) for record in records]
+        versions = []
+        for text in texts:
+            qr = qrcode.QRCode(**QR_OPTIONS)
+            qr.add_data(text)
+            qr.make(fit=True)
+            versions.append(qr.version)
+        extra = {"format": name,
+                 "avg_chars": round(sum(map(len, texts)) / len(texts), 1),
+                 "avg_version": round(sum(versions) / len(versions), 2),
+                 "max_version": max(versions),
+                 "modules": 17 + 4 * max(versions)}
+        if skipped is not None:
+            results.append(dict({"operation": "qr_payload_decode", "size": count, "count": 0,
+                                 "skipped": skipped}, **extra))
+            continue
+        images = []
+        for text in texts:
+            buffer = io.BytesIO()
+            render_qr_image(text).save(buffer, format="PNG")
+            images.append((buffer.getvalue(),))
+        failures = []
+
+        def decode(data):
+            try:
+                qrcode_load.parse_qr_text(qrcode_load.decode_image_bytes(data))
+            except ValueError:
+                failures.append(data)
+
+        latencies, elapsed = timed_calls(decode, images)
+        results.append(summarize("qr_payload_decode", count, latencies, elapsed,
+                                 failures=len(failures), **extra))
+    return results
+
+
+def peak_rss_mb():
+    """进程的最大常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(rss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="快递管理系统性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="快递数量（可以多个）")
+    parser.add_argument("--backend", choices=["excel", "sqlite"], default="sqlite")
+    parser.add_argument("--ops", type=int, default=1000, help="每项操作执行的次数")
+    parser.add_argument("--startup", type=int, default=10000,
+                        help="测量界面启动时间所用的快递数量，0表示跳过")
+    parser.add_argument("--qr", type=int, default=50, help="二维码解析测试的图片数量，0表示跳过")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="用 tracemalloc 测量每项操作的内存峰值（会变慢）")
+    parser.add_argument("--metrics", action="store_true",
+                        help="同时开启 metrics 并在结果中附带各操作的内部计时")
+    parser.add_argument("--output", help="结果JSON文件，默认输出到标准输出")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "ops": args.ops,
+        },
+        "results": [],
+    }
+    for size in args.sizes:
+        print(f"测试数据规模 {size} ...", file=sys.stderr)
+        report["results"].extend(bench_store(size, args.backend, args.ops, args.trace_memory))
+    if args.startup:
+        print(f"测试启动时间（{args.startup} 个快递）...", file=sys.stderr)
+        report["results"].extend(bench_startup(args.startup, args.backend))
+    if args.qr:
+        report["results"].extend(bench_qr(args.qr, args.trace_memory))
+        report["results"].extend(bench_qr_payload(args.qr))
+    report["meta"]["peak_rss_mb"] = peak_rss_mb()
+    if args.metrics:
+        report["metrics"] = metrics.snapshot()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
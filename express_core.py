@@ -0,0 +1,861 @@
+import re
+import threading
+import time
+from models import Person, Express, STATUS_IN_STOCK, STATUS_PICKED_UP, normalize_pick_code
+from storage import open_storage, SqliteStorage, WriteConflict, TIMESTAMP_FORMAT
+from archive import ExpressArchive
+from persistence_worker import PersistenceWorker
+from express_index import ExpressIndex
+from pick_code_allocator import PickCodeAllocator
+from search_index import PrefixIndex
+from shelf_stats import ShelfStats, SqlShelfStats
+from express_list_model import ExpressListModel, SqlExpressListModel
+import metrics
+
+STORAGE_BACKEND = "excel"  # 存储后端：excel（xlsx快照+日志）/ sqlite（express.db）
+SEARCH_LIMIT = 50  # 即时搜索最多返回的快递数
+ARCHIVE_AFTER_DAYS = 30  # 已取件超过这么多天的快递在启动时移入归档，None 表示不归档
+PROGRESS_EVERY = 10000  # 加载快递时每处理这么多条报告一次进度
+UNSEEN_CHANGES_LIMIT = 10000  # 未被界面取走的变化快递ID超过这么多时改为通知界面全部刷新
+
+
+class ExpressStation:
+    """
+    快递站业务核心（与界面无关）
+
+    负责内存数据、索引和写入存储，入库/取件/查询都在这里完成；
+    桌面界面（main.py）和取件服务（express_service.py）共用同一套逻辑（通过 open_station 创建）。
+    本类把热数据（在库和最近取件的快递）全部读入内存，查询和取件不访问存储；
+    SQLite 后端使用子类 SqlExpressStation，快递留在库中按索引查询。
+    更早取件的快递在归档中（见 archive_picked_up、query 的 include_archive）。
+
+    progress: 启动加载进度回调 progress(说明文字, 完成比例 0~1 或 None)，
+              在构造 ExpressStation 的线程中调用（界面在后台线程加载数据时用来显示进度条）
+    """
+
+    # 取件码在本机找不到时是否需要先同步其他终端的修改（快递全部在内存中时需要）
+    needs_sync_to_find = True
+
+    def __init__(self, storage=None, archive=None, archive_after_days=ARCHIVE_AFTER_DAYS, progress=None):
+        self._progress = progress
+        self._report_progress("正在打开数据文件...")
+        self.storage = storage if storage is not None else open_storage(STORAGE_BACKEND)
+        self.archive = archive if archive is not None else ExpressArchive()
+        self.people_dict = {}  # {person_id: Person对象}
+        self.express_dict = {}  # {express_id: Express对象}
+        self.pick_code_dict = {}  # {pick_code(6位字符串): express_id}
+        # 同步其他实例的修改（见 refresh）
+        self._write_seq = 0  # 本实例提交的快递写操作的序号
+        self._written = {}  # {express_id: 最近一次写操作的序号}
+        self._poll_seq = None  # 正在进行的读取请求发出时的写操作序号，没有请求时为None
+        self._poll_count = 0  # 已发出的读取请求数
+        self._applied_polls = 0  # 已应用的读取请求数（同一时间只有一个请求，即最近应用的请求编号）
+        self._unseen = set()  # 同步到的、尚未被 take_changes 取走的变化快递ID
+        self._unseen_reload = False  # 取走之前是否重新加载过全部数据
+        self._create_indexes()
+        self._report_progress("正在读取人物数据...")
+        self.load_user()
+        self._report_progress("正在读取快递数据...")
+        self.load_exprss()
+        # 数据加载完成后，写操作交给后台线程
+        self.persistence = PersistenceWorker(self.storage, load_snapshot=self._load_snapshot)
+        if archive_after_days is not None:
+            self._report_progress("正在归档已取件的快递...")
+            self.archive_picked_up(archive_after_days)
+        self._report_progress("加载完成", 1.0)
+        self._progress = None  # 之后 reload() 重新加载时不再报告
+
+    def _report_progress(self, message, fraction=None):
+        if self._progress is not None:
+            self._progress(message, fraction)
+
+    def _create_indexes(self):
+        self.pick_codes = PickCodeAllocator()  # 取件码分配器
+        self.express_index = ExpressIndex()  # 发件人/收件人/状态 二级索引
+        self.person_search = PrefixIndex()  # 人物ID/姓名 前缀后缀检索
+        self.express_search = PrefixIndex()  # 快递ID/位置/备注 前缀后缀检索
+        self.stats = ShelfStats()  # 货架占用和统计数据
+
+    def _load_snapshot(self):
+        """重新加载全部数据时读取 (人物行列表, 快递行列表)（在持久化线程中调用，见 reload）"""
+        return list(self.storage.load_people()), self.storage.load_express()
+
+    @metrics.timed("load_people")
+    def load_user(self, rows=None):
+        for person_id, name in (self.storage.load_people() if rows is None else rows):
+            self.people_dict[person_id] = Person(person_id, name)
+            self.person_search.add(person_id, person_id, name)
+
+    @metrics.timed("load_express")
+    def load_exprss(self, rows=None):
+        picked_codes = []
+        if rows is None:
+            rows = self.storage.load_express()
+        for i, (express_id, pick_code, sender_id, receiver_id, location, notes, status, picked_at, stored_at) in enumerate(rows):
+            if i % PROGRESS_EVERY == 0:
+                self._report_progress(f"正在建立索引 {i}/{len(rows)}...", i / len(rows))
+            self.express_dict[express_id] = Express(express_id, pick_code, self.people_dict[sender_id], self.people_dict[receiver_id], location, notes, status, picked_at, stored_at)
+            self.express_index.add(self.express_dict[express_id])
+            self.express_search.add(express_id, express_id, location, notes)
+            self.stats.add(self.express_dict[express_id])
+            # 取件码会在取件后重新分配：在库快递优先，已取件的快递只在取件码未被占用时保留查找记录
+            if status == STATUS_IN_STOCK:
+                self.pick_code_dict[pick_code] = express_id
+                if isinstance(pick_code, str):
+                    self.pick_codes.reserve(pick_code)
+            else:
+                self.pick_code_dict.setdefault(pick_code, express_id)
+                picked_codes.append(pick_code)
+        # 已取件的取件码按取件顺序重新进入冷却队列
+        for pick_code in picked_codes[-self.pick_codes.cooldown:]:
+            if isinstance(pick_code, str) and self.pick_codes.reserve(pick_code):
+                self.pick_codes.release(pick_code)
+
+    def apply_person(self, person_id, name):
+        """创建或更新人物，返回是否有变化"""
+        person = self.people_dict.get(person_id)
+        if person is None:
+            self.people_dict[person_id] = Person(person_id, name)
+        elif person.name != name:
+            person.name = name
+        else:
+            return False
+        self.person_search.add(person_id, person_id, name)
+        return True
+
+    @metrics.timed("check_in")
+    def check_in(self, express_id, pick_code, sender_id, sender_name,
+                 receiver_id, receiver_name, location, notes, on_commit=None):
+        """
+        验证并入库一个快递
+
+        参数:
+            pick_code: 6位数字取件码，为空时自动分配
+            on_commit: 写入存储完成后的回调（见 PersistenceWorker.submit）
+
+        返回:
+            成功返回None，失败返回错误信息
+        """
+        status = STATUS_IN_STOCK
+
+        # 验证输入
+        if not all([express_id, sender_id, sender_name, receiver_id, receiver_name, location]):
+            return "请填写所有必填字段！"
+
+        # 检查快递ID是否已存在
+        if self.get_express(express_id) is not None:
+            return f"快递ID {express_id} 已存在！"
+        if self.archive.contains(express_id):
+            return f"快递ID {express_id} 已存在（已归档）！"
+
+        if pick_code:
+            # 验证取件码格式（6位数字）
+            if not re.fullmatch(r'[0-9]{6}', pick_code):
+                return "取件码必须是6位数字！"
+
+            # 刚取件的取件码在冷却中，不能马上给另一个快递（防止拿旧取件码取走新快递）
+            if self.pick_codes.is_cooling(pick_code):
+                return f"取件码 {pick_code} 刚被使用过，请换一个！"
+            # 检查取件码是否已被在库快递占用
+            if not self.pick_codes.reserve(pick_code):
+                return f"取件码 {pick_code} 已存在！"
+        else:
+            try:
+                pick_code = self.pick_codes.allocate()
+            except RuntimeError as e:
+                return str(e)
+
+        # 创建或更新发件人、收件人（姓名有变化时写入存储）
+        for person_id, name in ((sender_id, sender_name), (receiver_id, receiver_name)):
+            if self.apply_person(person_id, name):
+                self.persistence.submit("upsert_person", person_id, name)
+
+        # 创建快递对象
+        sender = self.people_dict[sender_id]
+        receiver = self.people_dict[receiver_id]
+        express = Express(express_id, pick_code, sender, receiver, location, notes, status,
+                          stored_at=time.strftime(TIMESTAMP_FORMAT))
+
+        # 添加到数据存储（人物写入在前，入库提交即表示整个操作已提交）
+        self._add_express(express)
+        self._submit("insert_express", express_id, pick_code, sender_id, receiver_id,
+                     location, notes, status, None, express.stored_at, on_commit=on_commit)
+        return None
+
+    def get_express(self, express_id):
+        """按快递ID取热数据中的快递，不存在时返回None"""
+        return self.express_dict.get(express_id)
+
+    def express_count(self):
+        """热数据中的快递数"""
+        return len(self.express_dict)
+
+    def existing_express_ids(self, express_ids):
+        """返回 express_ids 中已在热数据中的快递ID集合"""
+        return {express_id for express_id in express_ids if express_id in self.express_dict}
+
+    def _find_by_code(self, pick_code):
+        """按取件码查找快递（在库快递优先），不存在时返回None"""
+        express_id = self.pick_code_dict.get(pick_code)
+        return None if express_id is None else self.express_dict[express_id]
+
+    def _add_express(self, express):
+        """把新入库的快递加入内存数据和索引"""
+        self.express_dict[express.express_id] = express
+        self.pick_code_dict[express.pick_code] = express.express_id
+        self.express_index.add(express)
+        self.express_search.add(express.express_id, express.express_id, express.location, express.notes)
+        self.stats.add(express)
+
+    def _mark_picked(self, express):
+        """把快递标记为已取件（更新索引和统计）"""
+        self.express_index.update_status(express.express_id, express.status, STATUS_PICKED_UP)
+        express.status = STATUS_PICKED_UP
+        express.picked_at = time.strftime(TIMESTAMP_FORMAT)
+        self.stats.pick_up(express)
+
+    def _submit(self, method, express_id, *args, on_commit=None):
+        """提交一个快递写操作，并记下它的序号（同步其他实例的修改时不覆盖之后写入的快递，见 refresh）"""
+        self._mark_written(express_id)
+        self.persistence.submit(method, express_id, *args, on_commit=on_commit)
+
+    def _submit_batch(self, operations, express_ids, on_commit=None):
+        """把一组写操作作为一批提交，express_ids 为其中写入的快递"""
+        for express_id in express_ids:
+            self._mark_written(express_id)
+        if operations:
+            self.persistence.submit_batch(operations, on_commit=on_commit)
+        elif on_commit is not None:
+            on_commit(None)
+
+    def _mark_written(self, express_id):
+        self._write_seq += 1
+        self._written[express_id] = self._write_seq
+        return self._write_seq
+
+    @metrics.timed("check_in_batch")
+    def check_in_batch(self, records, on_commit=None):
+        """
+        批量入库已校验过的快递（清单导入），全部写操作作为一组提交，在同一个事务中写入
+
+        参数:
+            records: [(express_id, pick_code, sender_id, sender_name, receiver_id,
+                       receiver_name, location, notes), ...]，pick_code 为空时自动分配
+            on_commit: 整组写入存储完成后的回调（见 PersistenceWorker.submit_batch）
+
+        返回:
+            list: 与 records 一一对应的 (取件码, 错误信息)，成功时错误信息为None，失败时取件码为None
+        """
+        results = []
+        people = {}  # {person_id: name}，同一人物以最后一次出现的姓名为准
+        inserts = []
+        stored_at = time.strftime(TIMESTAMP_FORMAT)
+        for express_id, pick_code, sender_id, sender_name, receiver_id, receiver_name, location, notes in records:
+            # 校验之后内存数据可能已变化（例如柜台同时入库），这里再确认一次
+            if self.get_express(express_id) is not None:
+                results.append((None, f"快递ID {express_id} 已存在！"))
+                continue
+            if self.archive.contains(express_id):
+                results.append((None, f"快递ID {express_id} 已存在（已归档）！"))
+                continue
+            if pick_code:
+                if self.pick_codes.is_cooling(pick_code):
+                    results.append((None, f"取件码 {pick_code} 刚被使用过，请换一个！"))
+                    continue
+                if not self.pick_codes.reserve(pick_code):
+                    results.append((None, f"取件码 {pick_code} 已存在！"))
+                    continue
+            else:
+                try:
+                    pick_code = self.pick_codes.allocate()
+                except RuntimeError as e:
+                    results.append((None, str(e)))
+                    continue
+            for person_id, name in ((sender_id, sender_name), (receiver_id, receiver_name)):
+                if self.apply_person(person_id, name):
+                    people[person_id] = name
+            express = Express(express_id, pick_code, self.people_dict[sender_id],
+                              self.people_dict[receiver_id], location, notes, STATUS_IN_STOCK,
+                              stored_at=stored_at)
+            self._add_express(express)
+            inserts.append(("insert_express", (express_id, pick_code, sender_id, receiver_id,
+                                               location, notes, STATUS_IN_STOCK, None, stored_at)))
+            results.append((pick_code, None))
+        operations = [("upsert_person", item) for item in people.items()] + inserts
+        self._submit_batch(operations, [args[0] for _, args in inserts], on_commit=on_commit)
+        return results
+
+    @metrics.timed("pick_up")
+    def pick_up(self, pick_code, on_commit=None, sync_wait=0):
+        """
+        按取件码取件
+
+        参数:
+            pick_code: 取件码
+            on_commit: 写入存储完成后的回调（见 PersistenceWorker.submit）
+            sync_wait: 取件码在本机不存在时，等待同步其他终端修改的最长秒数（见 refresh）
+
+        返回:
+            tuple: (Express对象或None, 错误信息或None)；
+                   取件码不存在时Express为None，快递已被取走时两者都不为None
+        """
+        try:
+            pick_code = normalize_pick_code(pick_code)
+        except ValueError:
+            return None, "取件码错误，请重新输入！"
+        # 查找快递（本机没有时可能是其他终端刚入库的，同步一次再找）
+        express = self._find_by_code(pick_code)
+        if express is None and self.needs_sync_to_find:
+            self.sync(sync_wait)
+            express = self._find_by_code(pick_code)
+        if express is None:
+            return None, "取件码错误，请重新输入！"
+        if express.status == STATUS_PICKED_UP:
+            return express, "该快递已被取走！"
+        # 更新状态
+        self._mark_picked(express)
+        # 取件码回收，冷却后重新分配
+        self.pick_codes.release(pick_code)
+        self._submit("update_status", express.express_id, express.status, express.picked_at,
+                     on_commit=on_commit)
+        return express, None
+
+    def undo_pick_up(self, express):
+        """
+        撤销写入失败的取件（调用方已向用户报告失败）：快递恢复为在库，失败的写操作不再重试
+
+        快递在此期间已被同步来的数据替换时不做处理。
+        """
+        if self.get_express(express.express_id) is not express or express.status != STATUS_PICKED_UP:
+            return
+        self.persistence.discard_failed(express.express_id)
+        row = self._express_to_row(express)
+        self._replace_express(express.express_id, row[:6] + (STATUS_IN_STOCK, None, row[8]))
+
+    def undo_check_in(self, express_id):
+        """撤销写入失败的入库（调用方已向用户报告失败）：从内存中删除快递，失败的写操作不再重试"""
+        self.persistence.discard_failed(express_id)
+        self._replace_express(express_id, None)
+
+    @metrics.timed("query")
+    def query(self, query_text, in_stock_only=False, include_archive=False):
+        """
+        按快递ID/发件人ID/收件人ID查询
+
+        参数:
+            query_text: 查询条件
+            in_stock_only: 只查询该收件人的在库快递
+            include_archive: 同时查询已归档的快递（按需读取归档文件，较慢）
+
+        返回:
+            list: Express对象列表，归档中的快递排在最后
+        """
+        results = self._query_hot(query_text, in_stock_only)
+        if include_archive and not in_stock_only:
+            rows = self.archive.find(express_id=query_text) + self.archive.find(person_id=query_text)
+            seen = {express.express_id for express in results}
+            for row in rows:
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    results.append(self._express_from_row(row))
+        return results
+
+    def _query_hot(self, query_text, in_stock_only):
+        """在热数据中查询（参数同 query），返回 Express 对象列表"""
+        if in_stock_only:
+            express_ids = self.express_index.in_stock_for_receiver(query_text)
+        else:
+            express_ids = self.express_index.query(query_text)
+            if query_text in self.express_dict and query_text not in express_ids:
+                express_ids.insert(0, query_text)
+        return [self.express_dict[express_id] for express_id in express_ids]
+
+    def _person(self, person_id):
+        person = self.people_dict.get(person_id)
+        return person if person is not None else Person(person_id, "")
+
+    def _express_from_row(self, row):
+        """用归档中的快递行创建 Express 对象（不加入内存数据）"""
+        express_id, pick_code, sender_id, receiver_id, location, notes, status, picked_at, stored_at = row
+        return Express(express_id, pick_code, self._person(sender_id), self._person(receiver_id),
+                       location, notes, status, picked_at, stored_at)
+
+    @staticmethod
+    def _express_to_row(express):
+        return (express.express_id, express.pick_code, express.sender.id, express.receiver.id,
+                express.location, express.notes, express.status, express.picked_at,
+                express.stored_at)
+
+    @metrics.timed("archive")
+    def archive_picked_up(self, older_than_days=ARCHIVE_AFTER_DAYS, now=None, include_undated=False):
+        """
+        把取件时间早于 older_than_days 天前的快递移入归档，热数据只保留在库和最近取件的快递
+
+        没有取件时间的旧数据（加入取件时间之前的已取件快递）默认保留在热数据中，
+        需要时传 include_undated=True 一次性归档（归档在 undated 分区）。
+        先写归档文件（已落盘），再从内存和存储中删除。
+
+        参数:
+            older_than_days: 取件后保留在热数据中的天数
+            now: 当前时间戳（秒），默认为当前时间
+            include_undated: 是否同时归档没有取件时间的已取件快递
+
+        返回:
+            int: 归档的快递数
+        """
+        now = time.time() if now is None else now
+        cutoff = time.strftime(TIMESTAMP_FORMAT, time.localtime(now - older_than_days * 86400))
+        expired = self._find_expired(cutoff, include_undated)
+        if not expired:
+            return 0
+        self.archive.append([self._express_to_row(express) for express in expired])
+        for express in expired:
+            self._remove_express(express)
+            self._submit("delete_express", express.express_id)
+        return len(expired)
+
+    def _find_expired(self, cutoff, include_undated):
+        """取件时间早于 cutoff 的已取件快递（见 archive_picked_up）"""
+        expired = [self.express_dict[express_id]
+                   for express_id in self.express_index.by_status.get(STATUS_PICKED_UP, {})]
+        return [express for express in expired
+                if (express.picked_at < cutoff if express.picked_at is not None else include_undated)]
+
+    def _remove_express(self, express):
+        """把已归档的快递从内存数据和索引中删除"""
+        express_id = express.express_id
+        del self.express_dict[express_id]
+        self.express_index.remove(express)
+        self.express_search.remove(express_id)
+        self.stats.remove(express)
+        if self.pick_code_dict.get(express.pick_code) == express_id:
+            del self.pick_code_dict[express.pick_code]
+
+    @metrics.timed("refresh")
+    def refresh(self):
+        """
+        同步共用同一份数据的其他程序实例（其他柜台）写入的修改，只更新变化的人物和快递
+
+        本实例写入冲突的快递也在这里按存储中的数据更正。
+        读取在持久化线程中进行（排在本实例已提交的写操作之后），这里不访问存储：
+        应用上一次请求读到的修改，再发出下一次读取请求。
+        读到的数据早于之后本实例提交的写操作，这些快递不按读到的数据覆盖
+        （写入冲突时存储会再次报告它们）。
+
+        返回:
+            list: 本次应用的变化快递ID；重新加载了全部数据时返回 None。
+                  变化也累计起来供 take_changes 取走（界面据此刷新列表）
+        """
+        if self._poll_seq is None:
+            self._request_changes()
+        if not self.persistence.changes_ready.is_set():
+            return []
+        seq = self._poll_seq
+        self._applied_polls = self._poll_count
+        changed = []
+        for changes, snapshot in self.persistence.take_changes():
+            if changes is None:
+                self.reload(snapshot)
+                changed = None
+                continue
+            people, express = changes
+            for person_id, name in people.items():
+                self.apply_person(person_id, name)
+            for express_id, row in express.items():
+                if self._written.get(express_id, 0) > seq:
+                    continue
+                self._replace_express(express_id, row)
+                if changed is not None:
+                    changed.append(express_id)
+        self._written = {express_id: n for express_id, n in self._written.items() if n > seq}
+        if changed is None:
+            self._unseen_reload = True
+            self._unseen.clear()
+        elif not self._unseen_reload:
+            self._unseen.update(changed)
+            if len(self._unseen) > UNSEEN_CHANGES_LIMIT:
+                self._unseen_reload = True
+                self._unseen.clear()
+        self._request_changes()
+        return changed
+
+    def _request_changes(self):
+        self._poll_seq = self._write_seq
+        self._poll_count += 1
+        self.persistence.request_changes()
+
+    def sync_steps(self):
+        """
+        sync 的步骤（生成器）：每次产出后调用方等待 persistence.changes_ready，
+        结束时已应用一次在本次调用之后发出的读取（进行中的读取请求可能早于其他实例的修改）
+        """
+        start = self._poll_count
+        self.refresh()
+        while self._applied_polls <= start:
+            yield
+            self.refresh()
+
+    def sync(self, timeout):
+        """等待并应用本次调用之后读取到的其他实例的修改（最多等待 timeout 秒）"""
+        deadline = time.monotonic() + timeout
+        for _ in self.sync_steps():
+            if not self.persistence.changes_ready.wait(max(deadline - time.monotonic(), 0)):
+                return
+
+    def take_changes(self):
+        """
+        取走 refresh 累计的变化（取件时的同步也会累计，界面定时取走并刷新列表）
+
+        返回:
+            list: 变化的快递ID；期间重新加载过全部数据（或变化太多）时返回 None
+        """
+        if self._unseen_reload:
+            self._unseen_reload = False
+            return None
+        changed, self._unseen = list(self._unseen), set()
+        return changed
+
+    def reload(self, snapshot=None):
+        """
+        重新加载全部数据（express_dict 等字典原地清空，界面持有的引用仍然有效）
+
+        参数:
+            snapshot: (人物行列表, 快递行列表)，默认从存储读取
+        """
+        people, express = snapshot if snapshot is not None else (None, None)
+        self.people_dict.clear()
+        self.express_dict.clear()
+        self.pick_code_dict.clear()
+        self._create_indexes()
+        self.load_user(people)
+        self.load_exprss(express)
+
+    def _replace_express(self, express_id, row):
+        """用存储中的最新数据替换内存中的一个快递，row 为 None 表示已被删除"""
+        old = self.express_dict.pop(express_id, None)
+        if old is not None:
+            self.express_index.remove(old)
+            self.express_search.remove(express_id)
+            self.stats.remove(old)
+            if self.pick_code_dict.get(old.pick_code) == express_id:
+                del self.pick_code_dict[old.pick_code]
+                if old.status == STATUS_IN_STOCK:
+                    self.pick_codes.release(old.pick_code)
+        if row is None:
+            return
+        express = self._express_from_row(row)
+        self.express_dict[express_id] = express
+        self.express_index.add(express)
+        self.express_search.add(express_id, express_id, express.location, express.notes)
+        self.stats.add(express)
+        if express.status == STATUS_IN_STOCK:
+            self.pick_code_dict[express.pick_code] = express_id
+            if isinstance(express.pick_code, str):
+                self.pick_codes.reserve(express.pick_code)
+        else:
+            self.pick_code_dict.setdefault(express.pick_code, express_id)
+
+    def create_list_model(self):
+        """创建界面快递列表的数据模型"""
+        return ExpressListModel(self.express_dict)
+
+    def suggest_location(self, candidates=None):
+        """推荐在库快递最少的货架作为入库位置（见 ShelfStats.suggest_shelf）"""
+        return self.stats.suggest_shelf(candidates)
+
+    def _search_ids(self, token):
+        """逐个产出与一个检索词匹配的快递ID（可能重复）：先按人物（收件人、发件人），再按快递ID/位置/备注"""
+        for person_id in self.person_search.iter_matches(token):
+            yield from self.express_index.by_receiver.get(person_id, ())
+            yield from self.express_index.by_sender.get(person_id, ())
+        yield from self.express_search.iter_matches(token)
+
+    @metrics.timed("search")
+    def search(self, text, limit=SEARCH_LIMIT, in_stock_only=False):
+        """
+        即时搜索：按姓名、人物ID、快递ID、位置、备注的开头或结尾匹配
+
+        输入多个词（空格分隔）时，返回同时匹配全部词的快递。
+        找够 limit 个就停止，每次按键只需要访问很少的数据。
+        取件只改变状态，不需要更新检索索引；in_stock_only 在返回前按当前状态过滤。
+
+        参数:
+            text: 输入内容（不区分大小写）
+            limit: 最多返回的快递数，None 表示不限
+            in_stock_only: 只返回在库快递
+
+        返回:
+            list: Express对象列表
+        """
+        tokens = text.split()
+        if not tokens:
+            return []
+        # 其余各词的匹配集合（只有多个词时才需要完整计算）
+        required = [set(self._search_ids(token)) for token in tokens[1:]]
+        results = {}
+        for express_id in self._search_ids(tokens[0]):
+            if express_id in results or not all(express_id in ids for ids in required):
+                continue
+            express = self.express_dict[express_id]
+            if in_stock_only and express.status != STATUS_IN_STOCK:
+                continue
+            results[express_id] = express
+            if limit is not None and len(results) >= limit:
+                break
+        return list(results.values())
+
+    def close(self):
+        """写完全部待写入的数据并关闭存储（可重复调用）"""
+        self.persistence.close()
+
+
+class SqlExpressStation(ExpressStation):
+    """
+    SQLite 后端的业务核心：快递不读入内存，取件、查询、列表、搜索和统计都走库中的索引
+
+    接口同 ExpressStation（界面和取件服务不需要区分），启动只读取人物和重建取件码分配器需要的取件码。
+    写操作仍由 PersistenceWorker 在后台提交；提交之前，本实例修改过的快递保存在待提交表中，
+    查找时覆盖库中的同一行，因此刚入库的快递可以马上取件，刚取走的快递不会被再取一次。
+    其他实例入库的快递直接在库中查到，取件时不需要先同步。
+
+    人物和取件码分配器仍在内存中；其他实例删除在库快递（撤销入库）时本机不知道它的取件码，
+    该取件码要到下次启动才能重新分配。
+    """
+
+    needs_sync_to_find = False
+
+    def __init__(self, storage=None, archive=None, archive_after_days=ARCHIVE_AFTER_DAYS, progress=None):
+        self._pending_lock = threading.Lock()  # 待提交表由提交回调在持久化线程中更新
+        self._pending = {}  # {express_id: 本机修改后尚未提交的 Express 对象，已删除时为None}
+        self._pending_seq = {}  # {express_id: 最近一次写操作的序号}，提交回调据此判断是否还有更新的写操作
+        self._committed = set()  # 已提交、尚未被 take_changes 取走的本机修改的快递ID
+        self._committed_overflow = False
+        super().__init__(storage if storage is not None else open_storage("sqlite"),
+                         archive, archive_after_days, progress)
+        # 快递不在内存中，防止误用
+        self.express_dict = None
+        self.pick_code_dict = None
+
+    def _create_indexes(self):
+        self.pick_codes = PickCodeAllocator()
+        self.person_search = PrefixIndex()
+        self.stats = SqlShelfStats(self.storage)
+
+    def _load_snapshot(self):
+        return list(self.storage.load_people()), None
+
+    @metrics.timed("load_express")
+    def load_exprss(self, rows=None):
+        """只用取件码重建分配器（在库的占用，最近取件的进入冷却队列）"""
+        in_stock, picked = self.storage.pick_code_state(self.pick_codes.cooldown)
+        for pick_code in in_stock:
+            self.pick_codes.reserve(pick_code)
+        for pick_code in picked:
+            if self.pick_codes.reserve(pick_code):
+                self.pick_codes.release(pick_code)
+
+    def reload(self, snapshot=None):
+        people, _ = snapshot if snapshot is not None else (None, None)
+        self.people_dict.clear()
+        self._create_indexes()
+        self.load_user(people)
+        self.load_exprss()
+
+    def _pending_get(self, express_id):
+        """(是否在待提交表中, Express 对象或None)"""
+        with self._pending_lock:
+            if express_id in self._pending:
+                return True, self._pending[express_id]
+        return False, None
+
+    def _set_pending(self, express_id, express):
+        with self._pending_lock:
+            self._pending[express_id] = express
+            # 先占上即将提交的写操作的序号，之前的写操作提交时不会把这次修改移走
+            self._pending_seq[express_id] = self._write_seq + 1
+
+    def overlay_rows(self, rows):
+        """把库中读到的快递行转换为 Express 对象，用待提交表中的修改覆盖（已删除的去掉）"""
+        with self._pending_lock:
+            pending = dict(self._pending)
+        results = []
+        for row in rows:
+            express = pending[row[0]] if row[0] in pending else self._express_from_row(row)
+            if express is not None:
+                results.append(express)
+        return results
+
+    def _pending_matches(self, predicate):
+        """待提交表中满足条件的快递（本机入库、尚未提交的快递只能在这里找到）"""
+        with self._pending_lock:
+            return [express for express in self._pending.values()
+                    if express is not None and predicate(express)]
+
+    def get_express(self, express_id):
+        found, express = self._pending_get(express_id)
+        if found:
+            return express
+        rows = self.storage.find_express(express_id=express_id)
+        return self._express_from_row(rows[0]) if rows else None
+
+    def express_count(self):
+        return self.storage.count_express()
+
+    def existing_express_ids(self, express_ids):
+        express_ids = set(express_ids)
+        found = self.storage.existing_express_ids(express_ids)
+        with self._pending_lock:
+            for express_id, express in self._pending.items():
+                if express_id in express_ids:
+                    (found.add if express is not None else found.discard)(express_id)
+        return found
+
+    def _find_by_code(self, pick_code):
+        candidates = self.overlay_rows(self.storage.find_express(pick_code=pick_code))
+        seen = {express.express_id for express in candidates}
+        candidates += [express for express in self._pending_matches(lambda e: e.pick_code == pick_code)
+                       if express.express_id not in seen]
+        candidates = [express for express in candidates if express.pick_code == pick_code]
+        for express in candidates:
+            if express.status == STATUS_IN_STOCK:
+                return express
+        return candidates[0] if candidates else None
+
+    def _add_express(self, express):
+        self._set_pending(express.express_id, express)
+
+    def _mark_picked(self, express):
+        express.status = STATUS_PICKED_UP
+        express.picked_at = time.strftime(TIMESTAMP_FORMAT)
+        self._set_pending(express.express_id, express)
+
+    def _remove_express(self, express):
+        self._set_pending(express.express_id, None)
+
+    def _committed_callback(self, written, on_commit):
+        """
+        包装 on_commit：写入提交（或与其他实例冲突，以库中的数据为准）后把快递移出待提交表
+
+        参数:
+            written: [(express_id, 写操作序号), ...]
+        """
+        def committed(error):
+            if error is None or isinstance(error, WriteConflict):
+                with self._pending_lock:
+                    for express_id, seq in written:
+                        if self._pending_seq.get(express_id) == seq:
+                            del self._pending_seq[express_id]
+                            self._pending.pop(express_id, None)
+                        self._committed.add(express_id)
+                    if len(self._committed) > UNSEEN_CHANGES_LIMIT:
+                        self._committed.clear()
+                        self._committed_overflow = True
+            if on_commit is not None:
+                on_commit(error)
+        return committed
+
+    def _mark_written(self, express_id):
+        seq = super()._mark_written(express_id)
+        with self._pending_lock:
+            self._pending_seq[express_id] = seq
+        return seq
+
+    def _submit(self, method, express_id, *args, on_commit=None):
+        seq = self._mark_written(express_id)
+        self.persistence.submit(method, express_id, *args,
+                                on_commit=self._committed_callback([(express_id, seq)], on_commit))
+
+    def _submit_batch(self, operations, express_ids, on_commit=None):
+        written = [(express_id, self._mark_written(express_id)) for express_id in express_ids]
+        if operations:
+            self.persistence.submit_batch(operations, on_commit=self._committed_callback(written, on_commit))
+        elif on_commit is not None:
+            on_commit(None)
+
+    def _sync_pick_code(self, pick_code):
+        """按当前数据更正分配器中一个取件码的状态（有在库快递时占用，否则释放进入冷却）"""
+        holder = self._find_by_code(pick_code)
+        if holder is not None and holder.status == STATUS_IN_STOCK:
+            self.pick_codes.reserve(pick_code)
+        else:
+            self.pick_codes.release(pick_code)
+
+    def _replace_express(self, express_id, row):
+        """库中的数据已是最新（同步来的修改或撤销失败的写操作）：移出待提交表，并更正取件码"""
+        with self._pending_lock:
+            old = self._pending.pop(express_id, None)
+            self._pending_seq.pop(express_id, None)
+        codes = {row[1]} if row is not None else set()
+        if old is not None:
+            codes.add(old.pick_code)
+        for pick_code in codes:
+            self._sync_pick_code(pick_code)
+
+    def _query_hot(self, query_text, in_stock_only):
+        if in_stock_only:
+            rows = [row for row in self.storage.find_express(person_id=query_text, status=STATUS_IN_STOCK)
+                    if row[3] == query_text]
+
+            def matches(express):
+                return express.receiver.id == query_text
+        else:
+            rows = self.storage.find_express(express_id=query_text)
+            rows += [row for row in self.storage.find_express(person_id=query_text) if row[0] != query_text]
+
+            def matches(express):
+                return query_text in (express.express_id, express.sender.id, express.receiver.id)
+        seen = {row[0] for row in rows}
+        results = self.overlay_rows(rows)
+        results += [express for express in self._pending_matches(matches) if express.express_id not in seen]
+        # 待提交的取件改变了状态
+        return [express for express in results if not in_stock_only or express.status == STATUS_IN_STOCK]
+
+    def _find_expired(self, cutoff, include_undated):
+        return [express for express in self.overlay_rows(self.storage.find_picked_before(cutoff, include_undated))
+                if express.status == STATUS_PICKED_UP]
+
+    @metrics.timed("search")
+    def search(self, text, limit=SEARCH_LIMIT, in_stock_only=False):
+        """
+        即时搜索（参数同 ExpressStation.search），由 SqliteStorage.search_express 在库中完成
+
+        各词在姓名、人物ID、快递ID、位置、备注中任意位置出现即匹配（包含开头或结尾匹配）；
+        本机入库的快递在写入提交后才能搜到。
+        """
+        tokens = text.split()
+        if not tokens:
+            return []
+        with self._pending_lock:
+            extra = len(self._pending)  # 待提交的修改可能让库中的行不再符合条件，多取几行
+        rows = self.storage.search_express(tokens, None if limit is None else limit + extra, in_stock_only)
+        results = [express for express in self.overlay_rows(rows)
+                   if not in_stock_only or express.status == STATUS_IN_STOCK]
+        return results if limit is None else results[:limit]
+
+    def take_changes(self):
+        """同 ExpressStation.take_changes，另外包括本机已提交的修改（新入库的快递提交后才出现在列表中）"""
+        with self._pending_lock:
+            committed, self._committed = self._committed, set()
+            overflow, self._committed_overflow = self._committed_overflow, False
+        if overflow:
+            self._unseen_reload = True
+            self._unseen.clear()
+        elif not self._unseen_reload:
+            self._unseen.update(committed)
+        return super().take_changes()
+
+    def create_list_model(self):
+        return SqlExpressListModel(self)
+
+
+def open_station(storage=None, **kwargs):
+    """
+    按存储后端创建业务核心：SQLite 存储使用 SqlExpressStation，其余使用 ExpressStation
+
+    参数:
+        storage: 存储对象，默认按 STORAGE_BACKEND 打开
+        kwargs: 传给业务核心的其他参数（archive、archive_after_days、progress）
+    """
+    if isinstance(storage, SqliteStorage) or (storage is None and STORAGE_BACKEND == "sqlite"):
+        return SqlExpressStation(storage, **kwargs)
+    return ExpressStation(storage, **kwargs)
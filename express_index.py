@@ -0,0 +1,65 @@
+from collections import defaultdict
+from models import STATUS_IN_STOCK
+
+
+class ExpressIndex:
+    """
+    快递二级索引
+
+    维护 发件人ID/收件人ID/状态 → 快递ID 的映射，查询时只访问命中的快递。
+    索引值使用 dict 当作有序集合，结果保持入库顺序。
+    入库、取件和加载数据时都必须同步更新索引。
+    """
+
+    def __init__(self):
+        self.by_sender = defaultdict(dict)  # {sender_id: {express_id: None}}
+        self.by_receiver = defaultdict(dict)  # {receiver_id: {express_id: None}}
+        self.by_status = defaultdict(dict)  # {status: {express_id: None}}
+
+    def add(self, express):
+        """把快递加入索引"""
+        self.by_sender[express.sender.id][express.express_id] = None
+        self.by_receiver[express.receiver.id][express.express_id] = None
+        self.by_status[express.status][express.express_id] = None
+
+    def remove(self, express):
+        """把快递从索引中移除"""
+        self.by_sender[express.sender.id].pop(express.express_id, None)
+        self.by_receiver[express.receiver.id].pop(express.express_id, None)
+        self.by_status[express.status].pop(express.express_id, None)
+
+    def update_status(self, express_id, old_status, new_status):
+        """快递状态变化时更新状态索引"""
+        self.by_status[old_status].pop(express_id, None)
+        self.by_status[new_status][express_id] = None
+
+    def query(self, query_text):
+        """
+        按快递ID/发件人ID/收件人ID查询
+
+        参数:
+            query_text: 查询条件
+
+        返回:
+            list: 命中的快递ID（不含快递ID本身的精确匹配，由调用方直接查字典）
+        """
+        ids = dict(self.by_sender.get(query_text, {}))
+        ids.update(self.by_receiver.get(query_text, {}))
+        return list(ids)
+
+    def in_stock_for_receiver(self, receiver_id):
+        """
+        查询某收件人的在库快递
+
+        参数:
+            receiver_id: 收件人ID
+
+        返回:
+            list: 在库快递ID
+        """
+        received = self.by_receiver.get(receiver_id, {})
+        in_stock = self.by_status.get(STATUS_IN_STOCK, {})
+        # 遍历较小的集合
+        if len(received) <= len(in_stock):
+            return [express_id for express_id in received if express_id in in_stock]
+        return [express_id for express_id in in_stock if express_id in received]
@@ -0,0 +1,241 @@
+import heapq
+
+import metrics
+
+LIST_COLUMNS = ("快递ID", "取件码", "发件人", "收件人", "位置", "备注", "状态")
+PAGE_SIZE = 500  # 列表每页显示的行数
+REINSERT_LIMIT = 1000  # 同步来的修改超过这个数量时直接重新筛选排序
+
+
+def express_row(express):
+    """把快递转换为列表的一行"""
+    return (
+        express.express_id,
+        express.pick_code,
+        f"{express.sender.name}({express.sender.id})",
+        f"{express.receiver.name}({express.receiver.id})",
+        express.location,
+        express.notes,
+        express.status
+    )
+
+
+class ExpressListModel:
+    """
+    快递列表的数据模型
+
+    排序、筛选和分页都在这里完成，界面上的 Treeview 只渲染当前页，
+    入库时增量追加，数据量大时也不需要一次插入全部行。
+    """
+
+    def __init__(self, express_dict, page_size=PAGE_SIZE):
+        self.express_dict = express_dict
+        self.page_size = page_size
+        self.ids = list(express_dict)  # 全部快递ID（入库顺序）
+        self._known = set(self.ids)
+        self.filter_text = ""
+        self.sort_column = None  # LIST_COLUMNS 中的列下标
+        self.sort_reverse = False
+        self.page = 0
+        self._view = None  # 筛选排序后的快递ID缓存
+
+    @metrics.timed("list_rebuild")
+    def rebuild(self):
+        """按 express_dict 重新生成全部数据（刷新按钮使用）"""
+        self.ids = list(self.express_dict)
+        self._known = set(self.ids)
+        self._reset_view()
+
+    def _reset_view(self):
+        """筛选/排序条件或数据变化后，下次访问时重新生成视图"""
+        self._view = None
+
+    def add(self, express_id):
+        """
+        追加一个快递
+
+        已有视图时不重新筛选排序：新行不符合筛选条件时视图不变，
+        排序状态下按排序键二分查找插入位置（与 view 中稳定排序的结果相同）。
+
+        返回:
+            int: 新行在视图中的下标；视图尚未生成或新行被筛选掉时为None
+        """
+        self.ids.append(express_id)
+        self._known.add(express_id)
+        return self._insert_view(express_id)
+
+    def apply_changes(self, express_ids):
+        """
+        应用同步来的其他终端的修改（新增、修改或已删除的快递ID）
+
+        新快递按 add 追加；修改的快递在筛选/排序状态下从视图中取出再按新值插入
+        （排序键相同时排在最后），修改太多时让视图重新生成；已不存在的快递（如被归档）直接删除。
+        """
+        express_ids = list(dict.fromkeys(express_ids))
+        removed = {express_id for express_id in express_ids
+                   if express_id not in self.express_dict and express_id in self._known}
+        if removed:
+            self.ids = [express_id for express_id in self.ids if express_id not in removed]
+            self._known -= removed
+            if self._view is not None:
+                self._view = [express_id for express_id in self._view if express_id not in removed]
+        updated = [express_id for express_id in express_ids
+                   if express_id in self._known and express_id not in removed]
+        if updated and self._view is not None and (self.sort_column is not None or self.filter_text):
+            if len(updated) > REINSERT_LIMIT:
+                self._view = None
+            else:
+                stale = set(updated)
+                self._view = [express_id for express_id in self._view if express_id not in stale]
+                if self.sort_column is None:
+                    # 只筛选时视图保持入库顺序，按在 ids 中的位置合并回去
+                    order = {express_id: i for i, express_id in enumerate(self.ids)}
+                    matched = sorted((express_id for express_id in updated if self._matches(express_id)),
+                                     key=order.get)
+                    self._view = list(heapq.merge(self._view, matched, key=order.get))
+                else:
+                    for express_id in updated:
+                        self._insert_view(express_id)
+        for express_id in express_ids:
+            if express_id in self.express_dict and express_id not in self._known:
+                self.add(express_id)
+
+    def _insert_view(self, express_id):
+        """把一行插入已有视图，返回下标（视图尚未生成或被筛选掉时为None）"""
+        if self._view is None or not self._matches(express_id):
+            return None
+        if self.sort_column is None:
+            self._view.append(express_id)
+            return len(self._view) - 1
+        key = self._sort_key(express_id)
+        lo, hi = 0, len(self._view)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key = self._sort_key(self._view[mid])
+            # 键相同的行保持入库顺序，新行排在它们之后
+            if (key < mid_key) if not self.sort_reverse else (key > mid_key):
+                hi = mid
+            else:
+                lo = mid + 1
+        self._view.insert(lo, express_id)
+        return lo
+
+    def page_start(self):
+        """当前页第一行在视图中的下标"""
+        return self.page * self.page_size
+
+    def _matches(self, express_id):
+        """快递是否符合筛选条件"""
+        text = self.filter_text
+        return not text or any(text in str(value) for value in express_row(self.express_dict[express_id]))
+
+    def _sort_key(self, express_id):
+        return str(express_row(self.express_dict[express_id])[self.sort_column])
+
+    def invalidate(self):
+        """数据变化影响筛选/排序结果时调用"""
+        if self.sort_column is not None or self.filter_text:
+            self._reset_view()
+
+    def set_filter(self, text):
+        """设置筛选条件（匹配任意列的子串）"""
+        self.filter_text = text.strip()
+        self.page = 0
+        self._reset_view()
+
+    def toggle_sort(self, column):
+        """按列排序，重复点击同一列时切换升降序"""
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        self.page = 0
+        self._reset_view()
+
+    def view(self):
+        """筛选排序后的快递ID列表"""
+        if self._view is None:
+            if self.filter_text:
+                ids = [express_id for express_id in self.ids if self._matches(express_id)]
+            else:
+                ids = list(self.ids)
+            if self.sort_column is not None:
+                ids.sort(key=self._sort_key, reverse=self.sort_reverse)
+            self._view = ids
+        return self._view
+
+    def count(self):
+        """筛选后的总行数"""
+        return len(self.view())
+
+    def page_count(self):
+        """总页数（至少1页）"""
+        return max(1, (self.count() + self.page_size - 1) // self.page_size)
+
+    def set_page(self, page):
+        """跳转到指定页（自动限制在有效范围内）"""
+        self.page = min(max(page, 0), self.page_count() - 1)
+
+    def page_rows(self):
+        """
+        当前页的数据
+
+        返回:
+            list: (快递ID, 行数据) 列表
+        """
+        start = self.page_start()
+        return [(express_id, express_row(self.express_dict[express_id]))
+                for express_id in self.view()[start:start + self.page_size]]
+
+
+class SqlExpressListModel(ExpressListModel):
+    """
+    直接从 SQLite 分页读取的快递列表（SqlExpressStation 使用，快递不在内存中）
+
+    筛选、排序和分页都由 SqliteStorage.list_express 在库中完成，每次只读取当前页；
+    总行数缓存到数据变化或筛选条件改变为止。
+    本实例入库的快递在写入提交后才出现在列表中（通过 take_changes 通知界面刷新），
+    已取件但尚未提交的快递按本机的状态显示。
+    """
+
+    def __init__(self, station, page_size=PAGE_SIZE):
+        self.station = station
+        self.page_size = page_size
+        self.filter_text = ""
+        self.sort_column = None
+        self.sort_reverse = False
+        self.page = 0
+        self._count = None  # 筛选后的总行数缓存
+
+    def _reset_view(self):
+        self._count = None
+
+    def rebuild(self):
+        self._reset_view()
+
+    def add(self, express_id):
+        """新行提交后才能从库中读到，这里只让总行数重新计算；总是返回None"""
+        self._reset_view()
+        return None
+
+    def apply_changes(self, express_ids):
+        self._reset_view()
+
+    def invalidate(self):
+        self._reset_view()
+
+    def view(self):
+        """筛选排序后的全部快递ID（需要读取全部行，界面只使用 count 和 page_rows）"""
+        return [row[0] for row in self.station.storage.list_express(
+            self.filter_text, self.sort_column, self.sort_reverse)]
+
+    def count(self):
+        if self._count is None:
+            self._count = self.station.storage.count_express(self.filter_text)
+        return self._count
+
+    def page_rows(self):
+        rows = self.station.storage.list_express(self.filter_text, self.sort_column, self.sort_reverse,
+                                                 self.page_start(), self.page_size)
+        return [(express.express_id, express_row(express)) for express in self.station.overlay_rows(rows)]
@@ -0,0 +1,338 @@
+import asyncio
+import json
+from collections import defaultdict
+from urllib.parse import urlsplit, parse_qs
+import metrics
+from express_core import open_station
+from models import normalize_pick_code
+from storage import WriteConflict
+
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BODY = 1 << 20  # 请求体最大字节数
+REFRESH_INTERVAL = 1.0  # 同步其他程序实例（共用同一份数据的柜台）修改的间隔秒数
+SYNC_WAIT = 0.5  # 取件码不存在时等待同步其他实例修改的最长秒数
+
+CHECK_IN_FIELDS = ("express_id", "pick_code", "sender", "sender_name",
+                   "receiver", "receiver_name", "location", "notes")
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error"}
+
+
+class BadRequest(ValueError):
+    """请求格式错误（请求行、请求头或 Content-Length 无效），status 为响应的状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def express_to_dict(express):
+    """把快递转换为可序列化的字典"""
+    return {
+        "express_id": express.express_id,
+        "pick_code": express.pick_code,
+        "sender": express.sender.id,
+        "sender_name": express.sender.name,
+        "receiver": express.receiver.id,
+        "receiver_name": express.receiver.name,
+        "location": express.location,
+        "notes": express.notes,
+        "status": express.status,
+        "picked_at": express.picked_at,
+        "stored_at": express.stored_at,
+    }
+
+
+class ExpressService:
+    """
+    取件/入库 HTTP/JSON 服务（asyncio）
+
+    多个柜台终端和自助取件机通过本机 HTTP 接口并发访问同一个 ExpressStation：
+        POST /express          入库，请求体字段同 CHECK_IN_FIELDS（pick_code 为空时自动分配）
+        POST /pickup           取件，请求体 {"pick_code": "123456"}
+        GET  /express?q=ID     查询（in_stock=1 只查该收件人的在库快递，archive=1 包括已归档的快递）
+        GET  /stats            货架占用、每日入库/取件数、滞留时间（days=N 指定天数，默认7天）
+        GET  /stats/suggest    推荐在库快递最少的货架
+
+    业务操作在事件循环线程中同步执行，写入交给 PersistenceWorker；
+    响应在写入提交（见 PersistenceWorker 的持久性约定）后才返回。
+    同一个取件码的请求按顺序串行处理，同一快递不会被重复取走。
+    与其他程序实例的修改冲突（例如同一快递已在另一台柜台取件）时返回 409；
+    写入失败时返回 500，并撤销内存中的这次入库或取件。
+    """
+
+    def __init__(self, station):
+        self.station = station
+        self._pick_locks = defaultdict(asyncio.Lock)  # {取件码: asyncio.Lock}
+        self._lock_users = defaultdict(int)  # {取件码: 正在使用该锁的请求数}
+        self._refresh_task = None
+
+    async def start(self, host=HOST, port=PORT):
+        """启动服务（同时定时同步其他实例的修改），返回 asyncio.Server"""
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def _refresh_loop(self):
+        """定时同步其他程序实例的修改（在事件循环线程中执行，与业务操作不会同时进行）"""
+        while True:
+            await asyncio.sleep(REFRESH_INTERVAL)
+            try:
+                self.station.refresh()
+            except Exception as e:
+                print(f"同步其他终端的修改时出错: {e}")
+
+    async def _sync_changes(self, timeout=SYNC_WAIT):
+        """等待并应用之后读取到的其他实例的修改（同 ExpressStation.sync，但不阻塞事件循环）"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        for _ in self.station.sync_steps():
+            while not self.station.persistence.changes_ready.is_set():
+                if loop.time() >= deadline:
+                    return
+                await asyncio.sleep(0.01)
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError as e:
+                    # 请求格式错误（包括请求行或请求头过长），无法继续解析同一连接上的后续请求
+                    self._write_response(writer, getattr(e, "status", 400), {"error": str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except ValueError as e:
+                    status, payload = 400, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_request(reader):
+        """读取一个 HTTP 请求，连接关闭时返回 None，格式错误时抛出 BadRequest"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise BadRequest("请求行格式错误")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, sep, value = line.decode("latin-1").partition(":")
+            if not sep or not key.strip():
+                raise BadRequest("请求头格式错误")
+            headers[key.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            raise BadRequest("Content-Length 无效")
+        length = int(length)
+        if length > MAX_BODY:
+            raise BadRequest("请求体过大", 413)
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive=True):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                "Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+
+    async def dispatch(self, method, target, body):
+        """
+        按路径分发请求
+
+        返回:
+            tuple: (HTTP状态码, 响应字典)
+        """
+        url = urlsplit(target)
+        if url.path == "/express" and method == "GET":
+            params = parse_qs(url.query)
+            query_text = params.get("q", [""])[0].strip()
+            in_stock_only = params.get("in_stock", ["0"])[0] in ("1", "true")
+            include_archive = params.get("archive", ["0"])[0] in ("1", "true")
+            results = self.station.query(query_text, in_stock_only, include_archive) if query_text else []
+            return 200, {"count": len(results),
+                         "results": [express_to_dict(express) for express in results]}
+        if url.path == "/stats" and method == "GET":
+            days = int(parse_qs(url.query).get("days", ["7"])[0])
+            if not 1 <= days <= 366:
+                raise ValueError("days 必须在 1~366 之间")
+            return 200, self.station.stats.summary(days)
+        if url.path == "/stats/suggest" and method == "GET":
+            return 200, {"location": self.station.suggest_location()}
+        if url.path == "/express" and method == "POST":
+            return await self.check_in(self._parse_json(body))
+        if url.path == "/pickup" and method == "POST":
+            return await self.pick_up(self._field(self._parse_json(body), "pick_code"))
+        if url.path in ("/express", "/pickup", "/stats", "/stats/suggest"):
+            return 405, {"error": "不支持的请求方法"}
+        return 404, {"error": "接口不存在"}
+
+    @staticmethod
+    def _parse_json(body):
+        try:
+            data = json.loads(body.decode("utf-8") or "{}")
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("请求体不是有效的JSON")
+        if not isinstance(data, dict):
+            raise ValueError("请求体必须是JSON对象")
+        return data
+
+    @staticmethod
+    def _field(data, key):
+        """请求体中的字符串字段（缺失或为 null 时是空字符串）"""
+        value = data.get(key)
+        return "" if value is None else str(value).strip()
+
+    def _commit_future(self):
+        """创建一个在写入提交后完成的 future 及对应的 on_commit 回调"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def on_commit(error):
+            # 回调在持久化线程中执行，切回事件循环线程设置结果
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(error))
+        return future, on_commit
+
+    async def check_in(self, data):
+        """入库"""
+        fields = [self._field(data, key) for key in CHECK_IN_FIELDS]
+        future, on_commit = self._commit_future()
+        error = self.station.check_in(*fields, on_commit=on_commit)
+        if error:
+            return 400, {"error": error}
+        error = await future
+        if isinstance(error, WriteConflict):
+            return 409, {"error": str(error)}
+        if error:
+            self.station.undo_check_in(fields[0])
+            return 500, {"error": f"写入失败: {error}"}
+        return 201, express_to_dict(self.station.get_express(fields[0]))
+
+    async def pick_up(self, pick_code):
+        """取件（同一取件码串行处理）"""
+        if not pick_code:
+            return 400, {"error": "请输入取件码！"}
+        try:
+            # "12345" 和 "012345" 是同一个取件码，必须使用同一把锁
+            pick_code = normalize_pick_code(pick_code)
+        except ValueError:
+            return 404, {"error": "取件码错误，请重新输入！"}
+        self._lock_users[pick_code] += 1
+        try:
+            async with self._pick_locks[pick_code]:
+                future, on_commit = self._commit_future()
+                express, error = self.station.pick_up(pick_code, on_commit=on_commit)
+                if express is None and self.station.needs_sync_to_find:
+                    # 可能是其他终端刚入库的快递，同步后再找一次
+                    await self._sync_changes()
+                    express, error = self.station.pick_up(pick_code, on_commit=on_commit)
+                if error:
+                    return (404 if express is None else 409), {"error": error}
+                error = await future
+                if isinstance(error, WriteConflict):
+                    return 409, {"error": str(error)}
+                if error:
+                    self.station.undo_pick_up(express)
+                    return 500, {"error": f"写入失败: {error}"}
+                return 200, {"message": f"取件成功，请与【{express.location}】取走您的快递！",
+                             "express": express_to_dict(express)}
+        finally:
+            # 没有请求再使用这个取件码时释放锁对象
+            self._lock_users[pick_code] -= 1
+            if not self._lock_users[pick_code]:
+                del self._lock_users[pick_code]
+                del self._pick_locks[pick_code]
+
+
+class ServiceClient:
+    """
+    服务的本地客户端（保持长连接），用于终端程序和测试
+
+    用法:
+        client = ServiceClient()
+        status, data = await client.request("POST", "/pickup", {"pick_code": "123456"})
+        await client.close()
+    """
+
+    def __init__(self, host=HOST, port=PORT):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+    async def request(self, method, path, payload=None):
+        """
+        发送请求
+
+        返回:
+            tuple: (HTTP状态码, 响应字典)
+        """
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+        self._writer.write(head.encode("latin-1") + body)
+        await self._writer.drain()
+        status_line = await self._reader.readline()
+        status = int(status_line.split()[1])
+        length = 0
+        while True:
+            line = await self._reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            if key.strip().lower() == "content-length":
+                length = int(value)
+        data = await self._reader.readexactly(length)
+        return status, json.loads(data.decode("utf-8"))
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            await self._writer.wait_closed()
+            self._writer = None
+
+
+async def serve(host=HOST, port=PORT):
+    """运行服务直到被中断"""
+    metrics.configure_from_env()
+    station = open_station()
+    server = await ExpressService(station).start(host, port)
+    print(f"快递服务已启动: http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        station.close()
+
+
+# 使用示例
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT = 30.0  # 等待其他程序释放锁的最长秒数
+
+
+class FileLock:
+    """
+    跨进程文件锁（同一共享文件夹中的多个程序实例互斥写入）
+
+    POSIX 上用 fcntl.lockf（网络文件系统也支持），Windows 上用 msvcrt.locking 锁住锁文件的第一个字节。
+    同一实例内可重入：持有锁时再次进入只增加计数（例如写入时触发压缩）。
+
+    用法:
+        lock = FileLock("express.lock")
+        with lock:
+            ...
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._thread_lock = threading.RLock()  # 同一进程内的线程之间互斥
+        self._depth = 0
+        self._file = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._acquire_file()
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def _acquire_file(self):
+        f = open(self.path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    f.close()
+                    raise TimeoutError(f"等待文件锁超时: {self.path}")
+                time.sleep(0.01)
+        self._file = f
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            f, self._file = self._file, None
+            try:
+                if fcntl is not None:
+                    fcntl.lockf(f, fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                f.close()
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+_shared = {}  # {锁文件绝对路径: FileLock}
+_shared_guard = threading.Lock()
+
+
+def shared_lock(path):
+    """
+    同一锁文件在进程内只使用一个 FileLock 对象
+
+    fcntl 的记录锁属于整个进程，同一进程内用两个对象锁同一个文件不会互斥，
+    关闭其中一个文件还会释放另一个的锁。
+    """
+    key = os.path.abspath(path)
+    with _shared_guard:
+        lock = _shared.get(key)
+        if lock is None:
+            lock = _shared[key] = FileLock(key)
+        return lock
@@ -0,0 +1,179 @@
+import json
+import os
+
+
+class OperationJournal:
+    """
+    只追加的操作日志
+
+    每条操作记录为一行 JSON，写入后立即 flush + fsync，
+    因此每次入库/取件只需一次小的追加写，而不必重写整个 Excel 文件。
+    启动时先读取快照（xlsx），再按顺序重放日志中的记录；
+    定期压缩（compaction）时把内存数据写回快照并开始新一代日志。
+
+    记录类型:
+        generation: 日志代次 {"op": "generation", "generation"}，压缩后新日志的第一行
+        person: 新建或更新人物 {"op": "person", "id", "name"}
+        insert: 快递入库 {"op": "insert", "express_id", "pick_code", "sender",
+                "receiver", "location", "notes", "status", "picked_at", "stored_at"}
+        status: 快递状态变更 {"op": "status", "express_id", "status", "picked_at"}
+        delete: 快递归档后删除 {"op": "delete", "express_id"}
+
+    所有记录都是幂等的（按主键覆盖），压缩过程中途崩溃后重复重放也不会出错。
+
+    多个程序实例共用同一个日志（写入时由调用方加锁，见 ExcelStorage）:
+        各实例记住自己已读到的 (代次, 字节位置)，只读取之后其他实例追加的记录；
+        压缩时当前日志改名为 .prev 而不是清空，落后一代的实例先读完 .prev 中剩余的记录，
+        落后更多时只能重新读取快照。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.prev_path = path + ".prev"
+        self.count = 0  # 当前这一代日志中的记录数
+        self.generation = 0  # 没有代次记录的日志（旧版本或从未压缩过）为第0代
+        self.offset = 0  # 已读取或写入到的字节位置
+        self._signature = None  # 上次读写后日志文件的 (大小, 修改时间, inode)
+
+    def append(self, op, **fields):
+        """
+        追加一条记录并落盘
+
+        参数:
+            op: 记录类型（person/insert/status/delete）
+            fields: 记录字段
+        """
+        record = {"op": op}
+        record.update(fields)
+        self.append_many([record])
+
+    def append_many(self, records):
+        """
+        追加多条记录，只落盘一次（组提交）
+
+        每次追加都重新打开文件：其他实例压缩后日志会被改名，不能一直持有旧文件。
+
+        参数:
+            records: 记录字典列表，每条都包含 "op" 字段
+        """
+        if not records:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(self.path, "ab") as f:
+            if f.tell() > self.offset:
+                # 上次崩溃留下了未写完的行，另起一行，读取时跳过那一行
+                data = "\n" + data
+            f.write(data.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            self.offset = f.tell()
+        self.count += len(records)
+        self._signature = self._stat()
+
+    @staticmethod
+    def _read(path, offset):
+        """
+        从 offset 开始读取完整的记录行
+
+        返回:
+            tuple: (代次, 记录列表, 读到的字节位置)；文件不存在时为 (None, [], 0)
+        """
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None, [], 0
+        with f:
+            generation = 0
+            first = f.readline()
+            if first.endswith(b"\n"):
+                try:
+                    header = json.loads(first)
+                except ValueError:
+                    header = None
+                if isinstance(header, dict) and header.get("op") == "generation":
+                    generation = header["generation"]
+            f.seek(offset)
+            records = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # 只可能是正在写入或崩溃时未写完的最后一行
+                offset += len(line)
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃留下的半行，之后的记录另起一行写入
+                if record.get("op") != "generation":
+                    records.append(record)
+        return generation, records, offset
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def replay(self):
+        """
+        按写入顺序读取日志中的全部记录
+
+        返回:
+            list: 记录字典列表；末尾因崩溃而写了一半的行会被忽略
+        """
+        generation, records, self.offset = self._read(self.path, 0)
+        self.generation = generation or 0
+        self.count = len(records)
+        self._signature = self._stat()
+        return records
+
+    def changed(self):
+        """日志文件在上次读写之后是否有变化（其他实例写入或压缩），只需一次 stat"""
+        return self._stat() != self._signature
+
+    def read_new(self):
+        """
+        读取上次读写之后其他实例追加的记录
+
+        返回:
+            list: 新记录；日志已被压缩且本实例落后超过一代时返回 None（需要重新读取快照）
+        """
+        signature = self._stat()
+        generation, records, offset = self._read(self.path, self.offset)
+        if generation is None:
+            generation = 0
+        if generation == self.generation and offset >= self.offset:
+            self.offset = offset
+        elif generation == self.generation + 1:
+            # 其他实例压缩过一次：先读完上一代日志的剩余部分，再从头读新日志
+            prev_generation, old, _ = self._read(self.prev_path, self.offset)
+            if prev_generation != self.generation:
+                return None
+            _, new, self.offset = self._read(self.path, 0)
+            records = old + new
+            self.generation = generation
+            self.count = 0
+        else:
+            return None
+        self.count += len(records)
+        self._signature = signature
+        return records
+
+    def reset(self):
+        """快照写入完成后开始新一代日志，当前日志改名为 .prev（供落后一代的实例读取）"""
+        if os.path.exists(self.path):
+            os.replace(self.path, self.prev_path)
+        self.generation += 1
+        header = (json.dumps({"op": "generation", "generation": self.generation}) + "\n").encode("utf-8")
+        with open(self.path, "wb") as f:
+            f.write(header)
+            f.flush()
+            os.fsync(f.fileno())
+        self.offset = len(header)
+        self.count = 0
+        self._signature = self._stat()
+
+    def close(self):
+        """关闭日志（每次追加后文件都已关闭，这里无需操作）"""
@@ -1,33 +1,33 @@
 import tkinter as tk
 from tkinter import ttk, messagebox,filedialog
-import re
-import pandas as pd
-import qrcode_load
+import importlib
+import os
+import queue
+import threading
+import time
+import metrics
+from express_core import open_station, SEARCH_LIMIT
+from models import normalize_pick_code
+from express_list_model import LIST_COLUMNS, express_row
 
-class Person:
-    """人物类"""
-    def __init__(self, person_id, name):
-        self.id = person_id
-        self.name = name
-    
-    def __str__(self):
-        return f"{self.name}(ID:{self.id})"
+SEARCH_DELAY_MS = 200  # 即时搜索的防抖延迟（毫秒）
+REFRESH_INTERVAL_MS = 1000  # 同步其他终端修改的间隔（毫秒）
+PICK_UP_SYNC_WAIT = 0.5  # 取件码不存在时等待同步其他终端修改的最长秒数
+SYNC_POLL_MS = 10  # 等待同步时检查读取结果的间隔（毫秒）
+LOAD_POLL_MS = 50  # 启动时检查后台加载进度的间隔（毫秒）
+# 只在点击二维码/清单/扫码按钮时才用到的较重模块（pandas、OpenCV、pyzbar）；
+# 启动时不导入，窗口显示并加载完数据后在后台线程中预先导入
+PREWARM_MODULES = ("manifest_import", "openpyxl", "qrcode_load", "qrcode_scan")
+
+
+def prewarm_imports(modules=PREWARM_MODULES):
+    """在后台线程中预先导入较重的模块，第一次点击相关按钮时不用再等待"""
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception as e:  # 例如缺少 zbar 动态库：只影响二维码功能，使用时再提示
+            print(f"预加载模块 {name} 失败: {e}")
 
-class Express:
-    """快递类"""
-    def __init__(self, express_id, pick_code, sender, receiver, location, notes, status):
-        self.express_id = express_id
-        self.pick_code = pick_code
-        self.sender = sender  # Person对象
-        self.receiver = receiver  # Person对象
-        self.location = location
-        self.notes = notes
-        self.status = status  # 状态：在库/已取件
-    
-    def __str__(self):
-        return (f"快递ID: {self.express_id}, 取件码: {self.pick_code}, "
-                f"发件人: {self.sender}, 收件人: {self.receiver}, "
-                f"位置: {self.location}, 备注: {self.notes}, 状态: {self.status}")
 
 class ExpressManagementSystem:
     """快递管理系统"""
@@ -36,16 +36,18 @@ class ExpressManagementSystem:
         self.root.title("快递管理系统")
         self.root.geometry("800x600")
         
-        # 数据存储
-        self.people_dict = {}  # {person_id: Person对象}
-        self.express_dict = {}  # {express_id: Express对象}
-        self.pick_code_dict = {}  # {pick_code: express_id}
-        
-        # 创建界面
-        self.create_widgets()
-        self.load_user()
-        self.load_exprss()
-        self.update_express_list()
+        # 数据和业务逻辑：在后台线程中加载，窗口先显示加载进度
+        self.station = None  # 加载完成前为None
+        self.list_model = None  # 列表的排序/筛选/分页
+        self.tree_items = {}  # {express_id: Treeview行ID}，只包含当前页
+        self.scanner = None  # 摄像头扫码器（扫码时不为None）
+        self.load_progress = ("正在启动...", None)  # (说明, 完成比例)，由加载线程更新
+        self.load_error = None
+        
+        self.create_loading_frame()
+        self.load_thread = threading.Thread(target=self.load_data, daemon=True)
+        self.load_thread.start()
+        self.root.after(LOAD_POLL_MS, self.poll_data_load)
         # 初始化一些测试数据
         # self.init_test_data()
     
@@ -79,16 +81,71 @@ class ExpressManagementSystem:
     #     # 更新显示
     #     self.update_express_list()
     
-    def load_user(self):
-        self.df_user = pd.read_excel('user.xlsx', header = 0, engine='openpyxl')
-        for k,v in self.df_user.iterrows():
-            self.people_dict[v[0]] = Person(v[0], v[1])
+    def on_close(self):
+        """退出前停止扫码、写完待写入的数据并关闭窗口"""
+        self.shutdown()
+        self.root.destroy()
+    
+    def shutdown(self):
+        """停止扫码并写完全部待写入的数据（可重复调用）"""
+        # 加载过程中关闭窗口：等加载（可能正在归档）完成后再关闭存储
+        self.load_thread.join()
+        self.stop_camera_scan()
+        if self.station is not None:
+            self.station.close()
+    
+    def create_loading_frame(self):
+        """启动时的加载界面（说明文字和进度条）"""
+        self.loading_frame = tk.Frame(self.root)
+        self.loading_frame.pack(expand=1, fill="both")
+        self.loading_label = tk.Label(self.loading_frame, text=self.load_progress[0])
+        self.loading_label.pack(pady=(200, 10))
+        self.loading_bar = ttk.Progressbar(self.loading_frame, length=400, mode="indeterminate")
+        self.loading_bar.pack()
+        self.loading_bar.start(10)
     
-    def load_exprss(self):
-        self.df_express = pd.read_excel('express.xlsx', header = 0, engine='openpyxl')
-        for k,v in self.df_express.iterrows():
-            self.express_dict[v[0]] = Express(v[0], v[1], self.people_dict[v[2]], self.people_dict[v[3]], v[4], v[5], v[6])
-            self.pick_code_dict[v[1]] = v[0]
+    def load_data(self):
+        """后台线程：读取数据并建立索引（完成前界面线程不访问 station）"""
+        try:
+            self.station = open_station(progress=self.set_load_progress)
+        except Exception as e:
+            self.load_error = e
+    
+    def set_load_progress(self, message, fraction):
+        """加载线程报告进度，界面线程在 poll_data_load 中显示"""
+        self.load_progress = (message, fraction)
+    
+    def poll_data_load(self):
+        """显示加载进度，加载完成后创建主界面"""
+        if self.load_thread.is_alive():
+            message, fraction = self.load_progress
+            self.loading_label.config(text=message)
+            if fraction is not None and str(self.loading_bar.cget("mode")) != "determinate":
+                self.loading_bar.stop()
+                self.loading_bar.config(mode="determinate", maximum=1.0)
+            if fraction is not None:
+                self.loading_bar.config(value=fraction)
+            self.root.after(LOAD_POLL_MS, self.poll_data_load)
+            return
+        self.loading_frame.destroy()
+        if self.load_error is not None:
+            messagebox.showerror("错误", f"加载数据失败: {self.load_error}")
+            self.root.destroy()
+            return
+        self.list_model = self.station.create_list_model()
+        self.create_widgets()
+        self.update_express_list()
+        self.update_persistence_status()
+        self.root.after(REFRESH_INTERVAL_MS, self.poll_external_changes)
+        threading.Thread(target=prewarm_imports, daemon=True).start()
+    
+    def require_module(self, name, feature):
+        """导入功能所需的模块（第一次使用时才导入），导入失败时提示并返回None"""
+        try:
+            return importlib.import_module(name)
+        except ImportError as e:
+            messagebox.showerror("错误", f"{feature}不可用: {e}")
+            return None
     
     def create_widgets(self):
         """创建界面组件"""
@@ -113,6 +170,13 @@ class ExpressManagementSystem:
         
         tab_control.pack(expand=1, fill="both")
         
+        # 状态栏：显示后台写入情况
+        status_bar = tk.Frame(self.root)
+        status_bar.pack(side=tk.BOTTOM, fill="x")
+        self.persistence_label = tk.Label(status_bar, text="", anchor="w")
+        self.persistence_label.pack(side=tk.LEFT, padx=5)
+        self.retry_button = tk.Button(status_bar, text="重试失败写入", command=self.retry_failed_writes)
+        
         # 设置各标签页的内容
         self.setup_in_tab()
         self.setup_out_tab()
@@ -130,6 +194,8 @@ class ExpressManagementSystem:
         tk.Label(self.tab_in, text="取件码:").grid(row=1, column=0, padx=5, pady=5, sticky="e")
         self.pick_code_entry = tk.Entry(self.tab_in, width=30)
         self.pick_code_entry.grid(row=1, column=1, padx=5, pady=5)
+        # 不填时入库自动分配
+        tk.Button(self.tab_in, text="生成", command=self.fill_pick_code).grid(row=1, column=2, padx=5, pady=5)
         
         # 发件人ID
         tk.Label(self.tab_in, text="发件人ID:").grid(row=2, column=0, padx=5, pady=5, sticky="e")
@@ -155,6 +221,7 @@ class ExpressManagementSystem:
         tk.Label(self.tab_in, text="摆放位置:").grid(row=6, column=0, padx=5, pady=5, sticky="e")
         self.location_entry = tk.Entry(self.tab_in, width=30)
         self.location_entry.grid(row=6, column=1, padx=5, pady=5)
+        tk.Button(self.tab_in, text="推荐", command=self.fill_location).grid(row=6, column=2, padx=5, pady=5)
         
         # 备注
         tk.Label(self.tab_in, text="备注:").grid(row=7, column=0, padx=5, pady=5, sticky="e")
@@ -171,6 +238,21 @@ class ExpressManagementSystem:
     
         tk.Button(self.tab_in, text="QR码解析", command=self.qr_read, 
                  bg="lightgreen", width=15).grid(row=10, column=0, columnspan=2, pady=10)
+        
+        # 批量入库：解析整个文件夹的快递标签
+        tk.Button(self.tab_in, text="批量QR入库", command=self.qr_batch_check_in, 
+                 bg="lightgreen", width=15).grid(row=11, column=0, columnspan=2, pady=5)
+        self.batch_status_label = tk.Label(self.tab_in, text="")
+        self.batch_status_label.grid(row=12, column=0, columnspan=2)
+        
+        # 摄像头扫码：快递放到摄像头下即自动入库
+        self.camera_button = tk.Button(self.tab_in, text="摄像头扫码", command=self.toggle_camera_scan, 
+                                       bg="lightgreen", width=15)
+        self.camera_button.grid(row=13, column=0, columnspan=2, pady=5)
+        
+        # 快递员提供的清单（CSV/Excel）整批入库
+        tk.Button(self.tab_in, text="导入清单", command=self.import_manifest_file, 
+                 bg="lightgreen", width=15).grid(row=14, column=0, columnspan=2, pady=5)
     def setup_out_tab(self):
         """设置取件标签页"""
         tk.Label(self.tab_out, text="请输入取件码:").pack(pady=10)
@@ -188,9 +270,24 @@ class ExpressManagementSystem:
     def setup_query_tab(self):
         """设置查询标签页"""
         tk.Label(self.tab_query, text="请输入查询条件(快递ID/发件人ID/收件人ID):").pack(pady=10)
+        tk.Label(self.tab_query, text="输入姓名、ID、位置或备注的开头/结尾会即时显示结果，多个词用空格分隔",
+                 fg="gray").pack()
         
         self.query_entry = tk.Entry(self.tab_query, width=30, font=("Arial", 12))
         self.query_entry.pack(pady=10)
+        # 边输入边搜索（防抖：停止输入一小段时间后才搜索）
+        self.search_after_id = None
+        self.query_entry.bind("<KeyRelease>", self.schedule_search)
+        self.query_entry.bind("<Return>", lambda event: self.query_express())
+        
+        # 只看收件人的在库快递（柜台最常用的查询）
+        self.in_stock_only_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.tab_query, text="仅查询该收件人的在库快递",
+                       variable=self.in_stock_only_var, command=self.schedule_search).pack()
+        # 已归档（取件较早）的快递不在内存中，查询时按需读取归档文件
+        self.include_archive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.tab_query, text="包括已归档的快递（点击查询时生效）",
+                       variable=self.include_archive_var).pack()
         
         tk.Button(self.tab_query, text="查询", command=self.query_express, 
                  bg="lightblue", width=15).pack(pady=10)
@@ -207,19 +304,41 @@ class ExpressManagementSystem:
     
     def setup_list_tab(self):
         """设置快递列表标签页"""
+        # 筛选栏
+        filter_frame = tk.Frame(self.tab_list)
+        filter_frame.pack(pady=5, padx=10, fill="x")
+        tk.Label(filter_frame, text="筛选:").pack(side=tk.LEFT)
+        self.list_filter_entry = tk.Entry(filter_frame, width=30)
+        self.list_filter_entry.pack(side=tk.LEFT, padx=5)
+        self.list_filter_entry.bind("<Return>", lambda event: self.apply_list_filter())
+        tk.Button(filter_frame, text="筛选", command=self.apply_list_filter).pack(side=tk.LEFT)
+        
         # 创建树形视图显示快递列表
-        columns = ("快递ID", "取件码", "发件人", "收件人", "位置", "备注", "状态")
+        columns = LIST_COLUMNS
         self.express_tree = ttk.Treeview(self.tab_list, columns=columns, show="headings", height=20)
         
-        # 设置列标题
-        for col in columns:
-            self.express_tree.heading(col, text=col)
+        # 设置列标题（点击标题排序）
+        for i, col in enumerate(columns):
+            self.express_tree.heading(col, text=col, command=lambda i=i: self.sort_express_list(i))
             self.express_tree.column(col, width=100)
         
         self.express_tree.pack(pady=10, padx=10, fill="both", expand=True)
         
-        # 刷新按钮
-        tk.Button(self.tab_list, text="刷新列表", command=self.update_express_list).pack(pady=5)
+        # 分页栏
+        page_frame = tk.Frame(self.tab_list)
+        page_frame.pack(pady=5)
+        tk.Button(page_frame, text="上一页",
+                  command=lambda: self.show_list_page(self.list_model.page - 1)).pack(side=tk.LEFT)
+        self.page_label = tk.Label(page_frame, text="")
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        tk.Button(page_frame, text="下一页",
+                  command=lambda: self.show_list_page(self.list_model.page + 1)).pack(side=tk.LEFT)
+        
+        # 刷新按钮和统计按钮
+        button_frame = tk.Frame(self.tab_list)
+        button_frame.pack(pady=5)
+        tk.Button(button_frame, text="刷新列表", command=self.update_express_list).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="统计", command=self.show_station_stats).pack(side=tk.LEFT, padx=5)
     
     def add_express(self):
         """添加快递入库"""
@@ -232,67 +351,58 @@ class ExpressManagementSystem:
         receiver_name = self.receiver_name_entry.get().strip()
         location = self.location_entry.get().strip()
         notes = self.notes_entry.get().strip()
-        status = "在库"
         
-        # 验证输入
-        if not all([express_id, pick_code, sender_id, sender_name, receiver_id, receiver_name, location]):
-            messagebox.showerror("错误", "请填写所有必填字段！")
+        error = self.check_in(express_id, pick_code, sender_id, sender_name,
+                              receiver_id, receiver_name, location, notes)
+        if error:
+            messagebox.showerror("错误", error)
             return
         
-        # 检查快递ID是否已存在
-        if express_id in self.express_dict:
-            messagebox.showerror("错误", f"快递ID {express_id} 已存在！")
-            return
-        
-        # 检查取件码是否已存在
-        if pick_code in self.pick_code_dict:
-            messagebox.showerror("错误", f"取件码 {pick_code} 已存在！")
+        # 清空输入框
+        self.clear_in_fields()
+        pick_code = self.station.get_express(express_id).pick_code
+        messagebox.showinfo("成功", f"快递 {express_id} 入库成功！取件码: {pick_code}")
+    
+    def fill_pick_code(self):
+        """填入一个未使用的取件码"""
+        try:
+            pick_code = self.station.pick_codes.suggest()
+        except RuntimeError as e:
+            messagebox.showerror("错误", str(e))
             return
-        
-        # 验证取件码格式（6位数字）
-        if not re.match(r'^\d{6}$', pick_code):
-            messagebox.showerror("错误", "取件码必须是6位数字！")
+        self.pick_code_entry.delete(0, tk.END)
+        self.pick_code_entry.insert(0, pick_code)
+    
+    def fill_location(self):
+        """填入在库快递最少的货架"""
+        location = self.station.suggest_location()
+        if location is None:
+            messagebox.showinfo("提示", "还没有可推荐的货架，请手动填写摆放位置")
             return
-        
-        # 创建或更新发件人
-        if sender_id in self.people_dict:
-            # 更新现有发件人姓名（如果有变化）
-            if self.people_dict[sender_id].name != sender_name:
-                self.people_dict[sender_id].name = sender_name
-        else:
-            # 创建新发件人
-            self.people_dict[sender_id] = Person(sender_id, sender_name)
-            self.df_user.loc[len(self.df_user)] = [sender_id, sender_name]
-            self.df_user.to_excel("user.xlsx", index=False, sheet_name='人物数据')
-        
-        # 创建或更新收件人
-        if receiver_id in self.people_dict:
-            # 更新现有收件人姓名（如果有变化）
-            if self.people_dict[receiver_id].name != receiver_name:
-                self.people_dict[receiver_id].name = receiver_name
-        else:
-            # 创建新收件人
-            self.people_dict[receiver_id] = Person(receiver_id, receiver_name)
-            self.df_user.loc[len(self.df_user)] = [receiver_id, receiver_name]
-            self.df_user.to_excel("user.xlsx", index=False, sheet_name='人物数据')
-        
-        # 创建快递对象
-        sender = self.people_dict[sender_id]
-        receiver = self.people_dict[receiver_id]
-        express = Express(express_id, pick_code, sender, receiver, location, notes, status)
-        
-        # 添加到数据存储
-        self.express_dict[express_id] = express
-        self.pick_code_dict[pick_code] = express_id
-        # 更新显示
-        self.df_express.loc[len(self.df_express)] = [express_id, pick_code, sender_id, receiver_id, location, notes, status]
-        self.df_express.to_excel("express.xlsx", index=False, sheet_name='快递数据')
+        self.location_entry.delete(0, tk.END)
+        self.location_entry.insert(0, location)
 
-        self.update_express_list()
-        
-        # 清空输入框
-        self.clear_in_fields()
-        messagebox.showinfo("成功", f"快递 {express_id} 入库成功！")
+    def show_station_stats(self):
+        """显示货架占用、每日入库/取件数和滞留时间"""
+        summary = self.station.stats.summary()
+        dwell = summary["dwell"]
+        lines = [f"在库快递: {summary['in_stock']} 个", "", "各区域在库:"]
+        lines += [f"  {area}: {count}" for area, count in summary["areas"].items()]
+        lines += ["", "最近7天（入库/取件）:"]
+        lines += [f"  {day['date']}: {day['intake']} / {day['pickup']}" for day in summary["daily"]]
+        lines += ["", f"平均滞留时间: {dwell['avg_hours']} 小时（最长 {dwell['max_hours']} 小时）",
+                  f"在库快递平均已存放: {dwell['in_stock_avg_hours']} 小时"]
+        messagebox.showinfo("统计", "\n".join(lines))
+
+    def check_in(self, express_id, pick_code, sender_id, sender_name,
+                 receiver_id, receiver_name, location, notes):
+        """验证并入库一个快递，成功返回None，失败返回错误信息"""
+        error = self.station.check_in(express_id, pick_code, sender_id, sender_name,
+                                      receiver_id, receiver_name, location, notes)
+        if error is None:
+            # 更新显示
+            self.on_express_added(self.station.get_express(express_id))
+        return error
     
     def pick_up_express(self):
         """快递取件"""
@@ -301,30 +411,55 @@ class ExpressManagementSystem:
         if not pick_code:
             messagebox.showerror("错误", "请输入取件码！")
             return
-        pick_code = int(pick_code)
-        # 查找快递
-        if self.pick_code_dict.get(pick_code) is not None:
-            express_id = self.pick_code_dict[pick_code]
-            express = self.express_dict[express_id]
-            
-            if express.status == "已取件":
-                self.result_label.config(text="该快递已被取走！", fg="red")
-            else:
-                # 更新状态
-                express.status = "已取件"
-                self.df_express.loc[self.df_express["express_id"] == express_id, "status"] = '已取件'
-                self.df_express.to_excel("express.xlsx", index=False, sheet_name='快递数据')
-                # 显示成功信息
-                result_text = f"取件成功，请与【{express.location}】取走您的快递！"
-                self.result_label.config(text=result_text, fg="green")
-                
-                # 清空输入框
-                self.pick_code_out_entry.delete(0, tk.END)
-                
-                # 更新显示
-                self.update_express_list()
-        else:
-            self.result_label.config(text="取件码错误，请重新输入！", fg="red")
+        express, error = self.station.pick_up(pick_code)
+        if express is None and self.station.needs_sync_to_find and self._valid_pick_code(pick_code):
+            # 可能是其他终端刚入库的快递：同步后再找一次（定时检查读取结果，不阻塞界面）
+            self.result_label.config(text="正在同步其他终端的数据...", fg="black")
+            self._sync_then_pick_up(pick_code, self.station.sync_steps(),
+                                    time.monotonic() + PICK_UP_SYNC_WAIT)
+            return
+        self.show_pick_up_result(express, error)
+    
+    @staticmethod
+    def _valid_pick_code(pick_code):
+        try:
+            normalize_pick_code(pick_code)
+        except ValueError:
+            return False
+        return True
+    
+    def _sync_then_pick_up(self, pick_code, steps, deadline, waiting=False):
+        """推进一步同步（见 ExpressStation.sync_steps），完成或超时后再取件"""
+        expired = time.monotonic() >= deadline
+        if waiting and not expired and not self.station.persistence.changes_ready.is_set():
+            self.root.after(SYNC_POLL_MS, self._sync_then_pick_up, pick_code, steps, deadline, True)
+            return
+        try:
+            next(steps)
+        except StopIteration:
+            expired = True
+        if not expired:
+            self.root.after(SYNC_POLL_MS, self._sync_then_pick_up, pick_code, steps, deadline, True)
+            return
+        # 同步到的其他终端的修改先更新到列表
+        self.apply_external_changes()
+        express, error = self.station.pick_up(pick_code)
+        self.show_pick_up_result(express, error)
+    
+    def show_pick_up_result(self, express, error):
+        """显示取件结果"""
+        if error:
+            self.result_label.config(text=error, fg="red")
+            return
+        # 显示成功信息
+        result_text = f"取件成功，请与【{express.location}】取走您的快递！"
+        self.result_label.config(text=result_text, fg="green")
+        
+        # 清空输入框
+        self.pick_code_out_entry.delete(0, tk.END)
+        
+        # 更新显示
+        self.on_express_updated(express)
     
     def query_express(self):
         """查询快递"""
@@ -337,13 +472,9 @@ class ExpressManagementSystem:
         # 清空之前的查询结果
         self.query_result_text.delete(1.0, tk.END)
         
-        # 查找匹配的快递
-        results = []
-        for express in self.express_dict.values():
-            if (query_text == express.express_id or 
-                query_text == express.sender.id or 
-                query_text == express.receiver.id):
-                results.append(express)
+        # 通过索引查找匹配的快递
+        results = self.station.query(query_text, self.in_stock_only_var.get(),
+                                     self.include_archive_var.get())
         
         # 显示结果
         if results:
@@ -353,23 +484,136 @@ class ExpressManagementSystem:
         else:
             self.query_result_text.insert(tk.END, "未找到匹配的快递！")
     
+    def schedule_search(self, event=None):
+        """输入变化后延迟执行即时搜索，连续输入时只搜索最后一次"""
+        if event is not None and event.keysym == "Return":
+            return
+        if self.search_after_id is not None:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(SEARCH_DELAY_MS, self.live_search)
+    
+    def live_search(self):
+        """即时搜索并显示前 SEARCH_LIMIT 个结果"""
+        self.search_after_id = None
+        query_text = self.query_entry.get().strip()
+        self.query_result_text.delete(1.0, tk.END)
+        if not query_text:
+            return
+        # 多取一个，用来判断结果是否被截断
+        results = self.station.search(query_text, SEARCH_LIMIT + 1, self.in_stock_only_var.get())
+        if not results:
+            self.query_result_text.insert(tk.END, "未找到匹配的快递！")
+            return
+        if len(results) > SEARCH_LIMIT:
+            self.query_result_text.insert(tk.END, f"匹配的快递超过 {SEARCH_LIMIT} 个，只显示前 {SEARCH_LIMIT} 个，请输入更多内容：\n\n")
+        else:
+            self.query_result_text.insert(tk.END, f"找到 {len(results)} 个匹配的快递：\n\n")
+        self.query_result_text.insert(tk.END, "".join(f"{express}\n\n" for express in results[:SEARCH_LIMIT]))
+    
     def update_express_list(self):
-        """更新快递列表显示"""
-        # 清空现有列表
-        for item in self.express_tree.get_children():
-            self.express_tree.delete(item)
-        
-        # 添加快递数据
-        for express in self.express_dict.values():
-            self.express_tree.insert("", tk.END, values=(
-                express.express_id,
-                express.pick_code,
-                f"{express.sender.name}({express.sender.id})",
-                f"{express.receiver.name}({express.receiver.id})",
-                express.location,
-                express.notes,
-                express.status
-            ))
+        """完整刷新快递列表（按内存数据重新对账）"""
+        with metrics.timer("list_refresh"):
+            self.list_model.rebuild()
+            self.render_express_page()
+    
+    def render_express_page(self):
+        """渲染列表当前页"""
+        self.express_tree.delete(*self.express_tree.get_children())
+        self.tree_items = {}
+        self.list_model.set_page(self.list_model.page)
+        for express_id, row in self.list_model.page_rows():
+            self.tree_items[express_id] = self.express_tree.insert("", tk.END, values=row)
+        self.update_page_label()
+    
+    def update_page_label(self):
+        """更新分页信息"""
+        self.page_label.config(text=f"第 {self.list_model.page + 1}/{self.list_model.page_count()} 页，"
+                                    f"共 {self.list_model.count()} 条")
+    
+    def show_list_page(self, page):
+        """翻页"""
+        self.list_model.set_page(page)
+        self.render_express_page()
+    
+    def sort_express_list(self, column):
+        """按列排序"""
+        self.list_model.toggle_sort(column)
+        self.render_express_page()
+    
+    def apply_list_filter(self):
+        """按筛选条件过滤列表"""
+        self.list_model.set_filter(self.list_filter_entry.get())
+        self.render_express_page()
+    
+    def on_express_added(self, express):
+        """入库后只插入新的一行（不重新筛选排序）"""
+        index = self.list_model.add(express.express_id)
+        if index is not None:
+            start = self.list_model.page_start()
+            if index < start:
+                # 新行排在前面的页中，当前页整体后移一行
+                self.render_express_page()
+                return
+            if index < start + self.list_model.page_size:
+                self.tree_items[express.express_id] = self.express_tree.insert(
+                    "", index - start, values=express_row(express))
+                # 当前页已满时最后一行移到下一页
+                view = self.list_model.view()
+                if len(view) > start + self.list_model.page_size:
+                    item = self.tree_items.pop(view[start + self.list_model.page_size], None)
+                    if item is not None:
+                        self.express_tree.delete(item)
+        self.update_page_label()
+    
+    def on_express_updated(self, express):
+        """状态变化后只更新对应行的状态列"""
+        item = self.tree_items.get(express.express_id)
+        if item is not None:
+            self.express_tree.set(item, "状态", express.status)
+        self.list_model.invalidate()
+    
+    def update_persistence_status(self):
+        """定时刷新状态栏中的待写入/失败/冲突数量"""
+        persistence = self.station.persistence
+        pending = persistence.pending
+        failed = len(persistence.failed)
+        # 与其他终端冲突的操作没有写入，数据已按其他终端的修改更正，只需要提示
+        conflict = (f"  与其他终端冲突: {persistence.conflict_count}（最近: {persistence.conflicts[-1]}）"
+                    if persistence.conflict_count else "")
+        if failed:
+            self.persistence_label.config(
+                text=f"待写入: {pending}  写入失败: {failed}（{persistence.last_error}）{conflict}", fg="red")
+            self.retry_button.pack(side=tk.RIGHT, padx=5)
+        else:
+            self.persistence_label.config(
+                text=(f"待写入: {pending}" if pending else "数据已全部保存") + conflict,
+                fg="red" if conflict else "black")
+            self.retry_button.pack_forget()
+        self.root.after(500, self.update_persistence_status)
+
+    def poll_external_changes(self):
+        """定时同步其他终端（共用同一份数据的程序实例）的修改，有变化时刷新列表"""
+        try:
+            self.station.refresh()
+        except Exception as e:
+            print(f"同步其他终端的修改时出错: {e}")
+        self.apply_external_changes()
+        self.root.after(REFRESH_INTERVAL_MS, self.poll_external_changes)
+    
+    def apply_external_changes(self):
+        """取走已同步的其他终端的修改（包括取件时同步到的），有变化时刷新列表"""
+        changed = self.station.take_changes()
+        if changed is None:
+            self.update_express_list()
+        elif changed:
+            # 只按变化的快递更新列表模型，不重新筛选排序全部数据
+            self.list_model.apply_changes(changed)
+            self.render_express_page()
+    
+    def retry_failed_writes(self):
+        """重新提交写入失败的操作"""
+        self.station.persistence.retry_failed()
+        self.update_persistence_status()
     
     def clear_in_fields(self):
         """清空入库输入框"""
@@ -385,7 +629,14 @@ class ExpressManagementSystem:
         """读取并解析二维码"""
         filepath = tk.filedialog.askopenfilename(title="选择二维码图片", 
                                                filetypes=[("PNG图片", "*.png"), ("所有文件", "*.*")])
+        qrcode_load = self.require_module("qrcode_load", "二维码解析")
+        if qrcode_load is None:
+            return
         info = qrcode_load.read_express_qr_code(filepath)
+        if info is None:
+            messagebox.showerror("错误", "未能读取二维码！")
+            return
+        info = self.complete_names(info)
         self.express_id_entry.insert(0, info['express_id'])
         self.pick_code_entry.insert(0, info['pick_code'])
         self.sender_id_entry.insert(0, info['sender'])
@@ -394,12 +645,180 @@ class ExpressManagementSystem:
         self.receiver_name_entry.insert(0, info['receiver_name'])
         self.location_entry.insert(0, info['location'])
         self.notes_entry.insert(0, info['notes'])
+    
+    def complete_names(self, info):
+        """二维码中没有姓名（紧凑格式可以不含姓名）时，用系统中已登记的人物姓名补全"""
+        info = dict(info)
+        for id_key, name_key in (("sender", "sender_name"), ("receiver", "receiver_name")):
+            person = self.station.people_dict.get(str(info.get(id_key, "")).strip())
+            if person is not None and not str(info.get(name_key, "")).strip():
+                info[name_key] = person.name
+        return info
+    
+    def check_in_record(self, info):
+        """按二维码解析出的字典入库，返回值同 check_in"""
+        info = self.complete_names(info)
+        return self.check_in(*(str(info.get(key, "")).strip() for key in (
+            "express_id", "pick_code", "sender", "sender_name",
+            "receiver", "receiver_name", "location", "notes")))
+    
+    def qr_batch_check_in(self):
+        """选择文件夹，后台多进程解析全部二维码并直接批量入库"""
+        folder = tk.filedialog.askdirectory(title="选择快递标签图片文件夹")
+        if not folder:
+            return
+        qrcode_load = self.require_module("qrcode_load", "二维码解析")
+        if qrcode_load is None:
+            return
+        self.batch_results = queue.Queue()
+        self.batch_summary = {"ok": 0, "failed": []}
+        
+        def worker():
+            for result in qrcode_load.read_express_qr_codes(folder):
+                self.batch_results.put(result)
+            self.batch_results.put(None)  # 结束标记
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.batch_status_label.config(text="正在解析...")
+        self.root.after(100, self.poll_batch_results)
+    
+    def poll_batch_results(self):
+        """在界面线程中处理已解析的结果（入库操作只在界面线程执行）"""
+        while True:
+            try:
+                result = self.batch_results.get_nowait()
+            except queue.Empty:
+                break
+            if result is None:
+                self.finish_batch_check_in()
+                return
+            path, info, error = result
+            if error is None:
+                error = self.check_in_record(info)
+            if error is None:
+                self.batch_summary["ok"] += 1
+            else:
+                self.batch_summary["failed"].append(f"{os.path.basename(path)}: {error}")
+        self.batch_status_label.config(
+            text=f"已入库 {self.batch_summary['ok']} 个，失败 {len(self.batch_summary['failed'])} 个...")
+        self.root.after(100, self.poll_batch_results)
+    
+    def finish_batch_check_in(self):
+        """显示批量入库结果"""
+        ok = self.batch_summary["ok"]
+        failed = self.batch_summary["failed"]
+        self.batch_status_label.config(text=f"批量入库完成：成功 {ok} 个，失败 {len(failed)} 个")
+        message = f"成功入库 {ok} 个快递，失败 {len(failed)} 个。"
+        if failed:
+            message += "\n\n失败明细：\n" + "\n".join(failed[:20])
+            if len(failed) > 20:
+                message += f"\n... 另有 {len(failed) - 20} 个"
+        messagebox.showinfo("批量入库", message)
+    
+    def import_manifest_file(self):
+        """选择清单文件并批量入库，出错的行写入错误报告"""
+        filepath = tk.filedialog.askopenfilename(
+            title="选择快递清单",
+            filetypes=[("清单文件", "*.csv *.xlsx"), ("所有文件", "*.*")])
+        if not filepath:
+            return
+        manifest_import = self.require_module("manifest_import", "清单导入")
+        if manifest_import is None:
+            return
+        self.manifest_result = queue.Queue()
+        
+        def worker():
+            # 读取和格式校验在后台线程中进行，入库仍在界面线程执行
+            try:
+                self.manifest_result.put((manifest_import.load_manifest(filepath), None))
+            except Exception as e:
+                self.manifest_result.put((None, e))
+        
+        threading.Thread(target=worker, daemon=True).start()
+        self.batch_status_label.config(text="正在读取清单...")
+        self.root.after(100, self.poll_manifest_result, manifest_import, filepath)
+    
+    def poll_manifest_result(self, manifest_import, filepath):
+        """清单读取完成后在界面线程中入库并显示结果"""
+        try:
+            chunks, error = self.manifest_result.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self.poll_manifest_result, manifest_import, filepath)
+            return
+        if error is not None:
+            self.batch_status_label.config(text="")
+            messagebox.showerror("错误", f"读取清单失败: {error}")
+            return
+        imported, report = manifest_import.import_loaded(self.station, chunks)
+        self.update_express_list()
+        message = f"成功入库 {imported} 个快递，失败 {len(report)} 行。"
+        if report:
+            path = manifest_import.report_path(filepath)
+            manifest_import.write_report(report, path)
+            message += "\n\n" + "\n".join(f"第{row}行 {express_id}: {error}"
+                                          for row, express_id, error in report[:20])
+            if len(report) > 20:
+                message += f"\n... 另有 {len(report) - 20} 行"
+            message += f"\n\n错误明细已保存到: {path}"
+        self.batch_status_label.config(text=f"清单导入完成：成功 {imported} 个，失败 {len(report)} 行")
+        messagebox.showinfo("导入清单", message)
+    
+    def toggle_camera_scan(self):
+        """开始/停止摄像头扫码"""
+        if self.scanner is not None:
+            self.stop_camera_scan()
+            return
+        qrcode_scan = self.require_module("qrcode_scan", "摄像头扫码")
+        if qrcode_scan is None:
+            return
+        self.scanner = qrcode_scan.QRStreamScanner(qrcode_scan.CAMERA_SOURCE)
+        self.scanner.start()
+        self.camera_button.config(text="停止扫码")
+        self.batch_status_label.config(text="请把快递标签放到摄像头下")
+        self.root.after(50, self.poll_camera_scan)
+    
+    def stop_camera_scan(self):
+        """停止摄像头扫码"""
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+            self.camera_button.config(text="摄像头扫码")
+    
+    def poll_camera_scan(self):
+        """在界面线程中处理扫描结果，每个新二维码直接入库"""
+        if self.scanner is None:
+            return
+        # 先判断线程是否已结束，再取结果，保证结束前产出的结果都被处理
+        finished = not self.scanner.running
+        for frame_index, text, info in self.scanner.poll():
+            if not isinstance(info, dict):
+                self.batch_status_label.config(text=f"无法识别的二维码内容: {text}", fg="red")
+                continue
+            express_id = str(info.get("express_id", "")).strip()
+            error = self.check_in_record(info)
+            if error:
+                self.batch_status_label.config(text=f"{express_id}: {error}", fg="red")
+            else:
+                self.batch_status_label.config(text=f"快递 {express_id} 入库成功！", fg="green")
+        if finished:
+            error = self.scanner.error
+            self.stop_camera_scan()
+            if error:
+                messagebox.showerror("错误", error)
+            return
+        self.root.after(50, self.poll_camera_scan)
 
 
 def main():
+    metrics.configure_from_env()
     root = tk.Tk()
     app = ExpressManagementSystem(root)
-    root.mainloop()
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
+    try:
+        root.mainloop()
+    finally:
+        # 主循环异常退出时也要写完待写入的数据
+        app.shutdown()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
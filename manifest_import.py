@@ -0,0 +1,227 @@
+import csv
+import os
+import pandas as pd
+
+MANIFEST_COLUMNS = ("express_id", "pick_code", "sender", "sender_name",
+                    "receiver", "receiver_name", "location", "notes")
+REQUIRED_COLUMNS = ("express_id", "sender", "sender_name", "receiver", "receiver_name", "location")
+CHUNK_SIZE = 10000  # CSV 每次读取的行数
+REPORT_COLUMNS = ("行号", "快递ID", "错误")
+# 取件码的文本写法：最多6位数字，Excel 数字单元格丢失了前导0，也可能带 ".0"（同 models.normalize_pick_code）
+PICK_CODE_PATTERN = r"([0-9]{1,6})(?:\.0*)?"
+
+
+def read_manifest(path, chunk_size=CHUNK_SIZE):
+    """
+    分块读取快递清单（CSV 或 xlsx），全部列按字符串读取
+
+    第一行为表头，列名同 MANIFEST_COLUMNS（pick_code、notes 可以缺省）。
+
+    参数:
+        path: 清单文件路径
+        chunk_size: CSV 每块的行数（xlsx 只能整体读取，作为一块返回）
+
+    返回:
+        generator: 逐块产出 DataFrame，索引为文件中的行号（表头为第1行）；
+                   旧版 .xls 文件不支持（openpyxl 只能读取 xlsx），抛出 ValueError
+    """
+    if path.lower().endswith(".xls"):
+        raise ValueError("不支持旧版 .xls 清单，请在 Excel 中另存为 .xlsx 或 CSV 后导入")
+    if path.lower().endswith(".xlsx"):
+        chunks = [pd.read_excel(path, dtype=str, keep_default_na=False, engine='openpyxl')]
+    else:
+        chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size,
+                             encoding="utf-8-sig")
+    start = 2
+    for chunk in chunks:
+        chunk.index = range(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def validate_manifest(df, station, seen_ids=None, seen_codes=None):
+    """
+    向量化校验一块清单
+
+    检查必填字段、取件码格式（6位数字，可留空自动分配）、文件内重复的快递ID/取件码，
+    以及与已有数据重复的快递ID/取件码。取件码先统一为6位数字字符串（例如 12345 -> "012345"）。
+
+    参数:
+        df: read_manifest 产出的 DataFrame
+        station: ExpressStation
+        seen_ids: 之前各块中通过校验的快递ID集合（会被更新）
+        seen_codes: 之前各块中通过校验的取件码集合（会被更新）
+
+    返回:
+        tuple: (整理后的 DataFrame, 错误信息 Series)，错误信息为空字符串的行通过校验
+    """
+    df, errors = validate_rows(df, seen_ids, seen_codes)
+    return df, validate_existing(df, errors, station)
+
+
+def validate_rows(df, seen_ids=None, seen_codes=None):
+    """
+    校验一块清单中不依赖已有数据的部分：必填字段、取件码格式和文件内重复
+
+    重复只与之前通过校验的行比较（被其他原因拒绝的行不占用快递ID和取件码）。
+    不访问 ExpressStation，可以在后台线程中执行。
+
+    参数同 validate_manifest。
+
+    返回:
+        tuple: (整理后的 DataFrame, 错误信息 Series)，错误信息末尾的分隔符由 validate_existing 去掉
+    """
+    df = df.copy()
+    for column in MANIFEST_COLUMNS:
+        df[column] = df[column].astype(str).str.strip() if column in df else ""
+    df = df[list(MANIFEST_COLUMNS)]
+    errors = pd.Series("", index=df.index, dtype=object)
+
+    def flag(mask, message):
+        errors[mask] = errors[mask] + message + "；"
+
+    for column in REQUIRED_COLUMNS:
+        flag(df[column] == "", f"缺少{column}")
+
+    has_code = df["pick_code"] != ""
+    digits = df["pick_code"].str.extract(f"^{PICK_CODE_PATTERN}$", expand=False)
+    valid_code = digits.notna()
+    df.loc[valid_code, "pick_code"] = digits[valid_code].str.zfill(6)
+    codes = df["pick_code"]
+    flag(has_code & ~valid_code, "取件码必须是6位数字")
+
+    # 文件内重复（包括与之前各块重复），只保留第一个通过校验的行
+    seen_ids = set() if seen_ids is None else seen_ids
+    seen_codes = set() if seen_codes is None else seen_codes
+    ids = df["express_id"]
+
+    def repeated(values, candidates, seen):
+        """candidates 中与之前通过校验的值（之前各块或本块前面的行）重复的行"""
+        earlier = values[candidates].duplicated().reindex(values.index, fill_value=False)
+        return candidates & (values.isin(seen) | earlier)
+
+    flag(repeated(ids, errors == "", seen_ids), "快递ID在清单中重复")
+    flag(repeated(codes, (errors == "") & has_code, seen_codes), "取件码在清单中重复")
+    ok = errors == ""
+    seen_ids.update(ids[ok])
+    seen_codes.update(codes[ok & has_code])
+    return df, errors
+
+
+def validate_existing(df, errors, station):
+    """
+    校验与已有数据重复的快递ID/取件码（在操作 station 的线程中执行）
+
+    参数:
+        df, errors: validate_rows 的返回值
+
+    返回:
+        Series: 合并后的错误信息，错误信息为空字符串的行通过校验
+    """
+    errors = errors.copy()
+
+    def flag(mask, message):
+        errors[mask] = errors[mask] + message + "；"
+
+    ids, codes = df["express_id"], df["pick_code"]
+    flag(ids.isin(station.existing_express_ids(ids)), "快递ID已存在")
+    checked = (codes != "") & codes.str.fullmatch("[0-9]{6}")
+    taken = pd.Series(False, index=df.index)
+    cooling = pd.Series(False, index=df.index)
+    if checked.any():
+        numbers = codes[checked].astype("int64").to_numpy()
+        free = station.pick_codes.free_mask(numbers)
+        taken[checked] = ~free
+        cooling[checked] = free & ~station.pick_codes.free_mask(numbers, allow_cooling=False)
+    flag(taken, "取件码已存在")
+    flag(cooling, "取件码刚被使用过")
+    return errors.str.rstrip("；")
+
+
+def load_manifest(path, chunk_size=CHUNK_SIZE):
+    """
+    读取清单并做不依赖已有数据的校验（validate_rows），界面在后台线程中调用
+
+    返回:
+        list: 每块的 (整理后的 DataFrame, 错误信息 Series)，交给 import_loaded 入库
+    """
+    seen_ids, seen_codes = set(), set()
+    return [validate_rows(chunk, seen_ids, seen_codes) for chunk in read_manifest(path, chunk_size)]
+
+
+def import_manifest(station, path, chunk_size=CHUNK_SIZE, all_or_nothing=False, on_commit=None):
+    """
+    从清单批量入库
+
+    逐块读取并校验，通过校验的行最后一次性入库：人物批量写入，
+    全部写操作作为一组提交（SQLite 同一个事务，Excel 同一次日志追加）。
+
+    参数:
+        station: ExpressStation
+        path: 清单文件路径（CSV 或 xlsx）
+        chunk_size: CSV 每块的行数
+        all_or_nothing: 为True时只要有一行出错就全部不导入
+        on_commit: 写入存储完成后的回调（见 PersistenceWorker.submit_batch）
+
+    返回:
+        tuple: (成功入库的行数, 错误报告)；错误报告为 [(行号, 快递ID, 错误信息), ...]
+    """
+    return import_loaded(station, load_manifest(path, chunk_size), all_or_nothing, on_commit)
+
+
+def import_loaded(station, chunks, all_or_nothing=False, on_commit=None):
+    """
+    校验与已有数据重复的行并入库 load_manifest 读取的清单（在操作 station 的线程中执行）
+
+    参数和返回值同 import_manifest，chunks 为 load_manifest 的返回值
+    """
+    records, row_numbers, report = [], [], []
+    for df, errors in chunks:
+        errors = validate_existing(df, errors, station)
+        ok = errors == ""
+        records.extend(df[ok].itertuples(index=False, name=None))
+        row_numbers.extend(df.index[ok])
+        report.extend(zip(df.index[~ok], df["express_id"][~ok], errors[~ok]))
+    if all_or_nothing and report:
+        if on_commit is not None:
+            on_commit(None)
+        return 0, report
+    imported = 0
+    for row_number, record, (pick_code, error) in zip(
+            row_numbers, records, station.check_in_batch(records, on_commit=on_commit)):
+        if error:
+            report.append((row_number, record[0], error))
+        else:
+            imported += 1
+    report.sort()
+    return imported, report
+
+
+def write_report(report, path):
+    """把错误报告写成 CSV（Excel 可以直接打开）"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(report)
+
+
+def report_path(manifest_path):
+    """清单对应的错误报告路径，例如 manifest.csv -> manifest.errors.csv"""
+    return os.path.splitext(manifest_path)[0] + ".errors.csv"
+
+
+# 使用示例：python manifest_import.py manifest.csv
+if __name__ == "__main__":
+    import sys
+    from express_core import open_station
+
+    station = open_station()
+    try:
+        imported, report = import_manifest(station, sys.argv[1])
+        station.persistence.flush()
+    finally:
+        station.close()
+    print(f"成功入库 {imported} 个快递，失败 {len(report)} 行")
+    if report:
+        write_report(report, report_path(sys.argv[1]))
+        print(f"错误明细已写入 {report_path(sys.argv[1])}")
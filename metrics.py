@@ -0,0 +1,277 @@
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "express_"  # 导出时指标名前缀
+WINDOW = 1024  # 直方图保留的最近样本数
+QUANTILES = (0.5, 0.95, 0.99)
+
+ENABLED = False  # 关闭时计时装饰器只多一次全局变量判断
+_lock = threading.Lock()
+_counters = {}  # {名称: 累计值}
+_gauges = {}  # {名称: 当前值}
+_histograms = {}  # {名称: Histogram}
+_profile_requests = {}  # {操作名: 输出文件路径或None}
+profiles = {}  # {操作名: 最近一次 cProfile 结果文本}
+
+
+class Histogram:
+    """
+    滚动直方图
+
+    分位数按最近 window 个样本计算，次数和总和从启动起累计。
+    """
+
+    def __init__(self, window=WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        result = {"count": self.count, "sum": self.total}
+        for q in QUANTILES:
+            result[f"p{int(q * 100)}"] = ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else None
+        return result
+
+
+def enable(flag=True):
+    """开启或关闭指标收集"""
+    global ENABLED
+    ENABLED = flag
+
+
+def reset():
+    """清空已收集的指标"""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+        profiles.clear()
+
+
+def incr(name, value=1):
+    """计数器加一（或加 value）"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def set_gauge(name, value):
+    """设置当前值类指标（如待写入队列长度）"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    """记录一个样本（耗时单位为秒）"""
+    if not ENABLED:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(value)
+
+
+def profile_next(name, path=None):
+    """
+    对下一次名为 name 的操作做 cProfile 采样
+
+    参数:
+        name: 操作名（与 timed/timer 使用的名称一致）
+        path: 保存 pstats 数据的文件路径，None 表示只保留文本结果（见 profiles）
+    """
+    with _lock:
+        _profile_requests[name] = path
+
+
+def _take_profile_request(name):
+    if name not in _profile_requests:
+        return False, None
+    with _lock:
+        if name not in _profile_requests:
+            return False, None
+        return True, _profile_requests.pop(name)
+
+
+def _save_profile(name, profiler, path):
+    if path:
+        profiler.dump_stats(path)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(30)
+    profiles[name] = stream.getvalue()
+
+
+class _Timer:
+    """计时上下文，退出时记录耗时；出现异常时另计错误次数"""
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        requested, self.path = _take_profile_request(self.name)
+        if requested:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.start)
+        if exc_type is not None:
+            incr(self.name + "_errors")
+        if self.profiler is not None:
+            self.profiler.disable()
+            _save_profile(self.name, self.profiler, self.path)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(name):
+    """
+    计时上下文管理器
+
+    用法:
+        with metrics.timer("list_refresh"):
+            ...
+    """
+    return _Timer(name) if ENABLED else _NULL_TIMER
+
+
+def timed(name):
+    """计时装饰器，未开启时直接调用原函数"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            with _Timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """
+    当前全部指标
+
+    返回:
+        dict: {"counters": {...}, "gauges": {...}, "histograms": {名称: {count, sum, p50, p95, p99}}}
+    """
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "gauges": dict(_gauges),
+            "histograms": {name: h.snapshot() for name, h in _histograms.items()},
+        }
+
+
+def export_json(path):
+    """把指标写入本地 JSON 文件（先写临时文件再替换）"""
+    data = snapshot()
+    data["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def prometheus_text():
+    """按 Prometheus 文本格式导出（直方图导出为 summary，单位为秒）"""
+    data = snapshot()
+    lines = []
+    for name, value in sorted(data["counters"].items()):
+        lines += [f"# TYPE {PREFIX}{name}_total counter", f"{PREFIX}{name}_total {value}"]
+    for name, value in sorted(data["gauges"].items()):
+        lines += [f"# TYPE {PREFIX}{name} gauge", f"{PREFIX}{name} {value}"]
+    for name, h in sorted(data["histograms"].items()):
+        metric = f"{PREFIX}{name}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for q in QUANTILES:
+            value = h[f"p{int(q * 100)}"]
+            if value is not None:
+                lines.append(f'{metric}{{quantile="{q}"}} {value}')
+        lines += [f"{metric}_sum {h['sum']}", f"{metric}_count {h['count']}"]
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = prometheus_text().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/metrics.json":
+            body = json.dumps(snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # 不在控制台输出访问日志
+
+
+def start_http_server(port=9108, host="127.0.0.1"):
+    """
+    在后台线程中提供 /metrics（Prometheus 文本）和 /metrics.json
+
+    返回:
+        ThreadingHTTPServer: 调用 shutdown() 停止
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure_from_env(environ=os.environ):
+    """
+    按环境变量开启指标（由程序入口 main.main、express_service.serve 调用；
+    不在导入时执行，否则进程池的子进程导入本模块时也会绑定端口、在退出时覆盖 JSON 文件）:
+        EXPRESS_METRICS=1          开启收集
+        EXPRESS_METRICS_FILE=路径   程序退出时写入 JSON 文件
+        EXPRESS_METRICS_PORT=端口   启动 Prometheus 文本接口
+        EXPRESS_PROFILE=操作名      对该操作的下一次调用做 cProfile 采样（结果保存为 操作名.prof）
+    """
+    if environ.get("EXPRESS_METRICS", "") not in ("", "0"):
+        enable()
+    if environ.get("EXPRESS_METRICS_FILE"):
+        enable()
+        atexit.register(export_json, environ["EXPRESS_METRICS_FILE"])
+    if environ.get("EXPRESS_METRICS_PORT"):
+        enable()
+        start_http_server(int(environ["EXPRESS_METRICS_PORT"]))
+    if environ.get("EXPRESS_PROFILE"):
+        enable()
+        profile_next(environ["EXPRESS_PROFILE"], environ["EXPRESS_PROFILE"] + ".prof")
@@ -0,0 +1,150 @@
+import sys
+
+STATUS_IN_STOCK = "在库"
+STATUS_PICKED_UP = "已取件"
+PICK_CODE_LENGTH = 6
+
+
+def normalize_pick_code(value):
+    """
+    把取件码统一为6位数字字符串
+
+    xlsx 读出的取件码是整数（丢失了前导0），旧的 SQLite 库按 INTEGER 保存，界面输入是字符串；
+    取件码在进入内存、写入存储和查找之前都转换为这一种形式。
+
+    返回:
+        str: 6位数字字符串，例如 12345 -> "012345"
+
+    异常:
+        ValueError: 不是 0 ~ 999999 之间的整数
+    """
+    if isinstance(value, str):
+        text = value.strip()
+        if len(text) == PICK_CODE_LENGTH and text.isascii() and text.isdigit():
+            return text
+        if not (text.isascii() and text.isdigit()) or len(text) > PICK_CODE_LENGTH:
+            raise ValueError(f"无效的取件码: {value!r}")
+        return text.zfill(PICK_CODE_LENGTH)
+    if isinstance(value, bool):
+        raise ValueError(f"无效的取件码: {value!r}")
+    if isinstance(value, float):
+        # pandas 在列中有空值时会把整数读成浮点数
+        if not value.is_integer():
+            raise ValueError(f"无效的取件码: {value!r}")
+        value = int(value)
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的取件码: {value!r}")
+    if number != value or not 0 <= number < 10 ** PICK_CODE_LENGTH:
+        raise ValueError(f"无效的取件码: {value!r}")
+    return f"{number:0{PICK_CODE_LENGTH}d}"
+
+
+def intern_value(value):
+    """
+    驻留字符串
+
+    状态、货架位置、备注在大量快递之间重复，驻留后所有快递共用同一个字符串对象。
+    非字符串（例如 pandas 读出的空值 NaN）原样返回。
+    """
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+class Person:
+    """人物类"""
+    __slots__ = ("id", "name")
+
+    def __init__(self, person_id, name):
+        self.id = person_id
+        self.name = name
+
+    def __str__(self):
+        return f"{self.name}(ID:{self.id})"
+
+
+class Express:
+    """快递类"""
+    __slots__ = ("express_id", "pick_code", "sender", "receiver", "_location", "_notes", "_status",
+                 "picked_at", "stored_at")
+
+    def __init__(self, express_id, pick_code, sender, receiver, location, notes, status,
+                 picked_at=None, stored_at=None):
+        self.express_id = express_id
+        self.pick_code = pick_code
+        self.sender = sender  # Person对象
+        self.receiver = receiver  # Person对象
+        self.location = location
+        self.notes = notes
+        self.status = status  # 状态：在库/已取件
+        self.picked_at = picked_at  # 取件时间（"YYYY-mm-dd HH:MM:SS"），未取件为None
+        self.stored_at = stored_at  # 入库时间，旧数据为None
+
+    @property
+    def location(self):
+        return self._location
+
+    @location.setter
+    def location(self, value):
+        self._location = intern_value(value)
+
+    @property
+    def notes(self):
+        return self._notes
+
+    @notes.setter
+    def notes(self, value):
+        self._notes = intern_value(value)
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = intern_value(value)
+
+    def __str__(self):
+        return (f"快递ID: {self.express_id}, 取件码: {self.pick_code}, "
+                f"发件人: {self.sender}, 收件人: {self.receiver}, "
+                f"位置: {self.location}, 备注: {self.notes}, 状态: {self.status}")
+
+
+# 使用示例：测量 1M 个快递对象的内存占用
+if __name__ == "__main__":
+    import tracemalloc
+
+    class PlainPerson:
+        def __init__(self, person_id, name):
+            self.id = person_id
+            self.name = name
+
+    class PlainExpress:
+        def __init__(self, express_id, pick_code, sender, receiver, location, notes, status):
+            self.express_id = express_id
+            self.pick_code = pick_code
+            self.sender = sender
+            self.receiver = receiver
+            self.location = location
+            self.notes = notes
+            self.status = status
+
+    def measure(person_cls, express_cls, count=1000000, people=20000):
+        tracemalloc.start()
+        persons = [person_cls(f"P{i:05d}", f"用户{i}") for i in range(people)]
+        parcels = {}
+        for i in range(count):
+            # 每次拼接出新的字符串，模拟从文件逐行读入时不共享字符串对象的情况
+            parcels[f"E{i:07d}"] = express_cls(
+                f"E{i:07d}", 100000 + i % 900000, persons[i % people], persons[(i * 7) % people],
+                "ABCD"[i % 4] + f"区{i % 50}架", "易碎" + "品" * (i % 2), "在" + "库")
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return current / 2 ** 20
+
+    before = measure(PlainPerson, PlainExpress)
+    after = measure(Person, Express)
+    print(f"普通类: {before:.0f} MiB")
+    print(f"__slots__ + 字符串驻留: {after:.0f} MiB（减少 {1 - after / before:.0%}）")
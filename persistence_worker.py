@@ -0,0 +1,248 @@
+import queue
+import threading
+from collections import deque
+import metrics
+
+_STOP = object()  # 队列结束标记
+_POLL = object()  # 读取其他实例修改的请求
+
+
+class PersistenceWorker:
+    """
+    后台持久化线程（写后台化）
+
+    界面线程只更新内存数据并把写操作放入有界队列，由后台线程写入存储，
+    Tk 主循环不会因为磁盘 I/O 而卡住。后台线程每次取出队列中积压的全部操作，
+    合并（同一快递的连续状态变更、同一人物的连续更新只保留最后一次）后整批写入，
+    Excel 后端整批只 fsync 一次，SQLite 后端整批一个事务。
+
+    持久性约定:
+        submit() 返回时操作只在内存中生效；
+        存储的 apply_batch() 返回后（日志已 fsync 或事务已提交），该批操作才算已提交，
+        此时调用 submit() 时传入的 on_commit 回调（在后台线程中执行）；
+        flush() 返回表示此前提交的全部操作都已写入或已记为失败。
+
+    与其他程序实例的修改冲突的操作（见 storage.WriteConflict）不会写入，也不会重试：
+    记入 conflicts，并作为错误传给对应的 on_commit 回调。
+
+    读取其他实例的修改（storage.poll_changes）也在后台线程中进行（见 request_changes），
+    排在此前提交的写操作之后，调用方线程不需要等待写入或文件锁。
+    """
+
+    def __init__(self, storage, max_pending=1000, load_snapshot=None):
+        self.storage = storage
+        # 需要重新加载全部数据时读取 (人物行列表, 快递行列表)，在后台线程中调用
+        self.load_snapshot = load_snapshot or (lambda: (list(storage.load_people()), storage.load_express()))
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0  # 已提交但尚未写入的操作数
+        self.failed = []  # 写入失败的操作 [(方法名, 参数元组), ...]
+        self.last_error = None
+        self.conflicts = deque(maxlen=100)  # 最近的写入冲突（WriteConflict）
+        self.conflict_count = 0
+        self._changes = []  # 已读到、尚未被 take_changes 取走的修改
+        self.changes_ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, method, *args, on_commit=None):
+        """
+        提交一个写操作；队列已满时阻塞，直到后台线程跟上
+
+        参数:
+            method: 存储方法名（upsert_person/insert_express/update_status）
+            args: 方法参数
+            on_commit: 写入完成后的回调，参数为错误信息（成功时为None，冲突时为 WriteConflict）
+        """
+        with self._lock:
+            self.pending += 1
+        self._queue.put((method, args, on_commit))
+
+    def submit_batch(self, operations, on_commit=None):
+        """
+        提交一组写操作，保证它们在同一批中写入（SQLite 同一个事务，Excel 同一次日志追加）
+
+        参数:
+            operations: [(方法名, 参数元组), ...]
+            on_commit: 整组写入完成后的回调，参数为错误信息（成功时为None，冲突时为其中第一个 WriteConflict）
+        """
+        if not operations:
+            return
+        with self._lock:
+            self.pending += len(operations)
+        # 整组作为队列中的一项，不会被拆到两批中
+        self._queue.put((None, list(operations), on_commit))
+
+    def request_changes(self):
+        """
+        请求后台线程读取其他实例的修改，在此之前提交的写操作写完之后才读取
+
+        读到的结果由 take_changes 取走，读完时设置 changes_ready。
+        """
+        self._queue.put(_POLL)
+
+    def take_changes(self):
+        """
+        取走已读到的修改
+
+        返回:
+            list: [(修改, 全部数据), ...]；修改同 storage.poll_changes，
+                  为 None（需要重新加载）时全部数据为 (人物行列表, 快递行列表)，否则为 None
+        """
+        with self._lock:
+            results, self._changes = self._changes, []
+            self.changes_ready.clear()
+        return results
+
+    def _poll(self):
+        try:
+            changes = self.storage.poll_changes()
+            snapshot = None
+            if changes is None:
+                snapshot = self.load_snapshot()
+        except Exception as e:
+            # 未取走的修改留在存储中，下次读取时再取
+            print(f"读取其他终端的修改时出错: {e}")
+            changes, snapshot = ({}, {}), None
+        with self._lock:
+            self._changes.append((changes, snapshot))
+            self.changes_ready.set()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            batch = [item]
+            # 取出当前积压的全部操作
+            while item is not _STOP:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            stop = batch[-1] is _STOP
+            try:
+                self._process(batch)
+            finally:
+                # 即使处理出错也要标记完成，否则 flush/close 会一直等待
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _process(self, batch):
+        items = [op for op in batch if op is not _STOP and op is not _POLL]
+        if items:
+            operations = []
+            for method, args, _ in items:
+                if method is None:
+                    operations.extend(args)  # submit_batch 提交的一组操作
+                else:
+                    operations.append((method, args))
+            error, conflicts = self._write(coalesce(operations))
+            with self._lock:
+                self.pending -= len(operations)
+            metrics.set_gauge("persistence_pending", self.pending)
+            # 被合并掉的操作也随本批一起提交，同样需要回调
+            for method, args, on_commit in items:
+                if on_commit is not None:
+                    self._notify(on_commit, error or self._conflict_for(method, args, conflicts))
+        if any(op is _POLL for op in batch):
+            self._poll()
+
+    @staticmethod
+    def _notify(on_commit, error):
+        """调用 on_commit 回调；回调出错只记录，不能让后台线程退出"""
+        try:
+            on_commit(error)
+        except Exception as e:
+            metrics.incr("persistence_callback_errors")
+            print(f"写入完成回调出错: {e}")
+
+    def _write(self, operations):
+        """
+        写入一批操作
+
+        返回:
+            tuple: (错误信息，成功时为None, {(方法名, 主键): WriteConflict})
+        """
+        try:
+            with metrics.timer("persistence_write"):
+                conflicts = self.storage.apply_batch(operations) or []
+        except Exception as e:
+            with self._lock:
+                self.failed.extend(operations)
+                self.last_error = str(e)
+            metrics.incr("persistence_failed_ops", len(operations))
+            print(f"写入存储时出错: {e}")
+            return str(e), {}
+        metrics.incr("persistence_batches")
+        metrics.incr("persistence_ops", len(operations))
+        if conflicts:
+            with self._lock:
+                self.conflicts.extend(conflicts)
+                self.conflict_count += len(conflicts)
+            metrics.incr("persistence_conflicts", len(conflicts))
+            for conflict in conflicts:
+                print(f"写入冲突: {conflict}")
+        return None, {(conflict.method, conflict.arguments[0]): conflict for conflict in conflicts}
+
+    @staticmethod
+    def _conflict_for(method, args, conflicts):
+        """队列中的一项（单个操作或 submit_batch 的一组）对应的第一个冲突，没有时为None"""
+        if not conflicts:
+            return None
+        operations = args if method is None else [(method, args)]
+        for op_method, op_args in operations:
+            conflict = conflicts.get((op_method, op_args[0]))
+            if conflict is not None:
+                return conflict
+        return None
+
+    def retry_failed(self):
+        """重新提交失败的操作"""
+        with self._lock:
+            operations, self.failed = self.failed, []
+            self.last_error = None
+        self.submit_batch(operations)
+
+    def discard_failed(self, express_id):
+        """丢弃某个快递写入失败的操作（调用方已撤销内存中的修改，retry_failed 不再重试它们）"""
+        with self._lock:
+            self.failed = [(method, args) for method, args in self.failed
+                           if method == "upsert_person" or args[0] != express_id]
+            if not self.failed:
+                self.last_error = None
+
+    def flush(self):
+        """等待此前提交的操作全部处理完"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余操作后停止线程并关闭存储（可重复调用）"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        self.storage.close()
+
+
+def coalesce(operations):
+    """
+    合并一批写操作
+
+    同一快递的多次 update_status 只保留最后一次（放在最后一次的位置），
+    同一人物的多次 upsert_person 同理；insert_express 保持原样和原有顺序。
+
+    参数:
+        operations: [(方法名, 参数元组), ...]
+
+    返回:
+        list: 合并后的操作
+    """
+    last = {}
+    for i, (method, args) in enumerate(operations):
+        if method in ("update_status", "upsert_person"):
+            last[(method, args[0])] = i
+    return [op for i, op in enumerate(operations)
+            if op[0] not in ("update_status", "upsert_person") or last[(op[0], op[1][0])] == i]
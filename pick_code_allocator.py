@@ -0,0 +1,171 @@
+import random
+from array import array
+from collections import Counter, deque
+
+CODE_SPACE = 10 ** 6  # 取件码范围 000000 ~ 999999
+COOLDOWN = 100000  # 取件后至少再经过这么多次取件，该取件码才会被重新分配
+IN_USE = -1  # position 中表示取件码已占用
+COOLING = -2  # position 中表示取件码在冷却中
+
+
+class PickCodeAllocator:
+    """
+    取件码分配器
+
+    未使用的取件码保存在数组 free 中，position 记录每个取件码在 free 中的下标：
+    分配时随机取一个并与末尾交换后删除，占用指定取件码同样是交换+删除，都是 O(1)。
+    随机分配而不是顺序分配，避免根据自己的取件码猜出别人的。
+
+    取件后释放的取件码先进入冷却队列，冷却队列满了才回到 free 中，
+    刚取走的快递的取件码不会马上分配给下一个快递；free 用完时直接从冷却队列中取。
+    冷却中的取件码在 position 中标记为 COOLING，判断是否冷却中不需要查找队列。
+    入库时手动填写冷却中的取件码会被拒绝（见 is_cooling），reserve 仍然接受冷却中的取件码：
+    存储中的数据（例如其他终端入库的快递）可能已经用了它。这时只改标记，
+    队列中的那一项留到出队时跳过（记在 _stale 中）。
+
+    分配器状态不单独保存，启动时按存储中的快递重建（见 ExpressStation.load_exprss）。
+    """
+
+    def __init__(self, space=CODE_SPACE, cooldown=COOLDOWN, rng=None):
+        self.space = space
+        self.free = array('i', range(space))  # 可分配的取件码
+        self.position = array('i', self.free)  # 取件码在 free 中的下标，或 IN_USE / COOLING
+        self.cooling = deque()  # 冷却中的取件码（按释放顺序），可能含已被占用的过期项
+        self.cooling_count = 0  # 冷却中的取件码数量（不含过期项）
+        self._stale = Counter()  # {取件码: 队列中的过期项数}
+        self.cooldown = cooldown
+        self.rng = rng if rng is not None else random.SystemRandom()
+
+    def __len__(self):
+        """可分配的取件码数量（包括冷却中的）"""
+        return len(self.free) + self.cooling_count
+
+    def format(self, number):
+        return f"{number:06d}"
+
+    def _remove(self, number):
+        """把取件码从 free 中移除（与末尾交换后删除）"""
+        index = self.position[number]
+        last = self.free[-1]
+        self.free[index] = last
+        self.position[last] = index
+        self.free.pop()
+        self.position[number] = IN_USE
+
+    def _add(self, number):
+        self.position[number] = len(self.free)
+        self.free.append(number)
+
+    def _pop_cooling(self):
+        """取出最早释放的冷却中取件码（跳过过期项）"""
+        self._skip_stale()
+        number = self.cooling.popleft()
+        self.cooling_count -= 1
+        return number
+
+    def _skip_stale(self):
+        """丢弃队首的过期项；同一取件码的过期项总是早于它当前的冷却项"""
+        while self._stale:
+            number = self.cooling[0]
+            if not self._stale[number]:
+                return
+            self.cooling.popleft()
+            self._stale[number] -= 1
+            if not self._stale[number]:
+                del self._stale[number]
+
+    def is_free(self, code):
+        """取件码当前是否未被占用（包括冷却中的）"""
+        number = int(code)
+        return 0 <= number < self.space and self.position[number] != IN_USE
+
+    def is_cooling(self, code):
+        """取件码是否刚被取件、还在冷却中（入库时不能手动指定）"""
+        number = int(code)
+        return 0 <= number < self.space and self.position[number] == COOLING
+
+    def free_mask(self, numbers, allow_cooling=True):
+        """
+        批量判断取件码是否可用（清单导入时向量化校验）
+
+        参数:
+            numbers: 取件码整数数组（numpy）
+            allow_cooling: 冷却中的取件码是否算作可用
+
+        返回:
+            numpy.ndarray: 布尔数组，可用为True
+        """
+        import numpy as np
+        numbers = np.asarray(numbers, dtype=np.int64)
+        valid = (numbers >= 0) & (numbers < self.space)
+        position = np.frombuffer(self.position, dtype=np.int32)
+        mask = np.zeros(len(numbers), dtype=bool)
+        if allow_cooling:
+            mask[valid] = position[numbers[valid]] != IN_USE
+        else:
+            mask[valid] = position[numbers[valid]] >= 0
+        return mask
+
+    def reserve(self, code):
+        """
+        占用指定的取件码
+
+        返回:
+            bool: 取件码可用并已占用时为True
+        """
+        number = int(code)
+        if not 0 <= number < self.space:
+            return False
+        if self.position[number] >= 0:
+            self._remove(number)
+            return True
+        if self.position[number] == COOLING:
+            # 手动指定冷却中的取件码，队列中的这一项出队时跳过
+            self.position[number] = IN_USE
+            self.cooling_count -= 1
+            self._stale[number] += 1
+            return True
+        return False
+
+    def allocate(self):
+        """
+        分配一个未使用的取件码
+
+        返回:
+            str: 6位数字取件码
+
+        异常:
+            RuntimeError: 取件码已全部占用
+        """
+        if self.free:
+            number = self.free[self.rng.randrange(len(self.free))]
+            self._remove(number)
+        elif self.cooling_count:
+            number = self._pop_cooling()
+            self.position[number] = IN_USE
+        else:
+            raise RuntimeError("取件码已全部占用！")
+        return self.format(number)
+
+    def suggest(self):
+        """
+        随机给出一个未使用的取件码但不占用（界面上的“生成”按钮使用，入库时再占用）
+
+        冷却中的取件码不能手动指定，只剩冷却中的取件码时请留空由 allocate 自动分配。
+        """
+        if self.free:
+            return self.format(self.free[self.rng.randrange(len(self.free))])
+        if self.cooling_count:
+            raise RuntimeError("只剩刚被使用过的取件码，请留空由系统自动分配！")
+        raise RuntimeError("取件码已全部占用！")
+
+    def release(self, code):
+        """释放取件码（取件后调用），先进入冷却队列；未被占用的取件码（例如重复释放）忽略"""
+        number = int(code)
+        if not 0 <= number < self.space or self.position[number] != IN_USE:
+            return
+        self.cooling.append(number)
+        self.position[number] = COOLING
+        self.cooling_count += 1
+        while self.cooling_count > self.cooldown:
+            self._add(self._pop_cooling())
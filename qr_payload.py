@@ -0,0 +1,206 @@
+import re
+import zlib
+from models import normalize_pick_code
+
+# 紧凑二维码内容格式
+#
+# 二维码文本 = "EX:" + Base45(二进制内容)。Base45（RFC 9285）只使用二维码字母数字模式的45个字符，
+# 每个字符5.5位，每字节约8.25位，和字节模式（8位）相当；但扫码库（zbar、OpenCV）都把内容作为文本返回，
+# 直接放二进制会被按字符集转换而损坏，Base45 文本则原样返回。
+# 二维码变小靠的是打包：取件码3字节、编号按数值保存、汉字用 GB18030 编码（2字节），不含分隔符。
+#
+# 二进制内容（第1版）:
+#     版本号      1字节
+#     标志        1字节，FLAG_NAMES 表示包含发件人/收件人姓名
+#     取件码      3字节，大端无符号整数；NO_PICK_CODE 表示没有取件码（入库时自动分配）
+#     文本字段    顺序见 TEXT_FIELDS，包含姓名时再加 NAME_FIELDS，每个字段以变长整数 (n << 1 | 类型) 开头:
+#                 类型0 文本: n 为内容字节数，后面是 GB18030 编码的内容（汉字2字节，UTF-8 要3字节）
+#                 类型1 编号: 字母前缀加数字（例如 "E00000144"），n 为前缀长度，
+#                             后面依次是 前缀(ASCII)、数字位数(1字节)、数值(变长整数)
+#     校验和      2字节，前面全部内容的 CRC32 低16位（大端）
+# 变长整数为 LEB128（每字节低7位，最高位表示后面还有字节）。
+PAYLOAD_PREFIX = "EX:"
+PAYLOAD_VERSION = 1
+FLAG_NAMES = 0x01
+NO_PICK_CODE = 0xFFFFFF
+TEXT_FIELDS = ("express_id", "sender", "receiver", "location", "notes")
+NAME_FIELDS = ("sender_name", "receiver_name")
+EXPRESS_FIELDS = ("express_id", "pick_code", "sender", "sender_name",
+                  "receiver", "receiver_name", "location", "notes")  # 解析结果的键（同 qrcode_create.LABEL_FIELDS）
+TEXT_ENCODING = "gb18030"
+NUMBER_PATTERN = re.compile(r"([A-Za-z]{0,15})([0-9]{1,30})")  # 可以按编号打包的字段
+BASE45_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+_BASE45_VALUES = {char: value for value, char in enumerate(BASE45_CHARSET)}
+
+
+def b45encode(data):
+    """字节串编码为 Base45 文本（每2字节3个字符，最后剩1字节时2个字符）"""
+    chars = []
+    for i in range(0, len(data) - 1, 2):
+        value = data[i] * 256 + data[i + 1]
+        value, c = divmod(value, 45)
+        e, d = divmod(value, 45)
+        chars += (BASE45_CHARSET[c], BASE45_CHARSET[d], BASE45_CHARSET[e])
+    if len(data) % 2:
+        d, c = divmod(data[-1], 45)
+        chars += (BASE45_CHARSET[c], BASE45_CHARSET[d])
+    return "".join(chars)
+
+
+def b45decode(text):
+    """Base45 文本解码为字节串，文本无效时抛出 ValueError"""
+    try:
+        values = [_BASE45_VALUES[char] for char in text]
+    except KeyError:
+        raise ValueError("二维码内容包含无效字符")
+    if len(values) % 3 == 1:
+        raise ValueError("二维码内容长度无效")
+    data = bytearray()
+    for i in range(0, len(values), 3):
+        group = values[i:i + 3]
+        if len(group) == 3:
+            value = group[0] + group[1] * 45 + group[2] * 45 * 45
+            if value > 0xFFFF:
+                raise ValueError("二维码内容无效")
+            data += bytes(divmod(value, 256))
+        else:
+            value = group[0] + group[1] * 45
+            if value > 0xFF:
+                raise ValueError("二维码内容无效")
+            data.append(value)
+    return bytes(data)
+
+
+def _checksum(data):
+    return (zlib.crc32(data) & 0xFFFF).to_bytes(2, "big")
+
+
+def _write_varint(data, value):
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _read_varint(data, pos):
+    """读取变长整数，返回 (值, 下一个位置)"""
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("二维码内容不完整")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _pack_field(data, value):
+    """写入一个文本字段，编号形式的字段取文本和编号两种写法中较短的一种"""
+    text = bytearray()
+    encoded = value.encode(TEXT_ENCODING)
+    _write_varint(text, len(encoded) << 1)
+    text += encoded
+    match = NUMBER_PATTERN.fullmatch(value)
+    if match is not None:
+        prefix, digits = match.groups()
+        number = bytearray()
+        _write_varint(number, len(prefix) << 1 | 1)
+        number += prefix.encode("ascii")
+        number.append(len(digits))
+        _write_varint(number, int(digits))
+        if len(number) < len(text):
+            text = number
+    data += text
+
+
+def _unpack_field(data, pos):
+    """读取一个文本字段，返回 (值, 下一个位置)"""
+    header, pos = _read_varint(data, pos)
+    size = header >> 1
+    if pos + size > len(data):
+        raise ValueError("二维码内容不完整")
+    value = data[pos:pos + size]
+    pos += size
+    if not header & 1:
+        return value.decode(TEXT_ENCODING), pos
+    if pos >= len(data):
+        raise ValueError("二维码内容不完整")
+    width = data[pos]
+    number, pos = _read_varint(data, pos + 1)
+    return value.decode("ascii") + f"{number:0{width}d}", pos
+
+
+def pack_express(record, include_names=True):
+    """
+    把快递信息字典打包为二进制内容
+
+    参数:
+        record: 快递信息字典（字段同 qrcode_create.LABEL_FIELDS）
+        include_names: 是否包含发件人/收件人姓名（人物已在系统中登记时可以不含，二维码更小）
+
+    返回:
+        bytes: 二进制内容；取件码无效时抛出 ValueError
+    """
+    pick_code = record.get("pick_code", "")
+    if pick_code is None or str(pick_code).strip() == "":
+        code = NO_PICK_CODE
+    else:
+        code = int(normalize_pick_code(pick_code))
+    data = bytearray((PAYLOAD_VERSION, FLAG_NAMES if include_names else 0))
+    data += code.to_bytes(3, "big")
+    for field in TEXT_FIELDS + (NAME_FIELDS if include_names else ()):
+        _pack_field(data, str(record.get(field, "") or "").strip())
+    return bytes(data + _checksum(data))
+
+
+def unpack_express(data):
+    """
+    解析二进制内容
+
+    返回:
+        dict: 快递信息字典（同 qrcode_load.parse_qr_text），不含姓名时姓名为空字符串；
+              版本不支持、内容不完整或校验和不符时抛出 ValueError
+    """
+    if len(data) < 7:
+        raise ValueError("二维码内容不完整")
+    body, checksum = data[:-2], data[-2:]
+    if _checksum(body) != checksum:
+        raise ValueError("二维码校验和不符")
+    version, flags = body[0], body[1]
+    if version != PAYLOAD_VERSION:
+        raise ValueError(f"不支持的二维码格式版本: {version}")
+    code = int.from_bytes(body[2:5], "big")
+    info = dict.fromkeys(EXPRESS_FIELDS, "")
+    info["pick_code"] = "" if code == NO_PICK_CODE else f"{code:06d}"
+    pos = 5
+    for field in TEXT_FIELDS + (NAME_FIELDS if flags & FLAG_NAMES else ()):
+        info[field], pos = _unpack_field(body, pos)
+    if pos != len(body):
+        raise ValueError("二维码内容长度无效")
+    return info
+
+
+def encode_express(record, include_names=True):
+    """快递信息字典编码为紧凑格式的二维码文本（参数同 pack_express）"""
+    return PAYLOAD_PREFIX + b45encode(pack_express(record, include_names))
+
+
+def is_compact(text):
+    """二维码文本是否为紧凑格式"""
+    return text.startswith(PAYLOAD_PREFIX)
+
+
+def decode_express(text):
+    """解析紧凑格式的二维码文本，返回值同 unpack_express"""
+    return unpack_express(b45decode(text[len(PAYLOAD_PREFIX):]))
+
+
+# 使用示例
+if __name__ == "__main__":
+    record = {"express_id": "E008", "pick_code": "753951", "sender": "P001", "sender_name": "张三",
+              "receiver": "P002", "receiver_name": "李四", "location": "A区2架", "notes": "香蕉"}
+    text = encode_express(record)
+    print(text)
+    print(decode_express(text))
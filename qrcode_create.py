@@ -1,4 +1,25 @@
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import qrcode
+from PIL import Image, ImageDraw
+import qr_payload
+
+# 批量生成时所有标签共用的二维码参数（version=None 表示按内容自动选择最小版本）
+QR_OPTIONS = {
+    "version": None,
+    "error_correction": qrcode.constants.ERROR_CORRECT_L,
+    "box_size": 10,
+    "border": 4,
+}
+# 二维码内容格式：compact（紧凑二进制，见 qr_payload，二维码更小、扫码更快）/ csv（逗号分隔，旧版本程序也能读取）
+QR_PAYLOAD = "compact"
+QR_INCLUDE_NAMES = True  # 紧凑格式是否包含姓名；人物都已在系统中登记时可以不含，二维码更小
+# 逗号分隔格式的字段顺序（与 qrcode_load.parse_express_data 的CSV格式一致）
+LABEL_FIELDS = ("express_id", "pick_code", "sender", "sender_name",
+                "receiver", "receiver_name", "location", "notes")
+CAPTION_HEIGHT = 40  # 打印页上每个标签下方文字的高度（像素）
 
 def generate_qr_code(data, filename="qrcode.png"):
     """
@@ -8,13 +29,8 @@ def generate_qr_code(data, filename="qrcode.png"):
         data: 要编码的字符串
         filename: 保存的文件名
     """
-    # 创建QRCode实例
-    qr = qrcode.QRCode(
-        version=1,  # 控制二维码大小，1-40，1是最小版本
-        error_correction=qrcode.constants.ERROR_CORRECT_L,  # 容错率
-        box_size=10,  # 每个"盒子"的像素大小
-        border=4,  # 边框大小
-    )
+    # 创建QRCode实例（参数与批量生成的标签相同）
+    qr = qrcode.QRCode(**QR_OPTIONS)
     
     # 添加数据
     qr.add_data(data)
@@ -29,9 +45,196 @@ def generate_qr_code(data, filename="qrcode.png"):
     
     return img
 
+def express_to_qr_text(record, payload=None, include_names=None):
+    """
+    把快递信息字典转换为二维码内容
+    
+    参数:
+        record: 包含 LABEL_FIELDS 字段的字典
+        payload: 内容格式，compact 或 csv，默认为调用时的 QR_PAYLOAD
+        include_names: 紧凑格式是否包含发件人/收件人姓名，默认为调用时的 QR_INCLUDE_NAMES
+        
+    返回:
+        str: 二维码内容
+    """
+    if payload is None:
+        payload = QR_PAYLOAD
+    if include_names is None:
+        include_names = QR_INCLUDE_NAMES
+    if payload == "compact":
+        return qr_payload.encode_express(record, include_names)
+    return ",".join(str(record.get(field, "")) for field in LABEL_FIELDS)
+
+def render_qr_image(data):
+    """
+    按 QR_OPTIONS 渲染二维码，不保存文件
+    
+    参数:
+        data: 要编码的字符串
+        
+    返回:
+        PIL.Image: 二维码图像
+    """
+    qr = qrcode.QRCode(**QR_OPTIONS)
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image()
+
+def _render_label(task):
+    """
+    在工作进程中渲染一个标签
+    
+    参数:
+        task: (快递信息字典, 输出目录或None, 内容格式, 是否包含姓名)；
+              格式由主进程决定（工作进程重新导入本模块，看不到主进程中修改的 QR_PAYLOAD）
+        
+    返回:
+        tuple: (快递信息字典, 结果, 错误信息)；结果在输出目录不为None时是保存的文件路径，否则是图像；
+               这一条出错（字段无效、内容超出二维码容量等）时结果为None，不影响其他标签
+    """
+    record, out_dir, payload, include_names = task
+    try:
+        img = render_qr_image(express_to_qr_text(record, payload, include_names))
+        if out_dir is None:
+            return record, img, None
+        filename = os.path.join(out_dir, f"{record['express_id']}.png")
+        img.save(filename)
+    except Exception as e:
+        return record, None, f"{type(e).__name__}: {e}"
+    return record, filename, None
+
+def load_records_from_csv(csv_path):
+    """
+    从CSV读取快递信息（表头为 LABEL_FIELDS 中的字段名）
+    
+    参数:
+        csv_path: CSV文件路径
+        
+    返回:
+        list: 快递信息字典列表
+    """
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+def load_records_from_storage(storage, status="在库"):
+    """
+    从存储后端读取快递信息
+    
+    参数:
+        storage: storage.BaseStorage 对象
+        status: 只导出该状态的快递，None表示全部
+        
+    返回:
+        list: 快递信息字典列表
+    """
+    names = dict(storage.load_people())
+    rows = storage.load_express() if status is None else storage.find_express(status=status)
+    return [{
+        "express_id": express_id,
+        "pick_code": pick_code,
+        "sender": sender,
+        "sender_name": names.get(sender, ""),
+        "receiver": receiver,
+        "receiver_name": names.get(receiver, ""),
+        "location": location,
+        "notes": notes,
+    } for express_id, pick_code, sender, receiver, location, notes, *_ in rows]
+
+def make_print_sheets(labels, columns=3, rows=4):
+    """
+    把标签拼成打印页，每个二维码下方标注快递ID和取件码
+    
+    参数:
+        labels: (快递信息字典, 图像) 列表
+        columns: 每页列数
+        rows: 每页行数
+        
+    返回:
+        list: 打印页图像列表
+    """
+    if not labels:
+        return []
+    cell_width = max(img.size[0] for _, img in labels)
+    cell_height = max(img.size[1] for _, img in labels) + CAPTION_HEIGHT
+    per_page = columns * rows
+    pages = []
+    for start in range(0, len(labels), per_page):
+        page = Image.new("RGB", (cell_width * columns, cell_height * rows), "white")
+        draw = ImageDraw.Draw(page)
+        for i, (record, img) in enumerate(labels[start:start + per_page]):
+            x = (i % columns) * cell_width
+            y = (i // columns) * cell_height
+            page.paste(img, (x, y))
+            draw.text((x + 20, y + img.size[1]),
+                      f"{record['express_id']}  {record['pick_code']}", fill="black")
+        pages.append(page)
+    return pages
+
+def generate_qr_codes_batch(records, out_dir="qrcodes", sheet_path=None,
+                            columns=3, rows=4, max_workers=None, payload=None, include_names=None):
+    """
+    使用进程池批量生成快递标签
+    
+    参数:
+        records: 快递信息字典列表
+        out_dir: 单独保存每个标签的目录（sheet_path不为None时不使用）
+        sheet_path: 打印页文件路径；.pdf 输出多页PDF，其他扩展名输出编号的图片
+        columns: 打印页列数
+        rows: 打印页行数
+        max_workers: 工作进程数，默认为CPU核数
+        payload: 二维码内容格式，默认为 QR_PAYLOAD
+        include_names: 紧凑格式是否包含姓名，默认为 QR_INCLUDE_NAMES
+        
+    返回:
+        list: 与 records 一一对应的 (保存该标签的文件路径, 错误信息)，
+              成功时错误信息为None，失败时文件路径为None（同 qrcode_load.read_express_qr_codes）
+    """
+    records = list(records)
+    payload = QR_PAYLOAD if payload is None else payload
+    include_names = QR_INCLUDE_NAMES if include_names is None else include_names
+    if sheet_path is None:
+        os.makedirs(out_dir, exist_ok=True)
+    else:
+        out_dir = None
+    tasks = [(record, out_dir, payload, include_names) for record in records]
+    # 按块分发任务，减少进程间通信次数
+    chunksize = max(1, len(tasks) // ((max_workers or os.cpu_count() or 1) * 4))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(_render_label, tasks, chunksize=chunksize))
+    for record, _, error in results:
+        if error is not None:
+            print(f"生成快递 {record.get('express_id', '')} 的二维码失败: {error}")
+    failed = sum(error is not None for _, _, error in results)
+    
+    if sheet_path is None:
+        print(f"已生成 {len(results) - failed} 个二维码，失败 {failed} 个，保存在: {out_dir}")
+        return [(path, error) for _, path, error in results]
+    
+    labels = [(record, img) for record, img, error in results if error is None]
+    pages = make_print_sheets(labels, columns, rows)
+    root, ext = os.path.splitext(sheet_path)
+    if ext.lower() == ".pdf":
+        paths = [sheet_path] * len(labels)
+        if pages:
+            pages[0].save(sheet_path, save_all=True, append_images=pages[1:])
+    else:
+        per_page = columns * rows
+        paths = [f"{root}_{i // per_page + 1}{ext}" for i in range(len(labels))]
+        for page, path in zip(pages, paths[::per_page]):
+            page.save(path)
+    if pages:
+        print(f"已生成 {len(pages)} 页打印页: {', '.join(dict.fromkeys(paths))}")
+    paths = iter(paths)
+    return [(next(paths), None) if error is None else (None, error) for _, _, error in results]
+
 # 使用示例
 if __name__ == "__main__":
-    text = "E008,753951,P001,张三,P002,李四,A区2架,香蕉"
-    filename = "qrcode.png"
-    
-    generate_qr_code(text, filename)
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # 批量生成：python qrcode_create.py 快递清单.csv [打印页.pdf]
+        records = load_records_from_csv(sys.argv[1])
+        generate_qr_codes_batch(records, sheet_path=sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        text = "E008,753951,P001,张三,P002,李四,A区2架,香蕉"
+        filename = "qrcode.png"
+        
+        generate_qr_code(text, filename)
\ No newline at end of file
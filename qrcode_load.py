@@ -1,6 +1,115 @@
 import cv2
+import numpy as np
 from pyzbar.pyzbar import decode
+import hashlib
 import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import metrics
+import qr_payload
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+DOWNSCALE_SIDE = 800  # 第一阶段把图片长边缩小到的像素数
+CROP_MARGIN = 0.15  # 裁剪二维码区域时四周多留的比例（相对二维码边长）
+QR_CACHE_SIZE = 512  # 解码结果缓存的图片数
+# 解码阶段，按开销从小到大依次尝试，前一阶段失败才进入下一阶段
+DECODE_STAGES = ("gray", "crop", "threshold", "full")
+
+
+class QRResultCache:
+    """
+    二维码解码结果的 LRU 缓存
+
+    按图片文件内容的哈希值缓存二维码文本：同一张图片再次读取（例如重复导入同一个文件夹）
+    不需要重新解码；文件被修改后哈希值变化，自然不会命中旧结果。
+    """
+
+    def __init__(self, capacity=QR_CACHE_SIZE):
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # {内容哈希: 二维码文本}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(data):
+        return hashlib.blake2b(data, digest_size=16).digest()
+
+    def get(self, key):
+        with self._lock:
+            text = self._items.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def put(self, key, text):
+        with self._lock:
+            self._items[key] = text
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+qr_cache = QRResultCache()
+_stage_lock = threading.Lock()
+_stage_stats = {stage: [0, 0, 0.0] for stage in DECODE_STAGES}  # {阶段: [尝试次数, 成功次数, 耗时合计秒]}
+
+
+def _record_stages(log):
+    """
+    汇总各阶段的尝试结果
+
+    参数:
+        log: [(阶段, 耗时秒, 是否解出), ...]（进程池中解码时由工作进程返回）
+    """
+    with _stage_lock:
+        for stage, seconds, hit in log:
+            stats = _stage_stats[stage]
+            stats[0] += 1
+            stats[1] += hit
+            stats[2] += seconds
+    for stage, seconds, hit in log:
+        metrics.observe(f"qr_stage_{stage}", seconds)
+        if hit:
+            metrics.incr(f"qr_stage_{stage}_hits")
+
+
+def decode_stats():
+    """
+    各解码阶段的命中率和平均耗时，以及结果缓存的命中情况（用于调整各阶段参数）
+
+    返回:
+        dict: {"stages": {阶段: {attempts, hits, hit_rate, avg_ms}}, "cache": {hits, misses, size}}
+    """
+    with _stage_lock:
+        stages = {stage: {"attempts": attempts, "hits": hits,
+                          "hit_rate": round(hits / attempts, 4) if attempts else None,
+                          "avg_ms": round(seconds / attempts * 1000, 4) if attempts else None}
+                  for stage, (attempts, hits, seconds) in _stage_stats.items()}
+    return {"stages": stages,
+            "cache": {"hits": qr_cache.hits, "misses": qr_cache.misses, "size": len(qr_cache)}}
+
+
+def reset_decode_stats():
+    """清空阶段统计和结果缓存"""
+    with _stage_lock:
+        for stats in _stage_stats.values():
+            stats[:] = [0, 0, 0.0]
+    qr_cache.clear()
 
 def read_express_qr_code(image_path):
     """
@@ -13,32 +122,232 @@ def read_express_qr_code(image_path):
         dict: 包含快递信息的字典
     """
     try:
-        # 读取图片
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError("无法读取图片文件")
+        return decode_express_file(image_path)
+    except Exception as e:
+        metrics.incr("qr_decode_failures")
+        print(f"读取二维码时出错: {e}")
+        return None
+
+@metrics.timed("qr_decode")
+def decode_express_file(image_path):
+    """
+    解码二维码图片，失败时抛出异常
+    
+    参数:
+        image_path: 二维码图片路径
         
-        # 解码二维码
-        decoded_objects = decode(image)
+    返回:
+        dict: 包含快递信息的字典
+    """
+    # 读取文件内容，同一内容的图片直接使用缓存的解码结果
+    data = read_image_bytes(image_path)
+    key = qr_cache.key(data)
+    qr_data = qr_cache.get(key)
+    if qr_data is None:
+        log = []
+        qr_data = decode_image_bytes(data, log)
+        _record_stages(log)
+        qr_cache.put(key, qr_data)
+    
+    return parse_qr_text(qr_data)
+
+def read_image_bytes(image_path):
+    """读取图片文件内容"""
+    try:
+        with open(image_path, "rb") as f:
+            return f.read()
+    except OSError:
+        raise ValueError("无法读取图片文件")
+
+def decode_image_bytes(data, log=None):
+    """
+    解码图片文件内容中的第一个二维码，失败时抛出异常
+    
+    参数:
+        data: 图片文件内容
+        log: 列表，追加每个阶段的 (阶段, 耗时秒, 是否解出)
         
-        if not decoded_objects:
-            raise ValueError("未检测到二维码")
+    返回:
+        str: 二维码文本
+    """
+    # 从内存解码图片（cv2.imread 不支持 Windows 上的中文路径）
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("无法读取图片文件")
+    
+    texts, _ = decode_image(image, log)
+    if not texts:
+        raise ValueError("未检测到二维码")
+    
+    # 获取第一个二维码的数据
+    return texts[0]
+
+def decode_image(image, log=None):
+    """
+    分阶段解码图像中的二维码，开销小的方式先尝试，失败才进入下一阶段
+    
+    阶段（见 DECODE_STAGES）:
+        gray: 灰度图，长边缩小到 DOWNSCALE_SIDE（手机照片通常一步就能解出）
+        crop: 用 OpenCV 的二维码检测器在缩小图上定位，从原尺寸灰度图中裁出二维码区域
+        threshold: 原尺寸灰度图做 Otsu 二值化（光照不均、对比度低的照片）
+        full: 原始彩色图片（与只用 pyzbar 解码时相同）
+    
+    参数:
+        image: OpenCV图像（BGR或灰度）
+        log: 列表，追加每个阶段的 (阶段, 耗时秒, 是否解出)
         
-        # 获取第一个二维码的数据
-        qr_data = decoded_objects[0].data.decode('utf-8')
+    返回:
+        tuple: (二维码文本列表, 成功的阶段)，全部失败时为 ([], None)
+    """
+    start = time.perf_counter()
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    height, width = gray.shape
+    scale = min(1.0, DOWNSCALE_SIDE / max(height, width))
+    small = gray if scale == 1.0 else cv2.resize(
+        gray, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+    candidates = {
+        "gray": lambda: small,
+        "crop": lambda: _crop_to_qr(gray, small, scale),
+        "threshold": lambda: cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1],
+        "full": lambda: image,
+    }
+    for stage in DECODE_STAGES:
+        candidate = candidates[stage]()
+        texts = decode_qr_texts(candidate) if candidate is not None else []
+        now = time.perf_counter()
+        if log is not None:
+            log.append((stage, now - start, bool(texts)))
+        start = now
+        if texts:
+            return texts, stage
+    return [], None
+
+def _crop_to_qr(gray, small, scale):
+    """在缩小图上检测二维码位置，返回原尺寸灰度图中对应的区域，检测不到时返回None"""
+    found, points = cv2.QRCodeDetector().detect(small)
+    if not found or points is None:
+        return None
+    points = points.reshape(-1, 2) / scale
+    x0, y0 = points.min(axis=0)
+    x1, y1 = points.max(axis=0)
+    margin = max(x1 - x0, y1 - y0) * CROP_MARGIN
+    height, width = gray.shape
+    x0, y0 = max(0, int(x0 - margin)), max(0, int(y0 - margin))
+    x1, y1 = min(width, int(x1 + margin) + 1), min(height, int(y1 + margin) + 1)
+    if x1 - x0 < 8 or y1 - y0 < 8:
+        return None
+    return gray[y0:y1, x0:x1]
+
+def decode_qr_texts(image):
+    """
+    解码图像中的全部二维码
+    
+    参数:
+        image: OpenCV图像（BGR或灰度）
         
-        # 解析数据（假设是JSON格式）
-        try:
-            express_info = json.loads(qr_data)
-        except json.JSONDecodeError:
-            # 如果不是JSON，尝试其他格式解析
-            express_info = parse_express_data(qr_data)
+    返回:
+        list: 每个二维码的文本内容
+    """
+    return [obj.data.decode('utf-8') for obj in decode(image)]
+
+def parse_qr_text(qr_data):
+    """
+    把二维码文本解析为快递信息字典
+    
+    参数:
+        qr_data: 二维码文本
         
-        return express_info
+    返回:
+        dict: 包含快递信息的字典；紧凑格式的内容无效（校验和不符等）时抛出 ValueError
+    """
+    # 紧凑格式（qr_payload）按前缀判断，不做格式猜测
+    if qr_payload.is_compact(qr_data):
+        return qr_payload.decode_express(qr_data)
+    
+    # 旧格式：JSON、键值对或逗号分隔
+    try:
+        express_info = json.loads(qr_data)
+    except json.JSONDecodeError:
+        # 如果不是JSON，尝试其他格式解析
+        express_info = parse_express_data(qr_data)
+    
+    return express_info
+
+def list_qr_images(folder):
+    """
+    列出文件夹中的二维码图片
+    
+    参数:
+        folder: 文件夹路径
         
+    返回:
+        list: 按文件名排序的图片路径
+    """
+    return [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+            if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+def _decode_task(image_path):
+    """
+    在工作进程中解码一张图片，异常转换为错误信息返回
+    
+    返回:
+        tuple: (图片路径, 二维码文本或None, 错误信息或None, 各阶段记录)；
+               缓存和阶段统计由主进程汇总
+    """
+    log = []
+    try:
+        return image_path, decode_image_bytes(read_image_bytes(image_path), log), None, log
     except Exception as e:
-        print(f"读取二维码时出错: {e}")
-        return None
+        return image_path, None, str(e), log
+
+def read_express_qr_codes(paths, max_workers=None):
+    """
+    使用进程池批量解码二维码图片，按完成顺序逐个产出结果
+    
+    内容已在缓存中的图片直接产出，不提交给进程池。
+    
+    参数:
+        paths: 文件夹路径，或图片路径列表
+        max_workers: 工作进程数，默认为CPU核数
+        
+    返回:
+        generator: 逐个产出 (图片路径, 快递信息字典或None, 错误信息或None)
+    """
+    if isinstance(paths, str):
+        paths = list_qr_images(paths)
+    pending = {}  # {图片路径: 内容哈希}
+    for path in paths:
+        try:
+            key = qr_cache.key(read_image_bytes(path))
+        except ValueError as e:
+            yield path, None, str(e)
+            continue
+        qr_data = qr_cache.get(key)
+        if qr_data is None:
+            pending[path] = key
+        else:
+            yield _batch_result(path, qr_data, None)
+    if not pending:
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_decode_task, path) for path in pending]
+        for future in as_completed(futures):
+            path, qr_data, error, log = future.result()
+            _record_stages(log)
+            if error is None:
+                qr_cache.put(pending[path], qr_data)
+            yield _batch_result(path, qr_data, error)
+
+def _batch_result(path, qr_data, error):
+    """把批量解码的结果整理为 (图片路径, 快递信息字典或None, 错误信息或None)"""
+    info = None
+    if error is None:
+        try:
+            info = parse_qr_text(qr_data)
+        except Exception as e:
+            error = str(e)
+    metrics.incr("qr_batch_decoded" if error is None else "qr_decode_failures")
+    return path, info, error
 
 def parse_express_data(data_string):
     """
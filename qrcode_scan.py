@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+import cv2
+from qrcode_load import decode_qr_texts, parse_qr_text
+
+CAMERA_SOURCE = 0  # 默认摄像头编号；也可以是视频文件路径（用于测试）
+
+
+def scan_frames(source=CAMERA_SOURCE, frame_skip=2, max_width=640, dedup_seconds=3.0,
+                stop_event=None):
+    """
+    从视频源逐帧扫码
+
+    参数:
+        source: 摄像头编号或视频文件路径
+        frame_skip: 每解码一帧后跳过的帧数
+        max_width: 解码前把画面缩小到的最大宽度
+        dedup_seconds: 同一个二维码在该时间内只产出一次
+        stop_event: threading.Event，置位后停止扫描
+
+    返回:
+        generator: 逐个产出 (帧序号, [二维码文本, ...])，只包含新出现的二维码
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"无法打开视频源: {source}")
+    last_seen = {}  # {二维码文本: 最近一次看到的时间}
+    frame_index = -1
+    try:
+        while stop_event is None or not stop_event.is_set():
+            ok, frame = capture.read()
+            if not ok:
+                break  # 视频文件结束或摄像头断开
+            frame_index += 1
+            if frame_index % (frame_skip + 1):
+                continue
+            # 灰度 + 缩小后再解码，速度比原始彩色画面快很多
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            height, width = gray.shape
+            if width > max_width:
+                gray = cv2.resize(gray, (max_width, int(height * max_width / width)),
+                                  interpolation=cv2.INTER_AREA)
+            now = time.monotonic()
+            new_texts = []
+            for text in decode_qr_texts(gray):
+                if now - last_seen.get(text, float("-inf")) > dedup_seconds:
+                    new_texts.append(text)
+                last_seen[text] = now
+            if new_texts:
+                yield frame_index, new_texts
+            # 清理过期的去重记录
+            if len(last_seen) > 256:
+                last_seen = {text: seen for text, seen in last_seen.items()
+                             if now - seen <= dedup_seconds}
+    finally:
+        capture.release()
+
+
+class QRStreamScanner:
+    """
+    后台线程实时扫码
+
+    解码在后台线程中进行，界面线程通过 poll() 非阻塞地取出结果。
+    """
+
+    def __init__(self, source=CAMERA_SOURCE, frame_skip=2, max_width=640,
+                 dedup_seconds=3.0, queue_size=64):
+        self.source = source
+        self.options = {"frame_skip": frame_skip, "max_width": max_width,
+                        "dedup_seconds": dedup_seconds}
+        self.results = queue.Queue(maxsize=queue_size)
+        self.error = None  # 扫描线程异常退出时的错误信息
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """开始扫描"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for frame_index, texts in scan_frames(self.source, stop_event=self._stop_event,
+                                                  **self.options):
+                for text in texts:
+                    try:
+                        info = parse_qr_text(text)
+                    except Exception as e:
+                        info = None
+                        print(f"解析二维码内容时出错: {e}")
+                    try:
+                        self.results.put((frame_index, text, info), timeout=1)
+                    except queue.Full:
+                        pass  # 界面来不及处理时丢弃，去重过期后会再次扫到
+        except Exception as e:
+            self.error = str(e)
+
+    def poll(self):
+        """
+        取出目前已扫描到的全部结果
+
+        返回:
+            list: (帧序号, 二维码文本, 快递信息字典或None) 列表
+        """
+        items = []
+        while True:
+            try:
+                items.append(self.results.get_nowait())
+            except queue.Empty:
+                return items
+
+    @property
+    def running(self):
+        """扫描线程是否仍在运行"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        """停止扫描"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+
+# 使用示例
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else CAMERA_SOURCE
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+    for frame_index, texts in scan_frames(source):
+        for text in texts:
+            print(f"第 {frame_index} 帧: {text}")
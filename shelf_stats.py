@@ -0,0 +1,307 @@
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from models import STATUS_IN_STOCK
+
+AREA_PATTERN = re.compile(r"^(.*?区)")  # 位置中的区域部分，例如 "A区3号架" -> "A区"
+
+
+def shelf_key(location):
+    """
+    位置的统一写法（作为货架的键）
+
+    位置是自由填写的文本：去掉全部空白、英文字母转为大写，
+    "a区 3号架"、"A区3号架 " 视为同一个货架。
+    """
+    if not isinstance(location, str):
+        return ""
+    return "".join(location.split()).upper()
+
+
+def area_of(shelf):
+    """货架所在的区域（位置中“X区”之前的部分），没有区域时为货架本身"""
+    match = AREA_PATTERN.match(shelf)
+    return match.group(1) if match else shelf
+
+
+def _timestamp(text):
+    """时间字段（"YYYY-mm-dd HH:MM:SS"）转为时间戳（秒），无效时返回None"""
+    if not isinstance(text, str):
+        return None
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        return None
+
+
+class ShelfStats:
+    """
+    货架占用索引和快递站统计
+
+    货架 → 在库快递ID 的索引，以及各项计数都在入库/取件时增量维护，
+    查询时不需要遍历全部快递：在库数量、滞留时间是 O(1)，各货架占用是 O(货架数)。
+
+    统计内容:
+        各货架/区域的在库快递数
+        每天的入库数和取件数（按入库时间、取件时间的日期计）
+        已取件快递的滞留时间（入库到取件）合计、最长值，在库快递的平均已存放时间
+
+    在库与否按快递状态判断（旧数据中的已取件快递可能没有取件时间）。
+    没有入库时间的旧数据只计入占用，不计入入库数和滞留时间。
+    统计只包含热数据：归档的快递从统计中移除，与重启后按热数据重新统计的结果一致。
+    """
+
+    def __init__(self):
+        self.shelves = {}  # {货架: {express_id: None}}，只含在库快递；占空的货架保留
+        self.labels = {}  # {货架: 显示文本（第一次出现时的原始写法）}
+        self.in_stock = 0
+        self.intake_by_day = Counter()  # {"YYYY-mm-dd": 入库数}
+        self.pickup_by_day = Counter()  # {"YYYY-mm-dd": 取件数}
+        self.dwell_count = 0  # 有滞留时间的已取件快递数
+        self.dwell_total = 0.0  # 滞留时间合计（秒）
+        self.dwell_max = 0.0
+        self._stored_count = 0  # 有入库时间的在库快递数
+        self._stored_total = 0.0  # 这些快递入库时间戳之和，用于计算平均已存放时间
+
+    def add(self, express):
+        """加入一个快递（加载和入库时调用）；已取件的快递只计入统计"""
+        if express.stored_at:
+            self.intake_by_day[express.stored_at[:10]] += 1
+        if express.status == STATUS_IN_STOCK:
+            self._shelve(express)
+        else:
+            self._count_pick_up(express)
+
+    def remove(self, express):
+        """移除一个快递（归档，或其他实例修改、删除了它，见 ExpressStation.refresh）；已记录的最长滞留时间不回退"""
+        if express.stored_at:
+            self.intake_by_day[express.stored_at[:10]] -= 1
+        if express.status == STATUS_IN_STOCK:
+            self._unshelve(express)
+            return
+        if express.picked_at:
+            self.pickup_by_day[express.picked_at[:10]] -= 1
+        stored = _timestamp(express.stored_at)
+        picked = _timestamp(express.picked_at)
+        if stored is not None and picked is not None:
+            self.dwell_count -= 1
+            self.dwell_total -= max(picked - stored, 0.0)
+
+    def pick_up(self, express):
+        """快递已取件（在设置 picked_at 之后调用）"""
+        self._unshelve(express)
+        self._count_pick_up(express)
+
+    def _shelve(self, express):
+        key = shelf_key(express.location)
+        self.shelves.setdefault(key, {})[express.express_id] = None
+        if key and key not in self.labels:
+            self.labels[key] = express.location.strip()
+        self.in_stock += 1
+        stored = _timestamp(express.stored_at)
+        if stored is not None:
+            self._stored_count += 1
+            self._stored_total += stored
+
+    def _unshelve(self, express):
+        parcels = self.shelves.get(shelf_key(express.location))
+        if parcels is None or parcels.pop(express.express_id, False) is False:
+            return
+        self.in_stock -= 1
+        stored = _timestamp(express.stored_at)
+        if stored is not None:
+            self._stored_count -= 1
+            self._stored_total -= stored
+
+    def _count_pick_up(self, express):
+        if express.picked_at:
+            self.pickup_by_day[express.picked_at[:10]] += 1
+        stored = _timestamp(express.stored_at)
+        picked = _timestamp(express.picked_at)
+        if stored is not None and picked is not None:
+            dwell = max(picked - stored, 0.0)
+            self.dwell_count += 1
+            self.dwell_total += dwell
+            self.dwell_max = max(self.dwell_max, dwell)
+
+    def occupancy(self):
+        """
+        各货架的在库快递数
+
+        返回:
+            dict: {货架: 在库数}，按货架名排序
+        """
+        return dict(sorted(self._loads().items()))
+
+    def _loads(self):
+        """{货架: 在库数}（未排序）"""
+        return {shelf: len(parcels) for shelf, parcels in self.shelves.items()}
+
+    def area_occupancy(self):
+        """各区域的在库快递数"""
+        areas = Counter()
+        for shelf, load in self._loads().items():
+            areas[area_of(shelf)] += load
+        return dict(sorted(areas.items()))
+
+    def shelf_parcels(self, location):
+        """某个货架上的在库快递ID列表"""
+        return list(self.shelves.get(shelf_key(location), ()))
+
+    def suggest_shelf(self, candidates=None):
+        """
+        推荐在库快递最少的货架（入库时填写位置用）
+
+        参数:
+            candidates: 候选货架，默认为出现过的全部货架
+
+        返回:
+            str: 货架的显示文本（候选货架的原文，或该货架第一次出现时的写法）；没有任何候选货架时返回None
+        """
+        loads = self._loads()
+        if candidates is None:
+            candidates = self.labels.values()
+        best = None
+        for shelf in candidates:
+            key = shelf_key(shelf)
+            if not key:
+                continue
+            load = loads.get(key, 0)
+            if best is None or (load, key) < best[:2]:
+                best = (load, key, shelf.strip())
+        return best[2] if best is not None else None
+
+    def daily_rates(self, days=7, today=None):
+        """
+        最近几天每天的入库数和取件数
+
+        参数:
+            days: 天数（包括今天）
+            today: 今天的日期（date），默认为当前日期
+
+        返回:
+            list: [(日期 "YYYY-mm-dd", 入库数, 取件数), ...]，按日期从早到晚
+        """
+        today = date.today() if today is None else today
+        result = []
+        for offset in range(days - 1, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            result.append((day, self.intake_by_day[day], self.pickup_by_day[day]))
+        return result
+
+    def dwell_summary(self, now=None):
+        """
+        滞留时间统计（小时）
+
+        参数:
+            now: 当前时间戳（秒），默认为当前时间
+
+        返回:
+            dict: picked_count / avg_hours / max_hours（已取件快递），
+                  in_stock_avg_hours（在库快递的平均已存放时间）
+        """
+        now = datetime.now().timestamp() if now is None else now
+        return {
+            "picked_count": self.dwell_count,
+            "avg_hours": round(self.dwell_total / self.dwell_count / 3600, 2) if self.dwell_count else None,
+            "max_hours": round(self.dwell_max / 3600, 2) if self.dwell_count else None,
+            "in_stock_avg_hours": round((now - self._stored_total / self._stored_count) / 3600, 2)
+            if self._stored_count else None,
+        }
+
+    def summary(self, days=7, now=None):
+        """全部统计数据（取件服务的 /stats 接口和界面的统计按钮使用）"""
+        today = date.fromtimestamp(now) if now is not None else None
+        return {
+            "in_stock": self.in_stock,
+            "shelves": self.occupancy(),
+            "areas": self.area_occupancy(),
+            "daily": [{"date": day, "intake": intake, "pickup": pickup}
+                      for day, intake, pickup in self.daily_rates(days, today)],
+            "dwell": self.dwell_summary(now),
+        }
+
+
+class SqlShelfStats(ShelfStats):
+    """
+    直接在 SQLite 中聚合的统计（SqlExpressStation 使用，快递不在内存中）
+
+    接口同 ShelfStats，每次查询时按库中的数据分组计数；add/remove/pick_up 不需要维护任何状态。
+    货架包括热数据中出现过的全部位置（没有在库快递的货架数量为0）；
+    本实例尚未提交的写操作在提交后才计入。
+    """
+
+    def __init__(self, storage):
+        # 不调用 ShelfStats.__init__：计数都来自存储，不在内存中维护
+        self.storage = storage
+        self._counts = None  # 一次 summary/suggest_shelf 中共用的货架计数
+
+    def add(self, express):
+        pass
+
+    def remove(self, express):
+        pass
+
+    def pick_up(self, express):
+        pass
+
+    def _shelf_counts(self):
+        if self._counts is not None:
+            return self._counts
+        loads, labels = {}, {}
+        for location, count in self.storage.shelf_counts():
+            key = shelf_key(location)
+            if key:
+                loads[key] = loads.get(key, 0) + count
+                labels.setdefault(key, location.strip())
+        return loads, labels
+
+    def _loads(self):
+        return self._shelf_counts()[0]
+
+    @property
+    def labels(self):
+        return self._shelf_counts()[1]
+
+    @property
+    def in_stock(self):
+        return sum(self._loads().values())
+
+    def _with_counts(self, method, *args):
+        """调用基类方法，其中多次用到的货架计数只查询一次"""
+        self._counts = self._shelf_counts()
+        try:
+            return method(self, *args)
+        finally:
+            self._counts = None
+
+    def suggest_shelf(self, candidates=None):
+        return self._with_counts(ShelfStats.suggest_shelf, candidates)
+
+    def summary(self, days=7, now=None):
+        return self._with_counts(ShelfStats.summary, days, now)
+
+    def shelf_parcels(self, location):
+        key = shelf_key(location)
+        return [row[0] for row in self.storage.find_express(status=STATUS_IN_STOCK) if shelf_key(row[4]) == key]
+
+    def daily_rates(self, days=7, today=None):
+        today = date.today() if today is None else today
+        intake, pickup = self.storage.daily_counts((today - timedelta(days=days - 1)).isoformat())
+        result = []
+        for offset in range(days - 1, -1, -1):
+            day = (today - timedelta(days=offset)).isoformat()
+            result.append((day, intake.get(day, 0), pickup.get(day, 0)))
+        return result
+
+    def dwell_summary(self, now=None):
+        now = datetime.now().timestamp() if now is None else now
+        count, total, longest, stored_count, stored_avg = self.storage.dwell_totals()
+        stored = _timestamp(stored_avg)
+        return {
+            "picked_count": count,
+            "avg_hours": round(total / count / 3600, 2) if count else None,
+            "max_hours": round(longest / 3600, 2) if count else None,
+            "in_stock_avg_hours": round((now - stored) / 3600, 2) if stored_count and stored is not None else None,
+        }
@@ -0,0 +1,131 @@
+import hashlib
+import os
+import pickle
+
+CACHE_VERSION = 2
+CACHE_SUFFIX = ".cache"
+
+
+def file_signature(path):
+    """文件的 (修改时间, 大小)，用于快速判断文件是否变化"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def file_hash(path):
+    """文件内容的 SHA1（修改时间变了但内容没变时避免重新解析）"""
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def read_xlsx_rows(path, column_count):
+    """
+    按列读取 xlsx，不使用 iterrows
+
+    参数:
+        path: xlsx 文件路径
+        column_count: 读取前几列
+
+    返回:
+        list: 行元组列表（值为 Python 原生类型）；文件中缺少的列（旧版本的文件）为 None
+    """
+    import pandas as pd  # 缓存命中时不需要 pandas，只在解析 xlsx 时导入
+    df = pd.read_excel(path, header=0, engine='openpyxl')
+    columns = [df[col].tolist() for col in df.columns[:column_count]]
+    columns += [[None] * len(df)] * (column_count - len(columns))
+    return list(zip(*columns))
+
+
+def _load_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return None
+    return cache
+
+
+def save_rows(path, rows, digest=None):
+    """
+    为 xlsx 文件写入缓存
+
+    参数:
+        path: xlsx 文件路径（必须已存在）
+        rows: 与该文件内容一致的行元组列表
+        digest: 文件内容哈希，未提供时重新计算
+    """
+    cache = {
+        "version": CACHE_VERSION,
+        "signature": file_signature(path),
+        "sha1": digest or file_hash(path),
+        "rows": rows,
+    }
+    tmp_path = path + CACHE_SUFFIX + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path + CACHE_SUFFIX)
+
+
+def load_rows(path, column_count):
+    """
+    读取 xlsx 的数据行，文件未变化时直接使用二进制缓存
+
+    参数:
+        path: xlsx 文件路径
+        column_count: 读取前几列
+
+    返回:
+        list: 行元组列表
+    """
+    cache = _load_cache(path + CACHE_SUFFIX)
+    if cache is not None and cache["rows"] and len(cache["rows"][0]) != column_count:
+        cache = None  # 列数变了（升级后新增了列），重新读取
+    if cache is not None:
+        if cache["signature"] == file_signature(path):
+            return cache["rows"]
+        digest = file_hash(path)
+        if cache["sha1"] == digest:
+            # 内容没变（例如被复制过），只更新签名
+            save_rows(path, cache["rows"], digest)
+            return cache["rows"]
+    rows = read_xlsx_rows(path, column_count)
+    save_rows(path, rows)
+    return rows
+
+
+# 使用示例：测量 100k 快递的启动加载时间
+if __name__ == "__main__":
+    import tempfile
+    import time
+    import pandas as pd
+
+    count = 100000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "express.xlsx")
+        pd.DataFrame({
+            "express_id": [f"E{i:06d}" for i in range(count)],
+            "pick_code": [100000 + i for i in range(count)],
+            "sender": [f"P{i % 5000:04d}" for i in range(count)],
+            "receiver": [f"P{(i * 7) % 5000:04d}" for i in range(count)],
+            "location": [f"{'ABCD'[i % 4]}区{i % 20}架" for i in range(count)],
+            "notes": ["无"] * count,
+            "status": ["在库"] * count,
+        }).to_excel(path, index=False, sheet_name='快递数据', engine='openpyxl')
+
+        start = time.perf_counter()
+        df = pd.read_excel(path, header=0, engine='openpyxl')
+        rows = [tuple(v[:7]) for k, v in df.iterrows()]
+        print(f"原方式（read_excel + iterrows）: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        rows = load_rows(path, 7)
+        print(f"冷启动（按列读取并写缓存）: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        rows = load_rows(path, 7)
+        print(f"热启动（读取二进制缓存）: {time.perf_counter() - start:.3f}s，共 {len(rows)} 行")
@@ -0,0 +1,861 @@
+import os
+import sqlite3
+import threading
+from journal import OperationJournal
+from file_lock import shared_lock, LOCK_TIMEOUT
+import snapshot_cache
+import metrics
+from models import normalize_pick_code, STATUS_IN_STOCK, STATUS_PICKED_UP
+
+USER_COLUMNS = ["ID", "name"]
+EXPRESS_COLUMNS = ["express_id", "pick_code", "sender", "receiver", "location", "notes", "status",
+                   "picked_at", "stored_at"]
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # 时间字段的保存格式，字符串顺序即时间顺序
+CHANGE_LOG_KEEP = 10000  # SQLite changes 表保留的最近修改记录数
+SQL_BATCH = 500  # SQL 的 IN (...) 每次最多带的参数个数
+COMPACT_RATIO = 1.0  # 日志大小达到快照（两个 xlsx）大小的这个倍数时压缩
+MIN_COMPACT_BYTES = 1 << 20  # 日志小于这个大小时不压缩（约5000条记录，重放只需几十毫秒）
+
+
+def canonical_pick_code(value):
+    """取件码统一为6位数字字符串，无效的取件码（例如空值）原样返回"""
+    try:
+        return normalize_pick_code(value)
+    except ValueError:
+        return value
+
+
+def canonical_express_row(row):
+    """
+    把快递行整理为统一形式
+
+    取件码统一为6位数字字符串；旧数据没有的列补为 None，
+    时间字段的空值（pandas 读出的 NaN）也转为 None。
+    """
+    row = list(row) + [None] * (len(EXPRESS_COLUMNS) - len(row))
+    row[1] = canonical_pick_code(row[1])
+    for i in (7, 8):
+        if not isinstance(row[i], str):
+            row[i] = None
+    return row
+
+
+class WriteConflict(Exception):
+    """
+    写操作与其他程序实例的修改冲突（例如同一快递已被另一台柜台取件），该操作没有写入
+
+    属性:
+        method: 写操作方法名
+        arguments: 写操作参数元组
+    """
+
+    def __init__(self, method, arguments, reason):
+        super().__init__(reason)
+        self.method = method
+        self.arguments = arguments
+
+
+class BaseStorage:
+    """
+    存储后端接口
+
+    界面层只通过以下操作读写数据，不关心数据落在 Excel 还是 SQLite 中。
+    人物行为 (person_id, name)，快递行为与 EXPRESS_COLUMNS 顺序一致的元组。
+    """
+
+    def load_people(self):
+        """返回全部人物行"""
+        raise NotImplementedError
+
+    def load_express(self):
+        """返回全部快递行"""
+        raise NotImplementedError
+
+    def upsert_person(self, person_id, name):
+        """新建或更新人物"""
+        raise NotImplementedError
+
+    def insert_express(self, express_id, pick_code, sender, receiver, location, notes, status,
+                       picked_at=None, stored_at=None):
+        """快递入库"""
+        raise NotImplementedError
+
+    def update_status(self, express_id, status, picked_at=None):
+        """更新快递状态（取件时同时记录取件时间）"""
+        raise NotImplementedError
+
+    def delete_express(self, express_id):
+        """删除快递（归档后从热数据中移除）"""
+        raise NotImplementedError
+
+    def apply_batch(self, operations):
+        """
+        批量执行写操作，后端支持时整批只落盘一次
+
+        参数:
+            operations: [(方法名, 参数元组), ...]，
+                        方法名为 upsert_person/insert_express/update_status/delete_express
+
+        返回:
+            list: 与其他实例的修改冲突而没有写入的操作（WriteConflict），其余操作已写入
+        """
+        for method, args in operations:
+            getattr(self, method)(*args)
+        return []
+
+    def has_changes(self):
+        """是否有其他程序实例写入的修改尚未取出（只做开销很小的检查）"""
+        return False
+
+    def poll_changes(self):
+        """
+        取出其他程序实例写入的修改（只包含上次调用之后变化的数据）
+
+        返回:
+            tuple: ({person_id: name}, {express_id: 快递行，已删除为None})；
+                   变化太多无法逐条读取时返回 None，调用方需要重新加载全部数据
+        """
+        return {}, {}
+
+    def find_express(self, express_id=None, pick_code=None, person_id=None, status=None):
+        """
+        按条件查找快递行（条件之间为“与”关系）
+
+        参数:
+            express_id: 快递ID
+            pick_code: 取件码
+            person_id: 发件人或收件人ID
+            status: 快递状态
+
+        返回:
+            list: 快递行列表
+        """
+        results = []
+        for row in self.load_express():
+            if express_id is not None and row[0] != express_id:
+                continue
+            if pick_code is not None and row[1] != canonical_pick_code(pick_code):
+                continue
+            if person_id is not None and person_id not in (row[2], row[3]):
+                continue
+            if status is not None and row[6] != status:
+                continue
+            results.append(row)
+        return results
+
+    def close(self):
+        """关闭存储"""
+
+
+class ExcelStorage(BaseStorage):
+    """
+    Excel 快照 + 追加日志存储
+
+    xlsx 文件作为快照，每次操作只追加一条日志记录，
+    日志大小达到快照大小的 compact_ratio 倍（至少 min_compact_bytes）或关闭时压缩回快照。
+    重写快照的耗时与快照大小成正比，按比例触发压缩，每次操作分摊的压缩耗时不随数据量增长，
+    启动时需要重放的日志也不超过快照的相应比例；固定条数触发在数据量大时会频繁长时间持有文件锁。
+
+    多个程序实例可以共用同一个文件夹中的数据（例如两台柜台电脑访问同一个网络文件夹）：
+    读取和写入都持有文件锁（express.journal.lock），写入前先读取其他实例追加的日志记录，
+    再按最新数据检查写操作（快递ID/取件码是否已被占用、状态是否已被改变），
+    冲突的操作不写入并返回 WriteConflict，不会覆盖其他实例的修改。
+    """
+
+    def __init__(self, user_file="user.xlsx", express_file="express.xlsx",
+                 journal_file="express.journal", compact_ratio=COMPACT_RATIO,
+                 min_compact_bytes=MIN_COMPACT_BYTES):
+        self.user_file = user_file
+        self.express_file = express_file
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self.journal = OperationJournal(journal_file)
+        self.lock = shared_lock(journal_file + ".lock")
+        self._people = {}  # {person_id: name}
+        self._express = {}  # {express_id: 快递行(list)}
+        self._in_stock_codes = {}  # {pick_code: express_id}，只含在库快递，用于检查取件码冲突
+        self._loaded = False
+        # 其他实例修改过、尚未被 poll_changes 取走的人物和快递
+        self._changed_people = set()
+        self._changed_express = set()
+        self._needs_reload = False
+
+    def _load(self):
+        """读取快照并重放日志"""
+        if self._loaded:
+            return
+        with self.lock:
+            if self._loaded:
+                return
+            with metrics.timer("storage_load"):
+                self._load_rows()
+            self._loaded = True
+            self.maybe_compact()
+
+    def _load_rows(self):
+        """读取快照和日志中的全部数据"""
+        self._people, self._express, self._in_stock_codes = {}, {}, {}
+        # xlsx 未变化时直接读取二进制缓存
+        for person_id, name in snapshot_cache.load_rows(self.user_file, len(USER_COLUMNS)):
+            self._people[person_id] = name
+        for row in snapshot_cache.load_rows(self.express_file, len(EXPRESS_COLUMNS)):
+            row = canonical_express_row(row)
+            self._express[row[0]] = row
+            if row[6] == STATUS_IN_STOCK:
+                self._in_stock_codes[row[1]] = row[0]
+        for record in self.journal.replay():
+            self._apply(record)
+
+    def _refresh(self):
+        """读取其他实例追加的日志记录（调用方持有锁）"""
+        if not self._loaded or not self.journal.changed():
+            return
+        records = self.journal.read_new()
+        if records is None:
+            # 其他实例已压缩不止一次，只能重新读取快照
+            self._load_rows()
+            self._needs_reload = True
+            return
+        for record in records:
+            self._apply(record)
+            if record["op"] == "person":
+                self._changed_people.add(record["id"])
+            else:
+                self._changed_express.add(record["express_id"])
+
+    def _apply(self, record):
+        """把一条日志记录应用到内存数据"""
+        op = record["op"]
+        if op == "person":
+            self._people[record["id"]] = record["name"]
+        elif op == "insert":
+            row = canonical_express_row([record.get(col) for col in EXPRESS_COLUMNS])
+            self._express[row[0]] = row
+            if row[6] == STATUS_IN_STOCK:
+                self._in_stock_codes[row[1]] = row[0]
+        elif op == "status":
+            row = self._express.get(record["express_id"])
+            if row is not None:
+                if row[6] == STATUS_IN_STOCK and self._in_stock_codes.get(row[1]) == row[0]:
+                    del self._in_stock_codes[row[1]]
+                row[6] = record["status"]
+                row[7] = record.get("picked_at")
+                if row[6] == STATUS_IN_STOCK:
+                    self._in_stock_codes[row[1]] = row[0]
+        elif op == "delete":
+            row = self._express.pop(record["express_id"], None)
+            if row is not None and self._in_stock_codes.get(row[1]) == row[0]:
+                del self._in_stock_codes[row[1]]
+
+    def _check(self, method, args):
+        """按当前数据检查写操作，与其他实例的修改冲突时返回原因"""
+        if method == "insert_express":
+            express_id, pick_code = args[0], canonical_pick_code(args[1])
+            if express_id in self._express:
+                return f"快递ID {express_id} 已被其他终端入库"
+            if args[6] == STATUS_IN_STOCK and pick_code in self._in_stock_codes:
+                return f"取件码 {pick_code} 已被其他终端使用"
+        elif method == "update_status":
+            row = self._express.get(args[0])
+            if row is None:
+                return f"快递 {args[0]} 已不存在（可能已被其他终端归档）"
+            if row[6] == args[1]:
+                return f"快递 {args[0]} 已被其他终端标记为{args[1]}"
+        return None
+
+    @staticmethod
+    def _record(method, args):
+        """把写操作转换为日志记录"""
+        if method == "upsert_person":
+            return {"op": "person", "id": args[0], "name": args[1]}
+        if method == "insert_express":
+            record = {"op": "insert"}
+            record.update(zip(EXPRESS_COLUMNS, args))
+            return record
+        if method == "update_status":
+            return {"op": "status", "express_id": args[0], "status": args[1],
+                    "picked_at": args[2] if len(args) > 2 else None}
+        if method == "delete_express":
+            return {"op": "delete", "express_id": args[0]}
+        raise ValueError(f"未知的写操作: {method}")
+
+    def apply_batch(self, operations):
+        conflicts = []
+        with self.lock:
+            # 未加载就压缩会用空数据覆盖快照
+            self._load()
+            self._refresh()
+            records = []
+            try:
+                for method, args in operations:
+                    reason = self._check(method, args)
+                    if reason is not None:
+                        conflicts.append(WriteConflict(method, args, reason))
+                        # 本实例内存中的这条数据已过时，交给 poll_changes 同步
+                        self._changed_express.add(args[0])
+                        continue
+                    record = self._record(method, args)
+                    self._apply(record)
+                    records.append(record)
+                self.journal.append_many(records)
+            except BaseException:
+                # 内存数据已改但日志没写成功，下次使用时重新读取
+                self._loaded = False
+                raise
+            self.maybe_compact()
+        return conflicts
+
+    def has_changes(self):
+        # 只需一次 stat，不加锁
+        return self._loaded and bool(self.journal.changed() or self._needs_reload
+                                     or self._changed_people or self._changed_express)
+
+    def poll_changes(self):
+        if not self.has_changes():
+            return {}, {}
+        with self.lock:
+            self._refresh()
+            if self._needs_reload:
+                self._needs_reload = False
+                self._changed_people, self._changed_express = set(), set()
+                return None
+            people = {person_id: self._people[person_id] for person_id in self._changed_people
+                      if person_id in self._people}
+            express = {}
+            for express_id in self._changed_express:
+                row = self._express.get(express_id)
+                express[express_id] = tuple(row) if row is not None else None
+            self._changed_people, self._changed_express = set(), set()
+        return people, express
+
+    def load_people(self):
+        self._load()
+        return list(self._people.items())
+
+    def load_express(self):
+        self._load()
+        return [tuple(row) for row in self._express.values()]
+
+    def upsert_person(self, person_id, name):
+        self.apply_batch([("upsert_person", (person_id, name))])
+
+    def insert_express(self, express_id, pick_code, sender, receiver, location, notes, status,
+                       picked_at=None, stored_at=None):
+        self.apply_batch([("insert_express", (express_id, pick_code, sender, receiver,
+                                              location, notes, status, picked_at, stored_at))])
+
+    def update_status(self, express_id, status, picked_at=None):
+        self.apply_batch([("update_status", (express_id, status, picked_at))])
+
+    def delete_express(self, express_id):
+        self.apply_batch([("delete_express", (express_id,))])
+
+    def snapshot_size(self):
+        """快照文件的总字节数"""
+        size = 0
+        for path in (self.user_file, self.express_file):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+    def maybe_compact(self):
+        """日志大小达到阈值时压缩（调用方持有锁）"""
+        threshold = max(self.min_compact_bytes, self.compact_ratio * self.snapshot_size())
+        if self.journal.count and self.journal.offset >= threshold:
+            self.compact()
+
+    @metrics.timed("compact")
+    def compact(self):
+        """把内存数据写回快照（xlsx）并开始新一代日志"""
+        with self.lock:
+            import pandas as pd  # 只有写快照时才需要 pandas，启动时不导入（约0.5秒）
+            # 先读入其他实例的最新记录，快照必须包含日志中的全部数据
+            self._refresh()
+            user_rows = list(self._people.items())
+            express_rows = [tuple(row) for row in self._express.values()]
+            # 先写临时文件再原子替换，避免写到一半时崩溃损坏快照
+            for rows, columns, path, sheet_name in (
+                    (user_rows, USER_COLUMNS, self.user_file, '人物数据'),
+                    (express_rows, EXPRESS_COLUMNS, self.express_file, '快递数据')):
+                root, ext = os.path.splitext(path)
+                tmp_path = root + ".tmp" + ext
+                pd.DataFrame(rows, columns=columns).to_excel(
+                    tmp_path, index=False, sheet_name=sheet_name, engine='openpyxl')
+                os.replace(tmp_path, path)
+                # 刚写入的数据就是缓存内容，下次启动无需重新解析
+                snapshot_cache.save_rows(path, rows)
+            self.journal.reset()
+
+    def close(self):
+        """退出前压缩日志"""
+        if not self._loaded:
+            return
+        with self.lock:
+            self._refresh()
+            if self.journal.count:
+                self.compact()
+        self.journal.close()
+
+
+class SqliteStorage(BaseStorage):
+    """
+    SQLite 存储
+
+    每批写操作是一个事务；快递表在 pick_code、sender、receiver、status、位置、取件/入库时间上建有索引，
+    find_express 直接走索引查询，不需要读取全部快递。
+    status 只有两个取值，和更精确的条件一起使用时写成 +status，不让 SQLite 选用 status 索引。
+    SqlExpressStation（STORAGE_BACKEND = "sqlite" 时使用）不把快递读入内存：
+    取件、查询、列表分页、搜索和统计都通过下面的查询方法在库中完成；
+    ExpressStation 仍可以使用本存储，这时启动时通过 load_express 读入全部热数据。
+
+    多个程序实例可以共用同一个数据库文件:
+        写入使用 BEGIN IMMEDIATE，各实例的写事务依次执行；每个写操作带有前提条件
+        （快递ID、在库取件码未被占用，状态确实发生变化），不满足时不写入并返回 WriteConflict。
+        触发器把每次修改的主键记入 changes 表，PRAGMA data_version 变化时
+        只读取 changes 中新增的部分，按主键重新读取变化的行。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS people (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS express (
+            express_id TEXT PRIMARY KEY,
+            pick_code TEXT NOT NULL,
+            sender TEXT NOT NULL REFERENCES people(id),
+            receiver TEXT NOT NULL REFERENCES people(id),
+            location TEXT,
+            notes TEXT,
+            status TEXT NOT NULL,
+            picked_at TEXT,
+            stored_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_express_pick_code ON express(pick_code);
+        CREATE INDEX IF NOT EXISTS idx_express_sender ON express(sender);
+        CREATE INDEX IF NOT EXISTS idx_express_receiver ON express(receiver);
+        CREATE INDEX IF NOT EXISTS idx_express_status ON express(status);
+        CREATE INDEX IF NOT EXISTS idx_express_status_picked_at ON express(status, picked_at);
+        CREATE INDEX IF NOT EXISTS idx_express_stored_at ON express(stored_at);
+        CREATE INDEX IF NOT EXISTS idx_express_location_status ON express(location, status);
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS people_inserted AFTER INSERT ON people
+            BEGIN INSERT INTO changes (kind, key) VALUES ('person', NEW.id); END;
+        CREATE TRIGGER IF NOT EXISTS people_updated AFTER UPDATE ON people
+            BEGIN INSERT INTO changes (kind, key) VALUES ('person', NEW.id); END;
+        CREATE TRIGGER IF NOT EXISTS express_inserted AFTER INSERT ON express
+            BEGIN INSERT INTO changes (kind, key) VALUES ('express', NEW.express_id); END;
+        CREATE TRIGGER IF NOT EXISTS express_updated AFTER UPDATE ON express
+            BEGIN INSERT INTO changes (kind, key) VALUES ('express', NEW.express_id); END;
+        CREATE TRIGGER IF NOT EXISTS express_deleted AFTER DELETE ON express
+            BEGIN INSERT INTO changes (kind, key) VALUES ('express', OLD.express_id); END;
+    """
+
+    def __init__(self, db_file="express.db"):
+        self.db_file = db_file
+        # 写操作可能由后台持久化线程执行，同一连接上的操作用锁串行
+        self.conn = sqlite3.connect(db_file, check_same_thread=False, timeout=LOCK_TIMEOUT)
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        # 旧库缺少后来新增的列（例如 picked_at）时补上
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(express)")}
+        for column in EXPRESS_COLUMNS:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE express ADD COLUMN {column} TEXT")
+        # 在读取数据之前记下位置：之后其他实例的修改即使已包含在读到的数据中，再应用一次也没有影响
+        self._last_seq = self._max_seq()
+        self._pruned_seq = self._last_seq
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self._changed_people = set()
+        self._changed_express = set()
+        self._needs_reload = False
+
+    def _max_seq(self):
+        # 已分配的最大序号（changes 中的记录被清理后仍然保留）
+        return self.conn.execute(
+            "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'changes'), 0)").fetchone()[0]
+
+    def load_people(self):
+        with self._lock:
+            return self.conn.execute("SELECT id, name FROM people").fetchall()
+
+    def load_express(self):
+        # 旧库的 pick_code 列是 INTEGER，读出后统一为6位字符串
+        with self._lock:
+            return [tuple(canonical_express_row(row)) for row in self.conn.execute(
+                f"SELECT {', '.join(EXPRESS_COLUMNS)} FROM express ORDER BY rowid")]
+
+    SQL = {
+        "upsert_person": "INSERT INTO people (id, name) VALUES (?, ?) "
+                         "ON CONFLICT(id) DO UPDATE SET name = excluded.name",
+        "insert_express": f"INSERT INTO express ({', '.join(EXPRESS_COLUMNS)}) "
+                          f"VALUES ({', '.join('?' * len(EXPRESS_COLUMNS))})",
+        # 状态没有变化（例如已被其他终端取件）时不更新，rowcount 为0
+        "update_status": "UPDATE express SET status = ?2, picked_at = ?3 "
+                         "WHERE express_id = ?1 AND status != ?2",
+        "delete_express": "DELETE FROM express WHERE express_id = ?",
+    }
+
+    def _apply(self, method, args):
+        """执行一个写操作，与其他实例的修改冲突时不写入并返回原因"""
+        if method == "insert_express":
+            pick_code = canonical_pick_code(args[1])
+            if args[6] == STATUS_IN_STOCK and self.conn.execute(
+                    "SELECT 1 FROM express WHERE pick_code = ? AND +status = ? LIMIT 1",
+                    (pick_code, STATUS_IN_STOCK)).fetchone():
+                return f"取件码 {pick_code} 已被其他终端使用"
+            try:
+                self.conn.execute(self.SQL[method], args)
+            except sqlite3.IntegrityError:
+                return f"快递ID {args[0]} 已被其他终端入库"
+            return None
+        cursor = self.conn.execute(self.SQL[method], args)
+        if method == "update_status" and cursor.rowcount == 0:
+            if self.conn.execute("SELECT 1 FROM express WHERE express_id = ?", (args[0],)).fetchone():
+                return f"快递 {args[0]} 已被其他终端标记为{args[1]}"
+            return f"快递 {args[0]} 已不存在（可能已被其他终端归档）"
+        return None
+
+    def apply_batch(self, operations):
+        conflicts = []
+        with self._lock:
+            # 整批在一个事务中提交；IMMEDIATE 在开始时就取得写锁，其他实例的写事务排在前后
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 先记下其他实例已提交的修改，本批写入的修改不需要通知自己
+                self._read_changes()
+                for method, args in operations:
+                    reason = self._apply(method, args)
+                    if reason is not None:
+                        conflicts.append(WriteConflict(method, args, reason))
+                        self._changed_express.add(args[0])
+                self._last_seq = self._max_seq()
+                if self._last_seq - self._pruned_seq >= CHANGE_LOG_KEEP:
+                    self.conn.execute("DELETE FROM changes WHERE seq <= ?",
+                                      (self._last_seq - CHANGE_LOG_KEEP,))
+                    self._pruned_seq = self._last_seq
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        return conflicts
+
+    def _read_changes(self):
+        """读取 changes 表中其他实例新增的修改记录（调用方持有锁）"""
+        rows = self.conn.execute("SELECT seq, kind, key FROM changes WHERE seq > ? ORDER BY seq",
+                                 (self._last_seq,)).fetchall()
+        if not rows:
+            return
+        if rows[0][0] > self._last_seq + 1 and self.conn.execute(
+                "SELECT 1 FROM changes WHERE seq <= ? LIMIT 1", (self._last_seq,)).fetchone() is None:
+            # 需要的记录已被清理（本实例太久没有同步），只能重新加载全部数据
+            self._needs_reload = True
+        for seq, kind, key in rows:
+            (self._changed_people if kind == "person" else self._changed_express).add(key)
+        self._last_seq = rows[-1][0]
+
+    def has_changes(self):
+        # data_version 只在其他连接提交后变化，没有变化时不需要查询 changes 表
+        with self._lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            return version != self._data_version or bool(self._changed_people or self._changed_express)
+
+    def poll_changes(self):
+        with self._lock:
+            if not self.has_changes():
+                return {}, {}
+            self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            self._read_changes()
+            changed_people, self._changed_people = self._changed_people, set()
+            changed_express, self._changed_express = self._changed_express, set()
+            if self._needs_reload:
+                self._needs_reload = False
+                return None
+            people = {}
+            for person_id in changed_people:
+                row = self.conn.execute("SELECT name FROM people WHERE id = ?", (person_id,)).fetchone()
+                if row is not None:
+                    people[person_id] = row[0]
+            express = {}
+            for express_id in changed_express:
+                rows = self.find_express(express_id=express_id)
+                express[express_id] = rows[0] if rows else None
+            return people, express
+
+    def upsert_person(self, person_id, name):
+        self.apply_batch([("upsert_person", (person_id, name))])
+
+    def insert_express(self, express_id, pick_code, sender, receiver, location, notes, status,
+                       picked_at=None, stored_at=None):
+        self.apply_batch([("insert_express", (express_id, pick_code, sender, receiver,
+                                              location, notes, status, picked_at, stored_at))])
+
+    def update_status(self, express_id, status, picked_at=None):
+        self.apply_batch([("update_status", (express_id, status, picked_at))])
+
+    def delete_express(self, express_id):
+        self.apply_batch([("delete_express", (express_id,))])
+
+    def find_express(self, express_id=None, pick_code=None, person_id=None, status=None):
+        conditions = []
+        params = []
+        if express_id is not None:
+            conditions.append("express_id = ?")
+            params.append(express_id)
+        if pick_code is not None:
+            conditions.append("pick_code = ?")
+            params.append(canonical_pick_code(pick_code))
+        if person_id is not None:
+            # 拆成两个等值条件的 OR，SQLite 会分别使用 sender/receiver 索引
+            conditions.append("(sender = ? OR receiver = ?)")
+            params.extend([person_id, person_id])
+        if status is not None:
+            conditions.append("+status = ?" if conditions else "status = ?")
+            params.append(status)
+        sql = f"SELECT {', '.join(EXPRESS_COLUMNS)} FROM express"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        with self._lock:
+            return [tuple(canonical_express_row(row)) for row in self.conn.execute(sql, params)]
+
+    def _select(self, sql, params=()):
+        """执行查询并返回整理后的快递行（sql 从 express 表查询 EXPRESS_COLUMNS 各列）"""
+        with self._lock:
+            return [tuple(canonical_express_row(row)) for row in self.conn.execute(sql, params)]
+
+    def existing_express_ids(self, express_ids):
+        """返回 express_ids 中已在库中的快递ID集合（按主键分批查询）"""
+        express_ids = list(express_ids)
+        found = set()
+        with self._lock:
+            for start in range(0, len(express_ids), SQL_BATCH):
+                batch = express_ids[start:start + SQL_BATCH]
+                found.update(row[0] for row in self.conn.execute(
+                    f"SELECT express_id FROM express WHERE express_id IN ({', '.join('?' * len(batch))})",
+                    batch))
+        return found
+
+    def pick_code_state(self, recent):
+        """
+        重建取件码分配器需要的取件码（不读取快递的其他字段）
+
+        参数:
+            recent: 已取件快递取最近多少个的取件码
+
+        返回:
+            tuple: (在库快递的取件码列表, 最近取件的取件码列表（按取件时间从早到晚）)
+        """
+        with self._lock:
+            in_stock = [canonical_pick_code(row[0]) for row in self.conn.execute(
+                "SELECT pick_code FROM express WHERE status = ?", (STATUS_IN_STOCK,))]
+            picked = [canonical_pick_code(row[0]) for row in self.conn.execute(
+                "SELECT pick_code FROM express WHERE status = ? "
+                "ORDER BY picked_at DESC, rowid DESC LIMIT ?", (STATUS_PICKED_UP, recent))]
+        return in_stock, picked[::-1]
+
+    def find_picked_before(self, cutoff, include_undated=False):
+        """取件时间早于 cutoff 的已取件快递行（include_undated 时包括没有取件时间的）"""
+        undated = " OR picked_at IS NULL" if include_undated else ""
+        return self._select(f"SELECT {', '.join(EXPRESS_COLUMNS)} FROM express "
+                            f"WHERE status = ? AND (picked_at < ?{undated})", (STATUS_PICKED_UP, cutoff))
+
+    @staticmethod
+    def _like(text):
+        """LIKE 的“包含”模式（转义 % 和 _）"""
+        text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return f"%{text}%"
+
+    def search_express(self, tokens, limit=None, in_stock_only=False):
+        """
+        即时搜索：每个词包含在收件人/发件人的ID或姓名、快递ID、位置、备注中（不区分英文大小写）
+
+        参数:
+            tokens: 检索词列表，返回同时匹配全部词的快递
+            limit: 最多返回的行数，None 表示不限
+            in_stock_only: 只返回在库快递
+
+        返回:
+            list: 快递行列表（按入库顺序）
+        """
+        conditions, params = [], []
+        for token in tokens:
+            params.append(self._like(token))
+            like = f"LIKE ?{len(params)} ESCAPE '\\'"
+            # 人物表比快递表小得多：先找出匹配的人物（子查询只执行一次），快递只按ID比较
+            people = f"SELECT id FROM people WHERE id {like} OR name {like}"
+            conditions.append(f"(sender IN ({people}) OR receiver IN ({people}) OR express_id {like} "
+                              f"OR location {like} OR notes {like})")
+        if in_stock_only:
+            conditions.append(f"+status = ?{len(params) + 1}")
+            params.append(STATUS_IN_STOCK)
+        sql = f"SELECT {', '.join(EXPRESS_COLUMNS)} FROM express"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._select(sql, params)
+
+    # 快递列表各列（express_list_model.LIST_COLUMNS）对应的 SQL 表达式，列表筛选和排序使用
+    LIST_EXPRESSIONS = (
+        "e.express_id",
+        "e.pick_code",
+        "COALESCE(s.name, '') || '(' || e.sender || ')'",
+        "COALESCE(r.name, '') || '(' || e.receiver || ')'",
+        "e.location",
+        "COALESCE(e.notes, '')",
+        "e.status",
+    )
+
+    PERSON_LIST_COLUMNS = (2, 3)  # 需要连接人物表的列（发件人、收件人）
+
+    def _list_query(self, columns, filter_text, sort_column=None):
+        sql = f"SELECT {columns} FROM express e"
+        if filter_text or sort_column in self.PERSON_LIST_COLUMNS:
+            sql += " LEFT JOIN people s ON s.id = e.sender LEFT JOIN people r ON r.id = e.receiver"
+        if not filter_text:
+            return sql, []
+        # 与内存中的列表筛选一致：任意一列包含筛选文本（区分大小写）
+        return sql + " WHERE " + " OR ".join(f"instr({expression}, ?1) > 0"
+                                              for expression in self.LIST_EXPRESSIONS), [filter_text]
+
+    def count_express(self, filter_text=""):
+        """快递列表的行数（filter_text 同 list_express）"""
+        sql, params = self._list_query("COUNT(*)", filter_text)
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def list_express(self, filter_text="", sort_column=None, reverse=False, offset=0, limit=None):
+        """
+        快递列表的一页
+
+        参数:
+            filter_text: 筛选条件（列表任意一列包含该文本），空字符串表示不筛选
+            sort_column: 按 LIST_COLUMNS 中的列下标排序，None 表示按入库顺序
+            reverse: 降序
+            offset: 跳过的行数
+            limit: 最多返回的行数，None 表示不限
+
+        返回:
+            list: 快递行列表；排序键相同的行按入库顺序
+        """
+        sql, params = self._list_query(", ".join("e." + column for column in EXPRESS_COLUMNS), filter_text,
+                                       sort_column)
+        order = "DESC" if reverse else "ASC"
+        if sort_column is not None:
+            sql += f" ORDER BY {self.LIST_EXPRESSIONS[sort_column]} {order}, e.rowid"
+        else:
+            sql += " ORDER BY e.rowid"
+        sql += f" LIMIT {-1 if limit is None else int(limit)} OFFSET {int(offset)}"
+        return self._select(sql, params)
+
+    def shelf_counts(self):
+        """各位置（原文，按第一次出现的顺序）的在库快递数 [(位置, 数量), ...]，包括已经没有在库快递的位置"""
+        with self._lock:
+            return self.conn.execute("SELECT location, SUM(status = ?) FROM express "
+                                     "GROUP BY location ORDER BY MIN(rowid)", (STATUS_IN_STOCK,)).fetchall()
+
+    def daily_counts(self, since):
+        """
+        since（"YYYY-mm-dd"）及之后每天的入库数和取件数
+
+        返回:
+            tuple: ({日期: 入库数}, {日期: 取件数})
+        """
+        with self._lock:
+            intake = dict(self.conn.execute(
+                "SELECT substr(stored_at, 1, 10) AS day, COUNT(*) FROM express "
+                "WHERE stored_at >= ? GROUP BY day", (since,)).fetchall())
+            pickup = dict(self.conn.execute(
+                "SELECT substr(picked_at, 1, 10) AS day, COUNT(*) FROM express "
+                "WHERE status = ? AND picked_at >= ? GROUP BY day", (STATUS_PICKED_UP, since)).fetchall())
+        return intake, pickup
+
+    def dwell_totals(self):
+        """
+        滞留时间统计的原始数据
+
+        返回:
+            tuple: (有滞留时间的已取件快递数, 滞留时间合计（秒）, 最长滞留时间（秒）,
+                    有入库时间的在库快递数, 这些快递入库时间的平均值（"YYYY-mm-dd HH:MM:SS"，没有时为None）)
+        """
+        dwell = "MAX((julianday(picked_at) - julianday(stored_at)) * 86400, 0)"
+        with self._lock:
+            picked = self.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({dwell}), 0), COALESCE(MAX({dwell}), 0) FROM express "
+                "WHERE status = ? AND julianday(picked_at) IS NOT NULL AND julianday(stored_at) IS NOT NULL",
+                (STATUS_PICKED_UP,)).fetchone()
+            stored = self.conn.execute(
+                "SELECT COUNT(*), datetime(AVG(julianday(stored_at))) FROM express "
+                "WHERE status = ? AND julianday(stored_at) IS NOT NULL", (STATUS_IN_STOCK,)).fetchone()
+        return tuple(picked) + tuple(stored)
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def import_from_xlsx(db_file="express.db", user_file="user.xlsx", express_file="express.xlsx"):
+    """
+    把现有的 xlsx 数据一次性导入 SQLite
+
+    参数:
+        db_file: SQLite 数据库文件
+        user_file: 人物数据 xlsx
+        express_file: 快递数据 xlsx
+
+    返回:
+        tuple: (导入的人物数, 导入的快递数)
+    """
+    source = ExcelStorage(user_file, express_file)
+    people = source.load_people()
+    express = source.load_express()
+    target = SqliteStorage(db_file)
+    try:
+        with target.conn:
+            target.conn.executemany(
+                "INSERT OR REPLACE INTO people (id, name) VALUES (?, ?)", people)
+            target.conn.executemany(
+                f"INSERT OR REPLACE INTO express ({', '.join(EXPRESS_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(EXPRESS_COLUMNS))})",
+                [tuple(v.item() if hasattr(v, "item") else v for v in row) for row in express])
+            # 导入的数据不需要作为修改通知其他实例
+            target.conn.execute("DELETE FROM changes")
+    finally:
+        target.close()
+    return len(people), len(express)
+
+
+def open_storage(backend="excel", **kwargs):
+    """
+    按名称创建存储后端
+
+    参数:
+        backend: "excel" 或 "sqlite"
+        kwargs: 传给对应存储类的参数
+
+    返回:
+        BaseStorage: 存储对象
+    """
+    if backend == "excel":
+        return ExcelStorage(**kwargs)
+    if backend == "sqlite":
+        db_file = kwargs.get("db_file", "express.db")
+        # 首次使用时自动从现有 xlsx 导入
+        if not os.path.exists(db_file) and os.path.exists("express.xlsx"):
+            import_from_xlsx(db_file)
+        return SqliteStorage(**kwargs)
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+# 使用示例
+if __name__ == "__main__":
+    people_count, express_count = import_from_xlsx()
+    print(f"已导入 {people_count} 个人物、{express_count} 个快递到 express.db")
@@ -0,0 +1,111 @@
+"""已取件快递归档（archive.ExpressArchive、ExpressStation.archive_picked_up）的测试"""
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import UNDATED, ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from models import STATUS_PICKED_UP  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+LATER = 40 * 86400  # 比默认的归档天数更晚
+
+
+def archive_row(express_id, picked_at="2024-01-02 10:00:00"):
+    return (express_id, "123456", "P001", "P002", "A区1架", "", STATUS_PICKED_UP, picked_at, None)
+
+
+class ExpressArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_partitions_and_find(self):
+        archive = ExpressArchive(self.directory)
+        archive.append([archive_row("A1"), archive_row("A2", "2024-03-01 09:00:00"), archive_row("A3", None)])
+        self.assertEqual(archive.partitions(), ["2024-03", "2024-01", UNDATED])
+        self.assertEqual([row[0] for row in archive.find(express_id="A3")], ["A3"])
+        self.assertEqual([row[0] for row in archive.find(person_id="P002", limit=2)], ["A2", "A1"])
+        self.assertTrue(archive.contains("A1"))
+        self.assertFalse(archive.contains("E001"))
+
+    def test_sees_appends_from_other_instance(self):
+        reader = ExpressArchive(self.directory)
+        writer = ExpressArchive(self.directory)
+        writer.append([archive_row("A1")])
+        self.assertTrue(reader.contains("A1"))
+        self.assertEqual(len(reader.find(person_id="P001")), 1)
+        writer.append([archive_row("A2")])
+        self.assertTrue(reader.contains("A2"))
+        self.assertEqual(len(reader.find(person_id="P001")), 2)
+
+    def test_truncated_member_ignored(self):
+        archive = ExpressArchive(self.directory)
+        archive.append([archive_row("A1")])
+        with open(archive.path("2024-01"), "ab") as f:
+            f.write(gzip.compress(b'{"express_id": "A2"}\n')[:10])  # 追加时崩溃
+        self.assertEqual([row[0] for row in ExpressArchive(self.directory).find(person_id="P001")], ["A1"])
+
+
+class ArchivePickedUpTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        storage = ExcelStorage(self.path("user.xlsx"), self.path("express.xlsx"), self.path("express.journal"))
+        self.station = ExpressStation(storage, archive=ExpressArchive(self.path("archive")),
+                                      archive_after_days=None)
+
+    def tearDown(self):
+        self.station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def pick_up(self, express_id):
+        express, error = self.station.pick_up(self.station.express_dict[express_id].pick_code)
+        self.assertIsNone(error)
+        return express
+
+    def test_archives_only_expired(self):
+        self.pick_up("E001")
+        self.pick_up("E002")
+        self.assertEqual(self.station.archive_picked_up(now=time.time()), 0)
+        self.assertEqual(self.station.archive_picked_up(now=time.time() + LATER), 2)
+        self.assertNotIn("E001", self.station.express_dict)
+        self.station.persistence.flush()
+        self.assertNotIn("E001", dict((row[0], row) for row in self.station.storage.load_express()))
+        results = self.station.query("E001", include_archive=True)
+        self.assertEqual([(express.express_id, express.status) for express in results],
+                         [("E001", STATUS_PICKED_UP)])
+
+    def test_undated_rows_kept_unless_requested(self):
+        self.pick_up("E001").picked_at = None  # 加入取件时间之前的已取件快递
+        self.assertEqual(self.station.archive_picked_up(now=time.time() + LATER), 0)
+        self.assertIn("E001", self.station.express_dict)
+        self.assertEqual(self.station.archive_picked_up(now=time.time() + LATER, include_undated=True), 1)
+        self.assertEqual(self.station.archive.partitions(), [UNDATED])
+
+    def test_check_in_rejects_archived_id(self):
+        self.pick_up("E001")
+        self.station.archive_picked_up(now=time.time() + LATER)
+        error = self.station.check_in("E001", "", "P001", "张三", "P002", "李四", "A区1架", "")
+        self.assertIn("已归档", error)
+        results = self.station.check_in_batch([("E001", "", "P001", "张三", "P002", "李四", "A区1架", "")])
+        self.assertIsNone(results[0][0])
+        self.assertIn("已归档", results[0][1])
+        self.assertNotIn("E001", self.station.express_dict)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""性能基准测试脚本（benchmark）的测试：用很小的数据规模检查结果格式"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import benchmark  # noqa: E402
+from models import STATUS_PICKED_UP  # noqa: E402
+from storage import EXPRESS_COLUMNS, USER_COLUMNS  # noqa: E402
+
+STORE_OPERATIONS = ["load", "load_warm", "add_express", "pick_up_express", "query_express",
+                    "search_as_you_type", "list_refresh", "station_stats", "suggest_location"]
+
+
+class SyntheticRowsTest(unittest.TestCase):
+    def test_shape_and_seed(self):
+        people, express = benchmark.synthetic_rows(100, seed=1)
+        self.assertEqual(len(people), 20)
+        self.assertEqual(len(express), 100)
+        self.assertTrue(all(len(row) == len(USER_COLUMNS) for row in people))
+        self.assertTrue(all(len(row) == len(EXPRESS_COLUMNS) for row in express))
+        self.assertEqual(len({row[1] for row in express}), 100)  # 取件码不重复
+        picked = [row for row in express if row[6] == STATUS_PICKED_UP]
+        self.assertEqual(len(picked), 10)
+        self.assertTrue(all(row[7] and row[8] <= row[7] for row in picked))
+
+        self.assertEqual(benchmark.synthetic_rows(100, seed=1)[1], express)
+        self.assertNotEqual(benchmark.synthetic_rows(100, seed=2)[1], express)
+
+
+class SummarizeTest(unittest.TestCase):
+    def test_percentiles(self):
+        result = benchmark.summarize("op", 10, [i / 1000 for i in range(100, 0, -1)], 2.0,
+                                     peak_bytes=2 ** 21, flush_s=0.5)
+        self.assertEqual(result["count"], 100)
+        self.assertEqual(result["throughput_per_s"], 50.0)
+        self.assertEqual((result["p50_ms"], result["p95_ms"], result["p99_ms"]), (51.0, 96.0, 100.0))
+        self.assertEqual(result["peak_mem_mb"], 2.0)
+        self.assertEqual(result["flush_s"], 0.5)
+
+    def test_empty(self):
+        result = benchmark.summarize("op", 10, [], 0)
+        self.assertEqual(result["count"], 0)
+        self.assertIsNone(result["p50_ms"])
+        self.assertIsNone(result["throughput_per_s"])
+        self.assertIsNone(result["peak_mem_mb"])
+
+
+class BenchStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def check_store(self, backend):
+        results = benchmark.bench_store(50, backend, ops=5, trace_memory=True)
+        self.assertEqual([r["operation"] for r in results], STORE_OPERATIONS)
+        self.assertTrue(all(r["size"] == 50 and r["peak_mem_mb"] is not None for r in results))
+        # 第一次加载会归档超过30天的已取件快递
+        self.assertLessEqual(results[1]["hot_express"], results[0]["hot_express"])
+        self.assertEqual(results[2]["count"], 5)
+
+    def test_sqlite(self):
+        self.check_store("sqlite")
+
+    def test_excel(self):
+        self.check_store("excel")
+
+    def test_main_writes_report(self):
+        output = os.path.join(self.directory, "bench.json")
+        with contextlib.redirect_stderr(io.StringIO()):
+            report = benchmark.main(["--sizes", "30", "--ops", "3", "--startup", "0", "--qr", "0",
+                                     "--output", output])
+        with open(output, encoding="utf-8") as f:
+            self.assertEqual(json.load(f), report)
+        self.assertEqual(report["meta"]["backend"], "sqlite")
+        self.assertEqual([r["operation"] for r in report["results"]], STORE_OPERATIONS)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+"""快递二级索引（express_index.ExpressIndex）和按人物查询（ExpressStation.query）的测试"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from express_index import ExpressIndex  # noqa: E402
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP, Express, Person  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+ALICE, BOB, CAROL = Person("P1", "甲"), Person("P2", "乙"), Person("P3", "丙")
+
+
+class ExpressIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = ExpressIndex()
+        self.parcels = [Express("E1", "000001", ALICE, BOB, "A区", "", STATUS_IN_STOCK),
+                        Express("E2", "000002", BOB, ALICE, "A区", "", STATUS_IN_STOCK),
+                        Express("E3", "000003", ALICE, ALICE, "A区", "", STATUS_IN_STOCK),
+                        Express("E4", "000004", CAROL, BOB, "A区", "", STATUS_PICKED_UP)]
+        for express in self.parcels:
+            self.index.add(express)
+
+    def test_query_sender_and_receiver_once(self):
+        self.assertEqual(self.index.query("P1"), ["E1", "E3", "E2"])
+        self.assertEqual(self.index.query("P2"), ["E2", "E1", "E4"])
+        self.assertEqual(self.index.query("P9"), [])
+        self.assertEqual(self.index.query("E1"), [])  # 快递ID由调用方直接查字典
+
+    def test_in_stock_for_receiver(self):
+        self.assertEqual(self.index.in_stock_for_receiver("P2"), ["E1"])
+        self.index.update_status("E1", STATUS_IN_STOCK, STATUS_PICKED_UP)
+        self.assertEqual(self.index.in_stock_for_receiver("P2"), [])
+        self.assertEqual(list(self.index.by_status[STATUS_PICKED_UP]), ["E4", "E1"])
+
+    def test_remove(self):
+        self.index.remove(self.parcels[2])
+        self.assertEqual(self.index.query("P1"), ["E1", "E2"])
+        self.assertNotIn("E3", self.index.by_status[STATUS_IN_STOCK])
+
+
+class StationQueryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        self.station = ExpressStation(ExcelStorage(self.path("user.xlsx"), self.path("express.xlsx"),
+                                                   self.path("express.journal")),
+                                      archive=ExpressArchive(self.path("archive")), archive_after_days=None)
+
+    def tearDown(self):
+        self.station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_query_matches_full_scan(self):
+        rng = random.Random(0)
+        people = ["P001", "P002", "P003", "P010", "P011"]
+        for i in range(60):
+            sender, receiver = rng.choice(people), rng.choice(people)
+            self.assertIsNone(self.station.check_in(f"Q{i}", "", sender, sender, receiver, receiver, "A区", ""))
+            if rng.random() < 0.4:
+                self.station.pick_up(self.station.express_dict[f"Q{rng.randrange(i + 1)}"].pick_code)
+        everything = list(self.station.express_dict.values())
+        for person_id in people:
+            expected = {e.express_id for e in everything if person_id in (e.sender.id, e.receiver.id)}
+            self.assertEqual({e.express_id for e in self.station.query(person_id)}, expected)
+            expected = {e.express_id for e in everything
+                        if e.receiver.id == person_id and e.status == STATUS_IN_STOCK}
+            self.assertEqual({e.express_id for e in self.station.query(person_id, in_stock_only=True)}, expected)
+        self.assertEqual([e.express_id for e in self.station.query("Q7")], ["Q7"])
+
+
+if __name__ == "__main__":
+    unittest.main()
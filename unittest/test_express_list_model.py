@@ -0,0 +1,92 @@
+"""快递列表模型（express_list_model.ExpressListModel）的测试"""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from express_list_model import ExpressListModel  # noqa: E402
+from models import STATUS_IN_STOCK, Express, Person  # noqa: E402
+
+LOCATIONS = ("A区1架", "A区2架", "B区1架")
+
+
+class ExpressListModelTest(unittest.TestCase):
+    def setUp(self):
+        self.rng = random.Random(0)
+        self.people = [Person(f"P{i:03d}", name) for i, name in enumerate(("张三", "李四", "王五"))]
+        self.express_dict = {}
+        for i in range(50):
+            self.make_express(f"E{i:03d}")
+
+    def make_express(self, express_id):
+        express = Express(express_id, f"{self.rng.randrange(10 ** 6):06d}", self.rng.choice(self.people),
+                          self.rng.choice(self.people), self.rng.choice(LOCATIONS), "", STATUS_IN_STOCK)
+        self.express_dict[express_id] = express
+        return express
+
+    def test_add_matches_full_rebuild(self):
+        for column, reverse, text in ((None, False, ""), (4, False, ""), (4, True, ""),
+                                      (1, False, "A区"), (2, True, "李四"), (None, False, "B区")):
+            model = ExpressListModel(self.express_dict, page_size=7)
+            model.set_filter(text)
+            if column is not None:
+                model.toggle_sort(column)
+                if reverse:
+                    model.toggle_sort(column)
+            model.view()
+            for i in range(20):
+                express_id = f"N{column}{reverse}{text}{i}"
+                self.make_express(express_id)
+                index = model.add(express_id)
+                view = model.view()
+                if index is None:
+                    self.assertNotIn(express_id, view)
+                else:
+                    self.assertEqual(view[index], express_id)
+            expected = ExpressListModel(self.express_dict, page_size=7)
+            expected.ids = model.ids
+            expected.filter_text, expected.sort_column, expected.sort_reverse = text, column, reverse
+            self.assertEqual(model.view(), expected.view())
+
+    def test_apply_changes_matches_full_rebuild(self):
+        for column, text in ((None, ""), (4, ""), (None, "A区"), (4, "B区")):
+            model = ExpressListModel(self.express_dict, page_size=7)
+            model.set_filter(text)
+            if column is not None:
+                model.toggle_sort(column)
+            model.view()
+            changed = []
+            for express_id in self.rng.sample(model.ids, 10):
+                self.express_dict[express_id].location = self.rng.choice(LOCATIONS)
+                changed.append(express_id)
+            for express_id in self.rng.sample(model.ids, 3):
+                del self.express_dict[express_id]
+                changed.append(express_id)
+            for i in range(3):
+                changed.append(self.make_express(f"S{column}{text}{i}").express_id)
+            model.apply_changes(changed)
+            expected = ExpressListModel(self.express_dict, page_size=7)
+            expected.set_filter(text)
+            if column is not None:
+                expected.toggle_sort(column)
+            self.assertEqual(model.ids, expected.ids)
+            # 修改后重新插入的行在键相同的行中排在最后，只比较集合和排序键
+            self.assertEqual(set(model.view()), set(expected.view()))
+            if column is not None:
+                self.assertEqual([model._sort_key(i) for i in model.view()],
+                                 [expected._sort_key(i) for i in expected.view()])
+            else:
+                self.assertEqual(model.view(), expected.view())
+
+    def test_add_before_view(self):
+        model = ExpressListModel(self.express_dict)
+        self.make_express("NEW")
+        self.assertIsNone(model.add("NEW"))
+        self.assertEqual(model.view()[-1], "NEW")
+
+
+if __name__ == "__main__":
+    unittest.main()
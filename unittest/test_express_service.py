@@ -0,0 +1,175 @@
+"""取件服务（express_service）的测试：并发取件、请求解析和写入失败"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation, SqlExpressStation  # noqa: E402
+from express_service import ExpressService, ServiceClient  # noqa: E402
+from models import STATUS_IN_STOCK  # noqa: E402
+from storage import SqliteStorage  # noqa: E402
+
+CLIENTS = 20
+PARCEL = {"express_id": "S1", "pick_code": "", "sender": "P001", "sender_name": "张三",
+          "receiver": "P002", "receiver_name": "李四", "location": "A区1架", "notes": ""}
+
+
+class ExpressServiceTest(unittest.TestCase):
+    station_class = ExpressStation
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stations = []
+
+    def tearDown(self):
+        for station in self.stations:
+            station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def open_station(self):
+        station = self.station_class(SqliteStorage(os.path.join(self.directory, "express.db")),
+                                     archive=ExpressArchive(os.path.join(self.directory, "archive")),
+                                     archive_after_days=None)
+        self.stations.append(station)
+        return station
+
+    async def start(self, station):
+        service = ExpressService(station)
+        server = await service.start("127.0.0.1", 0)
+        return service, server, server.sockets[0].getsockname()[1]
+
+    @staticmethod
+    async def stop(service, server):
+        server.close()
+        await server.wait_closed()
+        service._refresh_task.cancel()
+
+    @staticmethod
+    async def pick_up_all(ports, pick_code):
+        """每个端口 CLIENTS 个客户端同时取同一个取件码，返回状态码列表"""
+        clients = [ServiceClient("127.0.0.1", port) for port in ports for _ in range(CLIENTS)]
+        try:
+            results = await asyncio.gather(*(client.request("POST", "/pickup", {"pick_code": pick_code})
+                                             for client in clients))
+        finally:
+            for client in clients:
+                await client.close()
+        return sorted(status for status, _ in results)
+
+    def test_concurrent_pick_up_one_service(self):
+        async def run():
+            service, server, port = await self.start(self.open_station())
+            try:
+                client = ServiceClient("127.0.0.1", port)
+                status, data = await client.request("POST", "/express", PARCEL)
+                await client.close()
+                self.assertEqual(status, 201)
+                return await self.pick_up_all([port], data["pick_code"])
+            finally:
+                await self.stop(service, server)
+
+        statuses = asyncio.run(run())
+        self.assertEqual(statuses, [200] + [409] * (CLIENTS - 1))
+
+    def test_concurrent_pick_up_two_services(self):
+        """两个服务共用一个数据库：取件冲突由存储发现，另一台同样返回 409"""
+        async def run():
+            first, second = self.open_station(), self.open_station()
+            service1, server1, port1 = await self.start(first)
+            service2, server2, port2 = await self.start(second)
+            try:
+                client = ServiceClient("127.0.0.1", port1)
+                status, data = await client.request("POST", "/express", PARCEL)
+                await client.close()
+                self.assertEqual(status, 201)
+                second.sync(5)
+                self.assertIsNotNone(second.get_express("S1"))
+                return await self.pick_up_all([port1, port2], data["pick_code"])
+            finally:
+                await self.stop(service1, server1)
+                await self.stop(service2, server2)
+
+        statuses = asyncio.run(run())
+        self.assertEqual(statuses, [200] + [409] * (2 * CLIENTS - 1))
+
+    def test_null_fields(self):
+        async def run():
+            service, server, port = await self.start(self.open_station())
+            client = ServiceClient("127.0.0.1", port)
+            try:
+                status, data = await client.request("POST", "/express", dict(PARCEL, pick_code=None, notes=None))
+                self.assertEqual(status, 201)
+                self.assertEqual(data["notes"], "")
+                self.assertRegex(data["pick_code"], r"^[0-9]{6}$")
+                status, _ = await client.request("POST", "/pickup", {"pick_code": None})
+                self.assertEqual(status, 400)
+            finally:
+                await client.close()
+                await self.stop(service, server)
+
+        asyncio.run(run())
+
+    def test_malformed_requests(self):
+        async def send(port, raw):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                writer.write(raw)
+                await writer.drain()
+                return int((await reader.readline()).split()[1])
+            finally:
+                writer.close()
+
+        async def run():
+            service, server, port = await self.start(self.open_station())
+            try:
+                return [await send(port, raw) for raw in (
+                    b"GARBAGE\r\n\r\n",
+                    b"GET /stats HTTP/1.1\r\nno colon\r\n\r\n",
+                    b"POST /pickup HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+                    b"POST /pickup HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n",
+                )]
+            finally:
+                await self.stop(service, server)
+
+        self.assertEqual(asyncio.run(run()), [400, 400, 400, 413])
+
+    def test_failed_write_rolled_back(self):
+        station = self.open_station()
+
+        async def run():
+            service, server, port = await self.start(station)
+            client = ServiceClient("127.0.0.1", port)
+            try:
+                status, data = await client.request("POST", "/express", PARCEL)
+                self.assertEqual(status, 201)
+                with mock.patch.object(station.storage, "apply_batch", side_effect=OSError("磁盘已满")):
+                    status, _ = await client.request("POST", "/pickup", {"pick_code": data["pick_code"]})
+                    self.assertEqual(status, 500)
+                    self.assertEqual(station.get_express("S1").status, STATUS_IN_STOCK)
+                    status, _ = await client.request("POST", "/express", dict(PARCEL, express_id="S2"))
+                    self.assertEqual(status, 500)
+                    self.assertIsNone(station.get_express("S2"))
+                self.assertEqual(station.persistence.failed, [])
+                status, _ = await client.request("POST", "/pickup", {"pick_code": data["pick_code"]})
+                self.assertEqual(status, 200)
+            finally:
+                await client.close()
+                await self.stop(service, server)
+
+        asyncio.run(run())
+
+
+class SqlStationServiceTest(ExpressServiceTest):
+    """同样的测试，服务使用不把快递读入内存的 SqlExpressStation"""
+    station_class = SqlExpressStation
+
+
+if __name__ == "__main__":
+    unittest.main()
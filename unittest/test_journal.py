@@ -0,0 +1,122 @@
+"""操作日志（journal.OperationJournal）重放和 ExcelStorage 快照压缩的测试"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from journal import OperationJournal  # noqa: E402
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+
+class OperationJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "express.journal")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_replay_in_order(self):
+        journal = OperationJournal(self.path)
+        journal.append("person", id="P1", name="张三")
+        journal.append_many([{"op": "status", "express_id": "E1", "status": STATUS_PICKED_UP},
+                             {"op": "delete", "express_id": "E2"}])
+        records = OperationJournal(self.path).replay()
+        self.assertEqual([record["op"] for record in records], ["person", "status", "delete"])
+        self.assertEqual(records[0]["name"], "张三")
+
+    def test_partial_line_ignored(self):
+        journal = OperationJournal(self.path)
+        journal.append("person", id="P1", name="张三")
+        with open(self.path, "ab") as f:
+            f.write(b'{"op": "person", "id": "P2", "na')  # 崩溃时写了一半
+        journal = OperationJournal(self.path)
+        self.assertEqual(len(journal.replay()), 1)
+        journal.append("person", id="P3", name="王五")
+        self.assertEqual([record["id"] for record in OperationJournal(self.path).replay()], ["P1", "P3"])
+
+    def test_reset_starts_new_generation(self):
+        writer = OperationJournal(self.path)
+        writer.replay()
+        reader = OperationJournal(self.path)
+        reader.replay()
+        writer.append("person", id="P1", name="张三")
+        writer.reset()
+        writer.append("person", id="P2", name="李四")
+        self.assertEqual([record["id"] for record in OperationJournal(self.path).replay()], ["P2"])
+        # 落后一代的实例先读完 .prev 中剩余的记录
+        self.assertTrue(reader.changed())
+        self.assertEqual([record["id"] for record in reader.read_new()], ["P1", "P2"])
+        self.assertEqual(reader.generation, writer.generation)
+        # 落后两代只能重新读取快照
+        writer.reset()
+        writer.reset()
+        self.assertIsNone(reader.read_new())
+
+
+class ExcelCompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def open_storage(self, **kwargs):
+        path = lambda name: os.path.join(self.directory, name)  # noqa: E731
+        return ExcelStorage(path("user.xlsx"), path("express.xlsx"), path("express.journal"), **kwargs)
+
+    def test_replay_and_compact(self):
+        storage = self.open_storage()
+        before = set(storage.load_express())
+        storage.upsert_person("PX", "测试")
+        storage.insert_express("X1", "000123", "PX", "PX", "A区1架", "", STATUS_IN_STOCK)
+        storage.update_status("X1", STATUS_PICKED_UP, "2024-05-01 10:00:00")
+        self.assertEqual(storage.journal.count, 3)
+        # 未压缩：重新打开时按日志重放
+        reopened = self.open_storage()
+        rows = {row[0]: row for row in reopened.load_express()}
+        self.assertEqual(rows["X1"][6], STATUS_PICKED_UP)
+        self.assertEqual(rows["X1"][1], "000123")
+        self.assertIn(("PX", "测试"), reopened.load_people())
+        # 压缩后日志清空，快照包含全部数据
+        storage.compact()
+        self.assertEqual(storage.journal.count, 0)
+        self.assertEqual(OperationJournal(storage.journal.path).replay(), [])
+        compacted = self.open_storage()
+        self.assertEqual(set(compacted.load_express()), before | {rows["X1"]})
+        self.assertIn(("PX", "测试"), compacted.load_people())
+
+    def insert_many(self, storage, count):
+        for i in range(count):
+            storage.insert_express(f"X{i}", f"{i:06d}", "P001", "P002", "A区1架", "", STATUS_IN_STOCK)
+
+    def test_compact_by_journal_size(self):
+        storage = self.open_storage(compact_ratio=0, min_compact_bytes=1000)
+        storage.load_express()
+        self.insert_many(storage, 12)
+        # 每条记录约200字节，日志超过1000字节就压缩
+        self.assertGreaterEqual(storage.journal.generation, 2)
+        self.assertLess(storage.journal.offset, 1000)
+        storage.close()
+        rows = {row[0] for row in self.open_storage().load_express()}
+        self.assertTrue({f"X{i}" for i in range(12)} <= rows)
+
+    def test_threshold_relative_to_snapshot(self):
+        storage = self.open_storage(compact_ratio=1.0, min_compact_bytes=0)
+        storage.load_express()
+        self.insert_many(storage, 12)
+        # 日志小于快照，不压缩
+        self.assertLess(storage.journal.offset, storage.snapshot_size())
+        self.assertEqual(storage.journal.generation, 0)
+        self.assertEqual(storage.journal.count, 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+"""清单批量入库（manifest_import）的测试"""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import manifest_import  # noqa: E402
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+
+def parcel(express_id, pick_code="", sender="P001", location="B区1架"):
+    return (express_id, pick_code, sender, "张三", "P002", "李四", location, "")
+
+
+class ManifestImportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        storage = ExcelStorage(self.path("user.xlsx"), self.path("express.xlsx"), self.path("express.journal"))
+        self.station = ExpressStation(storage, archive=ExpressArchive(self.path("archive")),
+                                      archive_after_days=None)
+
+    def tearDown(self):
+        self.station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write_manifest(self, rows):
+        path = self.path("manifest.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(manifest_import.MANIFEST_COLUMNS)
+            writer.writerows(rows)
+        return path
+
+    def test_report_lists_rejected_rows(self):
+        path = self.write_manifest([
+            parcel("M1"),
+            parcel("M2", "111111"),
+            parcel("M3", "123456"),  # 与 E001 的取件码重复
+            parcel("M2", "222222"),
+            parcel("M4", "111111"),
+            parcel("M5", "12a456"),
+            parcel("E001"),
+            parcel("M6", sender=""),
+        ])
+        imported, report = manifest_import.import_manifest(self.station, path)
+        self.assertEqual(imported, 2)
+        self.assertEqual(report, [(4, "M3", "取件码已存在"), (5, "M2", "快递ID在清单中重复"),
+                                  (6, "M4", "取件码在清单中重复"), (7, "M5", "取件码必须是6位数字"),
+                                  (8, "E001", "快递ID已存在"), (9, "M6", "缺少sender")])
+        self.assertEqual(self.station.express_dict["M2"].pick_code, "111111")
+
+    def test_rejected_row_does_not_claim_id_or_code(self):
+        path = self.write_manifest([
+            parcel("M1", "333333", sender=""),
+            parcel("M1", "333333"),
+        ])
+        imported, report = manifest_import.import_manifest(self.station, path, chunk_size=1)
+        self.assertEqual(imported, 1)
+        self.assertEqual(report, [(2, "M1", "缺少sender")])
+        self.assertEqual(self.station.express_dict["M1"].pick_code, "333333")
+
+    def test_duplicates_across_chunks(self):
+        path = self.write_manifest([parcel("M1", "12345"), parcel("M2"), parcel("M1"), parcel("M3", "012345.0")])
+        imported, report = manifest_import.import_manifest(self.station, path, chunk_size=2)
+        self.assertEqual(imported, 2)
+        self.assertEqual(report, [(4, "M1", "快递ID在清单中重复"), (5, "M3", "取件码在清单中重复")])
+        self.assertEqual(self.station.express_dict["M1"].pick_code, "012345")
+
+    def test_all_or_nothing(self):
+        path = self.write_manifest([parcel("M1"), parcel("E001")])
+        imported, report = manifest_import.import_manifest(self.station, path, all_or_nothing=True)
+        self.assertEqual((imported, len(report)), (0, 1))
+        self.assertNotIn("M1", self.station.express_dict)
+
+    def test_existing_data_checked_when_importing(self):
+        # 读取后、入库前柜台入库了同一个快递ID（界面在后台线程读取清单）
+        chunks = manifest_import.load_manifest(self.write_manifest([parcel("M1"), parcel("M2")]))
+        self.assertIsNone(self.station.check_in(*parcel("M1")))
+        imported, report = manifest_import.import_loaded(self.station, chunks)
+        self.assertEqual(imported, 1)
+        self.assertEqual(report, [(2, "M1", "快递ID已存在")])
+
+    def test_xls_rejected(self):
+        with self.assertRaises(ValueError):
+            manifest_import.import_manifest(self.station, self.path("manifest.xls"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""运行指标（metrics）的测试：计时、导出和采样"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics  # noqa: E402
+
+
+class HistogramTest(unittest.TestCase):
+    def test_rolling_quantiles(self):
+        histogram = metrics.Histogram(window=100)
+        for value in range(1, 201):
+            histogram.observe(value)
+        # 分位数只看最近 100 个样本（101 ~ 200），次数和总和从头累计
+        self.assertEqual(histogram.snapshot(), {"count": 200, "sum": 20100.0,
+                                                "p50": 151, "p95": 196, "p99": 200})
+
+    def test_empty(self):
+        snapshot = metrics.Histogram().snapshot()
+        self.assertEqual(snapshot["count"], 0)
+        self.assertIsNone(snapshot["p50"])
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+        metrics.enable()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        metrics.enable(False)
+        metrics.reset()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_disabled_records_nothing(self):
+        metrics.enable(False)
+        metrics.incr("ops")
+        metrics.set_gauge("pending", 3)
+        with metrics.timer("op"):
+            pass
+        self.assertEqual(metrics.snapshot(), {"counters": {}, "gauges": {}, "histograms": {}})
+
+    def test_counters_gauges_and_timers(self):
+        @metrics.timed("work")
+        def work(fail=False):
+            if fail:
+                raise ValueError("失败")
+            return 1
+
+        metrics.incr("ops")
+        metrics.incr("ops", 2)
+        metrics.set_gauge("pending", 5)
+        self.assertEqual(work(), 1)
+        with self.assertRaises(ValueError):
+            work(fail=True)
+        with metrics.timer("block"):
+            pass
+
+        data = metrics.snapshot()
+        self.assertEqual(data["counters"], {"ops": 3, "work_errors": 1})
+        self.assertEqual(data["gauges"], {"pending": 5})
+        self.assertEqual(data["histograms"]["work"]["count"], 2)
+        self.assertEqual(data["histograms"]["block"]["count"], 1)
+
+    def test_profile_next_only_once(self):
+        path = os.path.join(self.directory, "work.prof")
+        metrics.profile_next("work", path)
+        with metrics.timer("work"):
+            sorted(range(1000))
+        self.assertTrue(os.path.exists(path))
+        self.assertIn("function calls", metrics.profiles["work"])
+
+        metrics.profiles.clear()
+        with metrics.timer("work"):
+            pass
+        self.assertEqual(metrics.profiles, {})
+
+    def test_prometheus_text(self):
+        metrics.incr("ops", 2)
+        metrics.set_gauge("pending", 1)
+        metrics.observe("pick_up", 0.5)
+        lines = metrics.prometheus_text().splitlines()
+        self.assertIn("# TYPE express_ops_total counter", lines)
+        self.assertIn("express_ops_total 2", lines)
+        self.assertIn("express_pending 1", lines)
+        self.assertIn('express_pick_up_seconds{quantile="0.5"} 0.5', lines)
+        self.assertIn("express_pick_up_seconds_count 1", lines)
+
+    def test_export_json(self):
+        metrics.incr("ops")
+        path = os.path.join(self.directory, "metrics.json")
+        metrics.export_json(path)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual(data["counters"], {"ops": 1})
+        self.assertIn("timestamp", data)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_http_server(self):
+        metrics.incr("ops")
+        server = metrics.start_http_server(port=0)
+        try:
+            base = f"http://127.0.0.1:{server.server_address[1]}"
+            with urllib.request.urlopen(base + "/metrics") as response:
+                self.assertIn("express_ops_total 1", response.read().decode("utf-8"))
+            with urllib.request.urlopen(base + "/metrics.json") as response:
+                self.assertEqual(json.loads(response.read())["counters"], {"ops": 1})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_configure_from_env(self):
+        metrics.enable(False)
+        metrics.configure_from_env({})
+        self.assertFalse(metrics.ENABLED)
+        metrics.configure_from_env({"EXPRESS_METRICS": "0"})
+        self.assertFalse(metrics.ENABLED)
+        metrics.configure_from_env({"EXPRESS_METRICS": "1"})
+        self.assertTrue(metrics.ENABLED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+"""数据模型（models.Person / models.Express）的测试：__slots__ 和字符串驻留"""
+import math
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP, Express, Person, intern_value  # noqa: E402
+
+
+def _fresh(text):
+    """构造一个与字面量相等但不是同一对象的字符串"""
+    return "".join(list(text))
+
+
+class InternValueTest(unittest.TestCase):
+    def test_strings_share_one_object(self):
+        a, b = _fresh("A区1架"), _fresh("A区1架")
+        self.assertIsNot(a, b)
+        self.assertIs(intern_value(a), intern_value(b))
+
+    def test_non_strings_unchanged(self):
+        nan = float("nan")
+        self.assertIs(intern_value(nan), nan)
+        self.assertIsNone(intern_value(None))
+
+
+class ModelTest(unittest.TestCase):
+    def setUp(self):
+        self.sender, self.receiver = Person("P1", "甲"), Person("P2", "乙")
+
+    def _express(self, express_id, location, notes, status):
+        return Express(express_id, "000001", self.sender, self.receiver, location, notes, status)
+
+    def test_no_instance_dict(self):
+        express = self._express("E1", "A区", "", STATUS_IN_STOCK)
+        for obj in (self.sender, express):
+            self.assertFalse(hasattr(obj, "__dict__"))
+            with self.assertRaises(AttributeError):
+                obj.unknown = 1
+
+    def test_repeated_fields_interned(self):
+        first = self._express("E1", _fresh("A区1架"), _fresh("易碎"), _fresh(STATUS_IN_STOCK))
+        second = self._express("E2", _fresh("A区1架"), _fresh("易碎"), _fresh(STATUS_IN_STOCK))
+        self.assertIs(first.location, second.location)
+        self.assertIs(first.notes, second.notes)
+        self.assertIs(first.status, second.status)
+
+        second.status = _fresh(STATUS_PICKED_UP)  # 取件后修改状态同样驻留
+        self.assertIs(second.status, intern_value(_fresh(STATUS_PICKED_UP)))
+
+    def test_fields_and_str_unchanged(self):
+        express = self._express("E1", "A区", float("nan"), STATUS_IN_STOCK)
+        self.assertTrue(math.isnan(express.notes))
+        self.assertIsNone(express.picked_at)
+        self.assertIsNone(express.stored_at)
+        self.assertEqual(str(self.sender), "甲(ID:P1)")
+        self.assertEqual(str(express), "快递ID: E1, 取件码: 000001, 发件人: 甲(ID:P1), 收件人: 乙(ID:P2), "
+                                       "位置: A区, 备注: nan, 状态: 在库")
+
+
+if __name__ == "__main__":
+    unittest.main()
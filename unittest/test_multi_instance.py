@@ -0,0 +1,136 @@
+"""多个程序实例（柜台）共用同一份数据的测试，Excel 和 SQLite 两种存储各跑一遍"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from models import STATUS_PICKED_UP  # noqa: E402
+from storage import ExcelStorage, SqliteStorage  # noqa: E402
+
+SYNC_TIMEOUT = 5
+
+
+class MultiInstanceMixin:
+    """两个 ExpressStation 各自打开同一份数据；子类提供 open_storage"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        self.stations = []
+        self.a = self.open_station()
+        self.b = self.open_station()
+
+    def tearDown(self):
+        for station in self.stations:
+            station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open_station(self):
+        station = ExpressStation(self.open_storage(), archive=ExpressArchive(self.path("archive")),
+                                 archive_after_days=None)
+        self.stations.append(station)
+        return station
+
+    def check_in(self, station, express_id, pick_code=""):
+        error = station.check_in(express_id, pick_code, "P001", "张三", "P002", "李四", "A区1架", "")
+        self.assertIsNone(error)
+        station.persistence.flush()
+        return station.express_dict[express_id].pick_code
+
+    def sync(self, station):
+        station.sync(SYNC_TIMEOUT)
+        return station.take_changes()
+
+    def test_check_in_seen_by_other_instance(self):
+        code = self.check_in(self.a, "X1")
+        self.assertEqual(self.sync(self.b), ["X1"])
+        self.assertEqual(self.b.pick_code_dict[code], "X1")
+        self.assertEqual(self.sync(self.b), [])  # 已经取走
+
+    def test_pick_up_syncs_unknown_code(self):
+        code = self.check_in(self.a, "X1")
+        express, error = self.b.pick_up(code, sync_wait=SYNC_TIMEOUT)
+        self.assertIsNone(error)
+        self.assertEqual(express.express_id, "X1")
+        self.b.persistence.flush()
+        # 取件时同步到的修改仍留给界面取走
+        self.assertIn("X1", self.b.take_changes())
+        self.assertIn("X1", self.sync(self.a))
+        self.assertEqual(self.a.express_dict["X1"].status, STATUS_PICKED_UP)
+
+    def test_concurrent_pick_up_conflict(self):
+        code = self.check_in(self.a, "X1")
+        self.sync(self.b)
+        self.assertIsNone(self.a.pick_up(code)[1])
+        self.a.persistence.flush()
+        errors = []
+        self.assertIsNone(self.b.pick_up(code, on_commit=errors.append)[1])
+        self.b.persistence.flush()
+        self.assertEqual(self.b.persistence.conflict_count, 1)
+        self.assertIsNotNone(errors[0])
+        self.sync(self.b)
+        self.assertEqual(self.b.express_dict["X1"].picked_at, self.a.express_dict["X1"].picked_at)
+        self.assertEqual(self.a.stats.in_stock, self.b.stats.in_stock)
+
+    def test_duplicate_check_in_conflict(self):
+        self.check_in(self.a, "DUP", "111111")
+        self.check_in(self.b, "DUP", "222222")
+        self.assertEqual(self.b.persistence.conflict_count, 1)
+        self.sync(self.b)
+        self.assertEqual(self.b.express_dict["DUP"].pick_code, "111111")
+        self.assertNotIn("222222", self.b.pick_code_dict)
+
+    def test_archive_removes_from_other_instance(self):
+        express_id = "X1"
+        code = self.check_in(self.a, express_id)
+        self.sync(self.b)
+        self.assertIsNone(self.a.pick_up(code)[1])
+        self.assertEqual(self.a.archive_picked_up(1, now=time.time() + 2 * 86400), 1)
+        self.a.persistence.flush()
+        changed = self.sync(self.b)
+        self.assertTrue(changed is None or express_id in changed)
+        self.assertNotIn(express_id, self.b.express_dict)
+
+    def test_bulk_writes_from_both(self):
+        for i in range(60):
+            self.a.check_in(f"A{i}", "", "P001", "张三", "P002", "李四", "B区2架", "")
+            self.b.check_in(f"B{i}", "", "P003", "王五", "P002", "李四", "C区3架", "")
+        self.a.persistence.flush()
+        self.b.persistence.flush()
+        self.sync(self.a)
+        self.sync(self.b)
+        self.assertEqual(set(self.a.express_dict), set(self.b.express_dict))
+        self.assertEqual(self.a.stats.in_stock, self.b.stats.in_stock)
+        for station in self.stations:
+            station.close()
+        self.stations = []
+        reopened = self.open_station()
+        self.assertIn("A59", reopened.express_dict)
+        self.assertIn("B59", reopened.express_dict)
+
+
+class ExcelMultiInstanceTest(MultiInstanceMixin, unittest.TestCase):
+    def open_storage(self):
+        # 压缩阈值取小值，让另一实例的日志在测试中被压缩回快照
+        return ExcelStorage(self.path("user.xlsx"), self.path("express.xlsx"),
+                            self.path("express.journal"), compact_ratio=0, min_compact_bytes=4000)
+
+
+class SqliteMultiInstanceTest(MultiInstanceMixin, unittest.TestCase):
+    def open_storage(self):
+        return SqliteStorage(self.path("express.db"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""后台持久化线程（persistence_worker.PersistenceWorker）的测试"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from persistence_worker import PersistenceWorker  # noqa: E402
+
+
+class MemoryStorage:
+    """只记录写操作的存储"""
+
+    def __init__(self):
+        self.operations = []
+
+    def apply_batch(self, operations):
+        self.operations.extend(operations)
+        return []
+
+    def close(self):
+        pass
+
+
+class PersistenceWorkerTest(unittest.TestCase):
+    def test_failing_callback_keeps_worker_running(self):
+        storage = MemoryStorage()
+        worker = PersistenceWorker(storage)
+        results = []
+
+        def failing(error):
+            raise RuntimeError("回调出错")
+
+        worker.submit("update_status", "E1", "已取件", on_commit=failing)
+        worker.submit("update_status", "E2", "已取件", on_commit=results.append)
+        worker.flush()
+        worker.submit("update_status", "E3", "已取件", on_commit=results.append)
+        worker.flush()
+        worker.close()
+        self.assertEqual(results, [None, None])
+        self.assertEqual([args[0] for _, args in storage.operations], ["E1", "E2", "E3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
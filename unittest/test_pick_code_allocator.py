@@ -0,0 +1,88 @@
+"""取件码分配器（pick_code_allocator.PickCodeAllocator）的测试"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from pick_code_allocator import PickCodeAllocator  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+
+class PickCodeAllocatorTest(unittest.TestCase):
+    def test_cooldown_order(self):
+        allocator = PickCodeAllocator(space=4, cooldown=2, rng=random.Random(0))
+        codes = [allocator.allocate() for _ in range(4)]
+        self.assertEqual(len(set(codes)), 4)
+        for code in codes[:3]:
+            allocator.release(code)
+        # 冷却队列超过2个时最早释放的回到可分配集合
+        self.assertEqual(allocator.allocate(), codes[0])
+        # 可分配集合用完后按释放顺序取冷却中的取件码
+        self.assertEqual(allocator.allocate(), codes[1])
+        self.assertEqual(len(allocator), 1)
+
+    def test_reserve_cooling_code(self):
+        allocator = PickCodeAllocator(space=3, cooldown=5, rng=random.Random(0))
+        codes = [allocator.allocate() for _ in range(3)]
+        allocator.release(codes[0])
+        allocator.release(codes[1])
+        self.assertTrue(allocator.is_free(codes[0]))
+        self.assertTrue(allocator.is_cooling(codes[0]))
+        self.assertTrue(allocator.reserve(codes[0]))
+        self.assertFalse(allocator.is_free(codes[0]))
+        self.assertFalse(allocator.reserve(codes[0]))
+        self.assertEqual(len(allocator), 1)
+        # 被占用的冷却项出队时跳过；只剩冷却中的取件码时不推荐给手动填写
+        self.assertRaises(RuntimeError, allocator.suggest)
+        self.assertEqual(allocator.allocate(), codes[1])
+        self.assertRaises(RuntimeError, allocator.allocate)
+        # 重复释放只进入一次冷却队列
+        allocator.release(codes[2])
+        allocator.release(codes[2])
+        self.assertEqual(len(allocator), 1)
+
+    def test_free_mask(self):
+        allocator = PickCodeAllocator(space=10, cooldown=5, rng=random.Random(0))
+        taken = allocator.allocate()
+        cooling = allocator.allocate()
+        allocator.release(cooling)
+        mask = allocator.free_mask([int(taken), int(cooling), 10, -1])
+        self.assertEqual(list(mask), [False, True, False, False])
+        mask = allocator.free_mask([int(taken), int(cooling)], allow_cooling=False)
+        self.assertEqual(list(mask), [False, False])
+
+
+class ManualPickCodeTest(unittest.TestCase):
+    """入库时手动填写的取件码"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        path = lambda name: os.path.join(self.directory, name)  # noqa: E731
+        self.station = ExpressStation(ExcelStorage(path("user.xlsx"), path("express.xlsx"), path("express.journal")),
+                                      archive=ExpressArchive(path("archive")), archive_after_days=None)
+
+    def tearDown(self):
+        self.station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_cooling_code_rejected(self):
+        parcel = ("P001", "张三", "P002", "李四", "A区1架", "")
+        self.assertIsNone(self.station.pick_up("123456")[1])
+        self.assertIn("刚被使用过", self.station.check_in("M1", "123456", *parcel))
+        self.assertIn("刚被使用过", self.station.check_in_batch([("M2", "123456") + parcel])[0][1])
+        self.assertEqual(self.station.check_in("M3", "654321", *parcel), "取件码 654321 已存在！")
+        self.assertIsNone(self.station.check_in("M4", "", *parcel))
+        self.assertNotEqual(self.station.express_dict["M4"].pick_code, "123456")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""紧凑二维码内容格式（qr_payload）的测试"""
+import os
+import random
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import qr_payload  # noqa: E402
+from qr_payload import EXPRESS_FIELDS, b45decode, b45encode, decode_express, encode_express  # noqa: E402
+
+try:
+    import pyzbar.pyzbar  # noqa: F401  qrcode_load 需要 zbar 动态库
+    HAS_ZBAR = True
+except ImportError:
+    HAS_ZBAR = False
+
+RECORD = {"express_id": "E00000144", "pick_code": "012345", "sender": "P001", "sender_name": "张三",
+          "receiver": "P002", "receiver_name": "李四", "location": "A区2架", "notes": "易碎，轻放"}
+
+
+class QrPayloadTest(unittest.TestCase):
+    def test_base45_round_trip(self):
+        rng = random.Random(0)
+        for size in range(40):
+            data = bytes(rng.randrange(256) for _ in range(size))
+            text = b45encode(data)
+            self.assertTrue(set(text) <= set(qr_payload.BASE45_CHARSET))
+            self.assertEqual(b45decode(text), data)
+        self.assertEqual(b45encode(b"AB"), "BB8")  # RFC 9285 示例
+
+    def test_round_trip_with_names(self):
+        text = encode_express(RECORD)
+        self.assertTrue(qr_payload.is_compact(text))
+        self.assertEqual(decode_express(text), RECORD)
+
+    def test_round_trip_without_names(self):
+        decoded = decode_express(encode_express(RECORD, include_names=False))
+        expected = dict(RECORD, sender_name="", receiver_name="")
+        self.assertEqual(decoded, expected)
+
+    def test_empty_and_numeric_fields(self):
+        record = dict.fromkeys(EXPRESS_FIELDS, "")
+        record.update(express_id="0007", sender="P1", receiver="A00")
+        decoded = decode_express(encode_express(record))
+        self.assertEqual(decoded, record)  # 编号的前导0保留，没有取件码时为空
+        # Excel 读出的整数取件码
+        self.assertEqual(decode_express(encode_express(dict(RECORD, pick_code=12345)))["pick_code"], "012345")
+
+    def test_smaller_than_csv(self):
+        import qrcode
+        from qrcode_create import QR_OPTIONS
+
+        def qr_version(text):
+            qr = qrcode.QRCode(**QR_OPTIONS)
+            qr.add_data(text)
+            qr.make(fit=True)
+            return qr.version
+
+        csv_text = ",".join(RECORD[field] for field in EXPRESS_FIELDS)
+        # 文本更长，但按字母数字模式编码，二维码版本（尺寸）更小
+        self.assertLess(qr_version(encode_express(RECORD)), qr_version(csv_text))
+
+    def test_invalid_content(self):
+        text = encode_express(RECORD)
+        data = bytearray(b45decode(text[len(qr_payload.PAYLOAD_PREFIX):]))
+        corrupted = bytearray(data)
+        corrupted[6] ^= 0x01
+        with self.assertRaises(ValueError):
+            qr_payload.unpack_express(bytes(corrupted))
+        with self.assertRaises(ValueError):
+            qr_payload.unpack_express(bytes(data[:-3]))
+        newer = bytearray(data[:-2])
+        newer[0] = qr_payload.PAYLOAD_VERSION + 1
+        newer += qr_payload._checksum(bytes(newer))
+        with self.assertRaises(ValueError):
+            qr_payload.unpack_express(bytes(newer))
+        with self.assertRaises(ValueError):
+            decode_express(qr_payload.PAYLOAD_PREFIX + "abc")
+        with self.assertRaises(ValueError):
+            encode_express(dict(RECORD, pick_code="1234567"))
+
+    @unittest.skipUnless(HAS_ZBAR, "需要 pyzbar 和 zbar 动态库")
+    def test_qr_text_formats(self):
+        import qrcode_create
+        import qrcode_load
+        self.assertEqual(qrcode_load.parse_qr_text(qrcode_create.express_to_qr_text(RECORD, "compact")), RECORD)
+        self.assertEqual(qrcode_create.express_to_qr_text(RECORD, "csv"),
+                         ",".join(RECORD[field] for field in qrcode_create.LABEL_FIELDS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""快递标签批量生成（qrcode_create）的测试"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import qrcode_create  # noqa: E402
+
+
+def label(express_id, notes=""):
+    return {"express_id": express_id, "pick_code": "123456", "sender": "P001", "sender_name": "张三",
+            "receiver": "P002", "receiver_name": "李四", "location": "A区1架", "notes": notes}
+
+
+class GenerateQrCodesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_bad_record_does_not_lose_batch(self):
+        records = [label("E1"), {"pick_code": "654321"}, label("E3", notes="长" * 3000), label("E4")]
+        out_dir = os.path.join(self.directory, "labels")
+        results = qrcode_create.generate_qr_codes_batch(records, out_dir, max_workers=2, payload="csv")
+        self.assertEqual([path for path, _ in results],
+                         [os.path.join(out_dir, "E1.png"), None, None, os.path.join(out_dir, "E4.png")])
+        self.assertEqual([error is None for _, error in results], [True, False, False, True])
+        self.assertIn("KeyError", results[1][1])
+        self.assertEqual(sorted(os.listdir(out_dir)), ["E1.png", "E4.png"])
+
+    def test_print_sheets(self):
+        records = [label(f"E{i}") for i in range(13)] + [label("BIG", notes="长" * 3000)]
+        sheet = os.path.join(self.directory, "sheet.png")
+        results = qrcode_create.generate_qr_codes_batch(records, sheet_path=sheet, columns=3, rows=4,
+                                                        max_workers=2)
+        first, second = (os.path.join(self.directory, f"sheet_{page}.png") for page in (1, 2))
+        self.assertEqual([path for path, _ in results], [first] * 12 + [second, None])
+        self.assertTrue(os.path.exists(first) and os.path.exists(second))
+
+    def test_single_code_uses_shared_options(self):
+        text = "E008,753951,P001,张三,P002,李四,A区2架,香蕉" * 3
+        path = os.path.join(self.directory, "qrcode.png")
+        img = qrcode_create.generate_qr_code(text, path)
+        self.assertEqual(img.size, qrcode_create.render_qr_image(text).size)
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+"""二维码读取（qrcode_load）的测试：批量解码、分阶段解码和结果缓存"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from qrcode_create import render_qr_image  # noqa: E402
+
+try:
+    import qrcode_load  # noqa: E402  需要 pyzbar 和 zbar 动态库
+except ImportError:
+    qrcode_load = None
+
+RECORD = {"express_id": "E1", "pick_code": "012345", "sender": "P001", "sender_name": "张三",
+          "receiver": "P002", "receiver_name": "李四", "location": "A区2架", "notes": "易碎"}
+
+
+@unittest.skipIf(qrcode_load is None, "需要 pyzbar 和 zbar 动态库")
+class QRTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        qrcode_load.reset_decode_stats()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write_label(self, name, record):
+        path = os.path.join(self.directory, name)
+        render_qr_image(json.dumps(record, ensure_ascii=False)).save(path)
+        return path
+
+
+class BatchDecodeTest(QRTestCase):
+    def test_folder_decoded_in_pool(self):
+        for i in range(3):
+            self.write_label(f"label{i}.png", dict(RECORD, express_id=f"E{i}"))
+        with open(os.path.join(self.directory, "broken.png"), "wb") as f:
+            f.write(b"not an image")
+        with open(os.path.join(self.directory, "notes.txt"), "w") as f:
+            f.write("ignored")
+        self.assertEqual([os.path.basename(path) for path in qrcode_load.list_qr_images(self.directory)],
+                         ["broken.png", "label0.png", "label1.png", "label2.png"])
+        results = {os.path.basename(path): (info, error)
+                   for path, info, error in qrcode_load.read_express_qr_codes(self.directory, max_workers=2)}
+        self.assertEqual(len(results), 4)
+        info, error = results["broken.png"]
+        self.assertIsNone(info)
+        self.assertIsNotNone(error)
+        for i in range(3):
+            self.assertEqual(results[f"label{i}.png"], (dict(RECORD, express_id=f"E{i}"), None))
+
+    def test_missing_file_reported(self):
+        path = os.path.join(self.directory, "missing.png")
+        self.assertEqual(list(qrcode_load.read_express_qr_codes([path])), [(path, None, "无法读取图片文件")])
+
+
+@unittest.skipIf(qrcode_load is None, "需要 pyzbar 和 zbar 动态库")
+class QRResultCacheTest(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = qrcode_load.QRResultCache(capacity=2)
+        a, b, c = (cache.key(data) for data in (b"a", b"b", b"c"))
+        self.assertNotEqual(a, b)
+        cache.put(a, "A")
+        cache.put(b, "B")
+        self.assertEqual(cache.get(a), "A")  # a 变为最近使用，放入 c 时淘汰 b
+        cache.put(c, "C")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(b))
+        self.assertEqual((cache.get(a), cache.get(c)), ("A", "C"))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+
+class StagedDecodeTest(QRTestCase):
+    def test_clean_label_decoded_in_first_stage(self):
+        path = self.write_label("label.png", RECORD)
+        image = qrcode_load.cv2.imread(path)
+        log = []
+        texts, stage = qrcode_load.decode_image(image, log)
+        self.assertEqual([json.loads(text) for text in texts], [RECORD])
+        self.assertEqual(stage, "gray")
+        self.assertEqual([(name, hit) for name, _, hit in log], [("gray", True)])
+
+    def test_blank_image_tries_every_stage(self):
+        log = []
+        self.assertEqual(qrcode_load.decode_image(np.full((1200, 900, 3), 255, dtype=np.uint8), log),
+                         ([], None))
+        self.assertEqual([(name, hit) for name, _, hit in log],
+                         [(name, False) for name in qrcode_load.DECODE_STAGES])
+
+    def test_file_result_cached_by_content(self):
+        path = self.write_label("label.png", RECORD)
+        self.assertEqual(qrcode_load.decode_express_file(path), RECORD)
+        self.assertEqual(qrcode_load.decode_express_file(path), RECORD)
+        stats = qrcode_load.decode_stats()
+        self.assertEqual(stats["cache"], {"hits": 1, "misses": 1, "size": 1})
+        self.assertEqual(stats["stages"]["gray"]["attempts"], 1)  # 第二次没有重新解码
+        self.assertEqual(stats["stages"]["gray"]["hit_rate"], 1.0)
+        self.assertEqual(stats["stages"]["full"]["attempts"], 0)
+
+        # 同一路径的文件内容变了，不会命中旧结果
+        self.write_label("label.png", dict(RECORD, express_id="E2"))
+        self.assertEqual(qrcode_load.decode_express_file(path), dict(RECORD, express_id="E2"))
+        self.assertEqual(qrcode_load.decode_stats()["cache"], {"hits": 1, "misses": 2, "size": 2})
+
+    def test_cached_files_skip_pool(self):
+        paths = [self.write_label(f"label{i}.png", dict(RECORD, express_id=f"E{i}")) for i in range(2)]
+        for path in paths:
+            qrcode_load.decode_express_file(path)
+        with mock.patch.object(qrcode_load, "ProcessPoolExecutor",
+                               side_effect=AssertionError("缓存命中时不应启动进程池")):
+            results = list(qrcode_load.read_express_qr_codes(self.directory))
+        self.assertEqual(results, [(paths[0], dict(RECORD, express_id="E0"), None),
+                                   (paths[1], dict(RECORD, express_id="E1"), None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
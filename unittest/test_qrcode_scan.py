@@ -0,0 +1,86 @@
+"""摄像头实时扫码（qrcode_scan）的测试：用视频文件代替摄像头"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+import cv2
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from qrcode_create import render_qr_image  # noqa: E402
+
+try:
+    import qrcode_scan  # noqa: E402  需要 pyzbar 和 zbar 动态库
+except ImportError:
+    qrcode_scan = None
+
+FRAME_SIZE = 800  # 大于 max_width，覆盖缩小画面的分支
+
+
+def qr_frame(text):
+    """把二维码画在白色画面中央"""
+    label = cv2.cvtColor(np.array(render_qr_image(text).convert("RGB")), cv2.COLOR_RGB2BGR)
+    frame = np.full((FRAME_SIZE, FRAME_SIZE, 3), 255, dtype=np.uint8)
+    height, width = label.shape[:2]
+    top, left = (FRAME_SIZE - height) // 2, (FRAME_SIZE - width) // 2
+    frame[top:top + height, left:left + width] = label
+    return frame
+
+
+@unittest.skipIf(qrcode_scan is None, "需要 pyzbar 和 zbar 动态库")
+class ScanFramesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.video = os.path.join(self.directory, "scan.avi")
+        # 前 6 帧是 E1 的标签，后 6 帧是 E2 的标签
+        frames = [qr_frame('{"express_id": "E1"}')] * 6 + [qr_frame('{"express_id": "E2"}')] * 6
+        writer = cv2.VideoWriter(self.video, cv2.VideoWriter_fourcc(*"MJPG"), 10,
+                                 (FRAME_SIZE, FRAME_SIZE))
+        if not writer.isOpened():
+            self.skipTest("OpenCV 不支持写入 MJPG 视频")
+        for frame in frames:
+            writer.write(frame)
+        writer.release()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_new_codes_yielded_once(self):
+        results = list(qrcode_scan.scan_frames(self.video, frame_skip=2))
+        # 只解码第 0、3、6、9 帧；同一二维码在去重时间内只产出一次
+        self.assertEqual(results, [(0, ['{"express_id": "E1"}']), (6, ['{"express_id": "E2"}'])])
+
+    def test_repeat_after_dedup_window(self):
+        results = list(qrcode_scan.scan_frames(self.video, frame_skip=2, dedup_seconds=-1))
+        self.assertEqual([index for index, _ in results], [0, 3, 6, 9])
+
+    def test_unopenable_source(self):
+        with self.assertRaises(ValueError):
+            next(qrcode_scan.scan_frames(os.path.join(self.directory, "missing.avi")))
+
+    def test_background_scanner(self):
+        scanner = qrcode_scan.QRStreamScanner(self.video, frame_skip=2)
+        scanner.start()
+        deadline = time.monotonic() + 10
+        while scanner.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        scanner.stop()
+        self.assertIsNone(scanner.error)
+        self.assertEqual(scanner.poll(), [(0, '{"express_id": "E1"}', {"express_id": "E1"}),
+                                          (6, '{"express_id": "E2"}', {"express_id": "E2"})])
+        self.assertEqual(scanner.poll(), [])
+
+    def test_background_scanner_error(self):
+        scanner = qrcode_scan.QRStreamScanner(os.path.join(self.directory, "missing.avi"))
+        scanner.start()
+        scanner.stop()
+        self.assertIn("无法打开视频源", scanner.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""前缀/后缀检索索引（search_index.PrefixIndex）和即时搜索（ExpressStation.search）的测试"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation  # noqa: E402
+from models import STATUS_IN_STOCK  # noqa: E402
+from search_index import PrefixIndex, search_terms  # noqa: E402
+from storage import ExcelStorage  # noqa: E402
+
+
+class SearchTermsTest(unittest.TestCase):
+    def test_split_and_casefold(self):
+        self.assertEqual(search_terms(" Zhang San ", "A区1架", float("nan"), None, ""),
+                         {"zhang san", "zhang", "san", "a区1架"})
+
+
+class PrefixIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.add("P0012", "P0012", "张三")
+        self.index.add("P0123", "P0123", "张三丰")
+        self.index.add("X9", "X9", "李四")
+
+    def matches(self, text):
+        return list(dict.fromkeys(self.index.iter_matches(text)))
+
+    def test_prefix_before_suffix(self):
+        self.assertEqual(self.matches("张三"), ["P0012", "P0123"])
+        self.assertEqual(self.matches("p01"), ["P0123"])
+        self.assertEqual(self.matches("12"), ["P0012"])  # ID 的最后几位
+        self.assertEqual(self.matches("三丰"), ["P0123"])
+        self.assertEqual(self.matches("  "), [])
+        self.assertEqual(self.matches("王"), [])
+
+    def test_update_after_build(self):
+        self.assertEqual(self.matches("李"), ["X9"])  # 生成排序列表后再增删
+        self.index.add("X9", "X9", "王五")
+        self.index.add("Y1", "Y1", "李六")
+        self.assertEqual(self.matches("李"), ["Y1"])
+        self.assertEqual(self.matches("王"), ["X9"])
+        self.index.remove("P0012")
+        self.assertNotIn("P0012", self.index)
+        self.assertEqual(self.matches("张"), ["P0123"])
+        self.assertNotIn("p0012", self.index.postings)
+        self.assertEqual(self.index._keys, sorted(self.index.postings))
+        self.assertEqual(self.index._reversed, sorted(term[::-1] for term in self.index.postings))
+
+
+class StationSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name in ("user.xlsx", "express.xlsx"):
+            shutil.copy(os.path.join(ROOT, name), self.directory)
+        self.station = ExpressStation(ExcelStorage(self.path("user.xlsx"), self.path("express.xlsx"),
+                                                   self.path("express.journal")),
+                                      archive=ExpressArchive(self.path("archive")), archive_after_days=None)
+
+    def tearDown(self):
+        self.station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def expected(self, text, in_stock_only=False):
+        """全表扫描：每个词都要与某个检索词的开头或结尾匹配"""
+        result = set()
+        for e in self.station.express_dict.values():
+            terms = search_terms(e.sender.id, e.sender.name, e.receiver.id, e.receiver.name,
+                                 e.express_id, e.location, e.notes)
+            if in_stock_only and e.status != STATUS_IN_STOCK:
+                continue
+            if all(any(t.startswith(token) or t.endswith(token) for t in terms)
+                   for token in text.casefold().split()):
+                result.add(e.express_id)
+        return result
+
+    def search_ids(self, text, **kwargs):
+        return [e.express_id for e in self.station.search(text, **kwargs)]
+
+    def test_matches_full_scan(self):
+        rng = random.Random(0)
+        people = [(f"S{i:03d}", name) for i, name in enumerate(["王小明", "王小红", "Lee Chen", "陈大文"])]
+        for i in range(40):
+            (sender, sender_name), (receiver, receiver_name) = rng.choice(people), rng.choice(people)
+            self.assertIsNone(self.station.check_in(f"SX{i:03d}", "", sender, sender_name, receiver,
+                                                    receiver_name, f"{'AB'[i % 2]}区{i % 3}架",
+                                                    rng.choice(["易碎", "生鲜", ""])))
+            if rng.random() < 0.3:
+                self.station.pick_up(self.station.express_dict[f"SX{i:03d}"].pick_code)
+        for text in ["王", "小红", "lee", "CHEN", "s001", "001", "sx01", "b区", "1架", "易碎",
+                     "王 易碎", "王小明 b区 生鲜", "不存在"]:
+            for in_stock_only in (False, True):
+                ids = self.search_ids(text, limit=None, in_stock_only=in_stock_only)
+                self.assertEqual(len(ids), len(set(ids)), text)
+                self.assertEqual(set(ids), self.expected(text, in_stock_only), text)
+
+    def test_limit_and_archived(self):
+        for i in range(5):
+            self.station.check_in(f"LM{i}", "", "S900", "限量", "S901", "限量二", "C区", "")
+        self.assertEqual(len(self.search_ids("限量", limit=3)), 3)
+        self.assertEqual(self.search_ids(""), [])
+        self.station.pick_up(self.station.express_dict["LM0"].pick_code)
+        self.assertNotIn("LM0", self.search_ids("限量", limit=None, in_stock_only=True))
+        self.assertEqual(self.search_ids("lm0"), ["LM0"])
+        self.station.archive_picked_up(0, now=time.time() + 60)  # 归档后不再出现在搜索结果中
+        self.assertEqual(self.search_ids("lm0"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
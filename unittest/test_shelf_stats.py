@@ -0,0 +1,63 @@
+"""货架占用和统计（shelf_stats.ShelfStats）的测试"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP, Express  # noqa: E402
+from shelf_stats import ShelfStats  # noqa: E402
+
+
+def make_express(express_id, status, picked_at=None, stored_at="2024-05-01 09:00:00", location="A区1架"):
+    return Express(express_id, "123456", None, None, location, "", status, picked_at, stored_at)
+
+
+class ShelfStatsTest(unittest.TestCase):
+    def test_legacy_picked_up_without_time_not_in_stock(self):
+        stats = ShelfStats()
+        stats.add(make_express("E1", STATUS_PICKED_UP, picked_at=None))
+        stats.add(make_express("E2", STATUS_IN_STOCK))
+        self.assertEqual(stats.in_stock, 1)
+        self.assertEqual(stats.occupancy(), {"A区1架": 1})
+
+    def test_suggest_returns_display_text(self):
+        stats = ShelfStats()
+        stats.add(make_express("E1", STATUS_IN_STOCK, location="b区 2号架"))
+        stats.add(make_express("E2", STATUS_IN_STOCK, location="B区2号架"))
+        stats.add(make_express("E3", STATUS_IN_STOCK, location="A区1架"))
+        self.assertEqual(stats.suggest_shelf(), "A区1架")
+        stats.add(make_express("E4", STATUS_IN_STOCK, location="A区1架"))
+        stats.add(make_express("E5", STATUS_IN_STOCK, location="A区1架"))
+        self.assertEqual(stats.suggest_shelf(), "b区 2号架")
+        self.assertEqual(stats.suggest_shelf([" c区1架 ", "A区1架"]), "c区1架")
+
+    def test_pick_up_and_remove(self):
+        stats = ShelfStats()
+        express = make_express("E1", STATUS_IN_STOCK)
+        stats.add(express)
+        express.status = STATUS_PICKED_UP
+        express.picked_at = "2024-05-01 11:00:00"
+        stats.pick_up(express)
+        self.assertEqual(stats.in_stock, 0)
+        self.assertEqual(stats.dwell_summary()["avg_hours"], 2.0)
+        # 归档后不再计入统计
+        stats.remove(express)
+        self.assertEqual(stats.in_stock, 0)
+        self.assertEqual(stats.dwell_count, 0)
+        self.assertEqual(+stats.intake_by_day, {})
+        self.assertEqual(+stats.pickup_by_day, {})
+
+    def test_remove_legacy_picked_up(self):
+        stats = ShelfStats()
+        legacy = make_express("E1", STATUS_PICKED_UP, picked_at=None, stored_at=None)
+        stats.add(legacy)
+        stats.add(make_express("E2", STATUS_IN_STOCK))
+        stats.remove(legacy)
+        self.assertEqual(stats.in_stock, 1)
+        self.assertEqual(stats.shelf_parcels("A区1架"), ["E2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""xlsx 启动快照缓存（snapshot_cache）的测试"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import snapshot_cache  # noqa: E402
+from snapshot_cache import CACHE_SUFFIX, load_rows, save_rows  # noqa: E402
+
+
+class SnapshotCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "user.xlsx")
+        shutil.copy(os.path.join(ROOT, "user.xlsx"), self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _load_without_xlsx(self, column_count=2):
+        """读取缓存，期间任何 xlsx 解析都视为失败"""
+        with mock.patch.object(snapshot_cache, "read_xlsx_rows", side_effect=AssertionError("重新解析了 xlsx")):
+            return load_rows(self.path, column_count)
+
+    def test_cold_load_writes_cache(self):
+        rows = load_rows(self.path, 2)
+        self.assertTrue(rows)
+        self.assertTrue(all(len(row) == 2 for row in rows))
+        self.assertTrue(os.path.exists(self.path + CACHE_SUFFIX))
+        self.assertEqual(self._load_without_xlsx(), rows)
+
+    def test_missing_columns_filled_with_none(self):
+        rows = load_rows(self.path, 4)
+        self.assertTrue(all(row[2:] == (None, None) for row in rows))
+
+    def test_changed_file_reparsed(self):
+        load_rows(self.path, 2)
+        save_rows(self.path, [("P9", "旧数据")])
+        os.utime(self.path, ns=(0, 0))  # 签名和缓存不一致，内容哈希一致
+        self.assertEqual(self._load_without_xlsx(), [("P9", "旧数据")])
+
+        with open(self.path, "ab") as f:
+            f.write(b"\0")  # 内容变了：缓存失效（文件已损坏，解析会失败）
+        with mock.patch.object(snapshot_cache, "read_xlsx_rows", return_value=[("P1", "新数据")]) as read:
+            self.assertEqual(load_rows(self.path, 2), [("P1", "新数据")])
+        read.assert_called_once_with(self.path, 2)
+
+    def test_column_count_change_reparsed(self):
+        load_rows(self.path, 2)
+        rows = load_rows(self.path, 3)
+        self.assertTrue(all(len(row) == 3 for row in rows))
+
+    def test_corrupt_or_old_cache_ignored(self):
+        rows = load_rows(self.path, 2)
+        with open(self.path + CACHE_SUFFIX, "wb") as f:
+            f.write(b"not a pickle")
+        self.assertEqual(load_rows(self.path, 2), rows)
+
+        with mock.patch.object(snapshot_cache, "CACHE_VERSION", snapshot_cache.CACHE_VERSION + 1):
+            with mock.patch.object(snapshot_cache, "read_xlsx_rows", return_value=rows) as read:
+                load_rows(self.path, 2)
+        read.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
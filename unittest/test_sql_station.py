@@ -0,0 +1,164 @@
+"""SQLite 后端的业务核心（express_core.SqlExpressStation）的测试，结果与全部读入内存的 ExpressStation 对照"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from archive import ExpressArchive  # noqa: E402
+from express_core import ExpressStation, SqlExpressStation  # noqa: E402
+from express_list_model import ExpressListModel  # noqa: E402
+from models import STATUS_IN_STOCK, STATUS_PICKED_UP  # noqa: E402
+from storage import SqliteStorage, import_from_xlsx  # noqa: E402
+
+SYNC_TIMEOUT = 5
+LOCATIONS = ("A区1架", "A区2架", "B区1架", "C区_1")
+
+
+class SqlExpressStationTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        import_from_xlsx(self.path("express.db"), os.path.join(ROOT, "user.xlsx"),
+                         os.path.join(ROOT, "express.xlsx"))
+        self.stations = []
+        self.station = self.open_station()
+
+    def tearDown(self):
+        for station in self.stations:
+            station.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def open_station(self, cls=SqlExpressStation):
+        station = cls(SqliteStorage(self.path("express.db")), archive=ExpressArchive(self.path("archive")),
+                      archive_after_days=None)
+        self.stations.append(station)
+        return station
+
+    def check_in(self, station, express_id, pick_code="", location="A区1架", receiver="P002"):
+        error = station.check_in(express_id, pick_code, "P001", "张三", receiver, "李四", location, "")
+        self.assertIsNone(error)
+        return station.get_express(express_id).pick_code
+
+    def test_express_not_loaded(self):
+        self.assertIsNone(self.station.express_dict)
+        self.assertEqual(self.station.express_count(), 4)
+        self.assertEqual(self.station.get_express("E001").receiver.name, "李四")
+        self.assertFalse(self.station.pick_codes.is_free("123456"))
+
+    def test_pick_up_before_commit(self):
+        with mock.patch.object(self.station.persistence, "submit") as submit:
+            code = self.check_in(self.station, "S1")
+            self.assertEqual(self.station.check_in("S1", "", "P001", "张三", "P002", "李四", "A区1架", ""),
+                             "快递ID S1 已存在！")
+            express, error = self.station.pick_up(code)
+            self.assertIsNone(error)
+            self.assertEqual(self.station.pick_up(code)[1], "该快递已被取走！")
+            self.assertEqual([call[0][0] for call in submit.call_args_list], ["insert_express", "update_status"])
+        self.assertEqual(self.station.get_express("S1").status, STATUS_PICKED_UP)
+        self.assertEqual(self.station.existing_express_ids(["S1", "E001", "X"]), {"S1", "E001"})
+
+    def test_committed_writes_leave_overlay(self):
+        code = self.check_in(self.station, "S1")
+        self.assertIsNone(self.station.pick_up(code)[1])
+        self.station.persistence.flush()
+        self.assertEqual(self.station._pending, {})
+        self.assertEqual(self.station.take_changes(), ["S1"])
+        row = self.station.storage.find_express(express_id="S1")[0]
+        self.assertEqual(row[6], STATUS_PICKED_UP)
+        self.assertTrue(self.station.pick_codes.is_cooling(code))
+
+    def test_query_and_search(self):
+        code = self.check_in(self.station, "S1", receiver="P003")
+        self.station.persistence.flush()
+        self.assertIn("S1", [e.express_id for e in self.station.query("P003", in_stock_only=True)])
+        self.assertIsNone(self.station.pick_up(code)[1])
+        # 取件尚未提交时按本机状态过滤
+        self.assertNotIn("S1", [e.express_id for e in self.station.query("P003", in_stock_only=True)])
+        self.assertEqual([e.express_id for e in self.station.query("S1")], ["S1"])
+        self.assertIn("S1", [e.express_id for e in self.station.search("张 s1")])
+        self.assertNotIn("S1", [e.express_id for e in self.station.search("张 s1", in_stock_only=True)])
+        self.assertEqual(self.station.search("C区_"), [])  # _ 不是通配符
+        self.assertEqual(len(self.station.search("张", limit=1)), 1)
+
+    def test_matches_in_memory_station(self):
+        rng = random.Random(0)
+        for i in range(40):
+            self.check_in(self.station, f"R{i:02d}", location=rng.choice(LOCATIONS),
+                          receiver=rng.choice(("P002", "P003")))
+        for i in range(0, 40, 3):
+            self.assertIsNone(self.station.pick_up(self.station.get_express(f"R{i:02d}").pick_code)[1])
+        self.station.persistence.flush()
+        memory = self.open_station(ExpressStation)
+        for text in ("P002", "R05", "P003"):
+            self.assertEqual(sorted(e.express_id for e in self.station.query(text)),
+                             sorted(e.express_id for e in memory.query(text)))
+        self.assertEqual(self.station.stats.occupancy(), memory.stats.occupancy())
+        self.assertEqual(self.station.stats.area_occupancy(), memory.stats.area_occupancy())
+        self.assertEqual(self.station.stats.daily_rates(), memory.stats.daily_rates())
+        self.assertEqual(self.station.stats.in_stock, memory.stats.in_stock)
+        self.assertEqual(self.station.suggest_location(), memory.suggest_location())
+        for column, reverse, text in ((None, False, ""), (4, False, ""), (2, True, ""), (0, False, "A区"),
+                                      (6, True, "李四")):
+            sql_model, memory_model = self.station.create_list_model(), ExpressListModel(memory.express_dict)
+            for model in (sql_model, memory_model):
+                model.page_size = 7
+                model.set_filter(text)
+                if column is not None:
+                    model.toggle_sort(column)
+                    if reverse:
+                        model.toggle_sort(column)
+            self.assertEqual(sql_model.count(), memory_model.count())
+            for page in range(memory_model.page_count()):
+                sql_model.set_page(page)
+                memory_model.set_page(page)
+                self.assertEqual(sql_model.page_rows(), memory_model.page_rows())
+
+    def test_other_instance_found_without_sync(self):
+        other = self.open_station()
+        code = self.check_in(other, "S1")
+        other.persistence.flush()
+        express, error = self.station.pick_up(code)
+        self.assertIsNone(error)
+        self.assertEqual(express.express_id, "S1")
+        self.station.persistence.flush()
+        other.sync(SYNC_TIMEOUT)
+        self.assertIn("S1", other.take_changes())
+        self.assertTrue(other.pick_codes.is_cooling(code))
+
+    def test_archive_picked_up(self):
+        code = self.check_in(self.station, "S1")
+        self.assertIsNone(self.station.pick_up(code)[1])
+        self.station.persistence.flush()
+        self.assertEqual(self.station.archive_picked_up(1, now=time.time() + 2 * 86400), 1)
+        self.assertIsNone(self.station.get_express("S1"))
+        self.station.persistence.flush()
+        self.assertEqual(self.station.storage.find_express(express_id="S1"), [])
+        self.assertEqual([e.express_id for e in self.station.query("S1", include_archive=True)], ["S1"])
+
+    def test_failed_writes_undone(self):
+        with mock.patch.object(self.station.storage, "apply_batch", side_effect=OSError("磁盘已满")):
+            code = self.check_in(self.station, "S1")
+            self.station.persistence.flush()
+            self.station.undo_check_in("S1")
+            self.assertIsNone(self.station.get_express("S1"))
+            express, error = self.station.pick_up("123456")
+            self.assertIsNone(error)
+            self.station.persistence.flush()
+            self.station.undo_pick_up(express)
+        self.assertEqual(self.station.persistence.failed, [])
+        self.assertEqual(self.station.get_express("E001").status, STATUS_IN_STOCK)
+        self.assertFalse(self.station.pick_codes.is_free("123456"))
+        self.assertTrue(self.station.pick_codes.is_cooling(code))
+
+
+if __name__ == "__main__":
+    unittest.main()